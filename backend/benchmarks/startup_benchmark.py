@@ -0,0 +1,76 @@
+"""
+Startup Benchmark для AgentFlow Video Editor
+Время холодного старта backend в режимах STARTUP_MODE=eager и lazy.
+
+Каждый замер - отдельный процесс: импорт src.main (создание приложения) и
+первый запрос /api/health через test client. Так видно и время до готовности
+процесса, и во что обходится отложенная инициализация на первом запросе.
+
+Запуск из backend/: python benchmarks/startup_benchmark.py [--runs 5] [--modes eager,lazy]
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Выполняется в дочернем процессе; печатает JSON с замерами последней строкой
+MEASURE_SCRIPT = '''
+import io, json, time, contextlib
+started = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    from src.main import app
+    imported = time.perf_counter()
+    response = app.test_client().get('/api/health')
+    first_request = time.perf_counter()
+print(json.dumps({
+    'import': imported - started,
+    'first_request': first_request - imported,
+    'status': response.status_code
+}))
+'''
+
+
+def measure(mode: str) -> dict:
+    env = dict(os.environ, STARTUP_MODE=mode)
+    result = subprocess.run(
+        [sys.executable, '-c', MEASURE_SCRIPT],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Startup failed in {mode} mode:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def summarize(values) -> str:
+    values = [value * 1000 for value in values]
+    return f"min {min(values):7.1f} ms  median {statistics.median(values):7.1f} ms  max {max(values):7.1f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backend startup time benchmark')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--modes', default='eager,lazy')
+    args = parser.parse_args()
+
+    print(f"⏱️ Startup benchmark: {args.runs} runs per mode")
+    print(f"   DATABASE_URL: {'set' if os.getenv('DATABASE_URL') else 'not set (SQLite)'}, "
+          f"REDIS_URL: {'set' if os.getenv('REDIS_URL') else 'not set'}, "
+          f"SUPABASE_URL: {'set' if os.getenv('SUPABASE_URL') else 'not set'}")
+
+    for mode in args.modes.split(','):
+        samples = [measure(mode) for _ in range(args.runs)]
+        statuses = {sample['status'] for sample in samples}
+
+        print(f"\n🚀 STARTUP_MODE={mode} (health status: {', '.join(map(str, sorted(statuses)))})")
+        print(f"   import + init:  {summarize([sample['import'] for sample in samples])}")
+        print(f"   first request:  {summarize([sample['first_request'] for sample in samples])}")
+        print(f"   total:          {summarize([sample['import'] + sample['first_request'] for sample in samples])}")
+
+
+if __name__ == '__main__':
+    main()
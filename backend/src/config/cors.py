@@ -6,6 +6,10 @@ CORS Configuration для AgentFlow Video Editor
 import os
 from flask_cors import CORS
 
+from src.config.logging_config import get_logger
+
+logger = get_logger('cors')
+
 def configure_cors(app):
     """Настраивает CORS для приложения"""
     
@@ -16,11 +20,11 @@ def configure_cors(app):
     if cors_origins == '*':
         # Для разработки - разрешаем все
         allowed_origins = '*'
-        print("⚠️ CORS: Allowing all origins (development mode)")
+        logger.warning("⚠️ CORS: Allowing all origins (development mode)")
     else:
         # Для production - конкретные домены
         allowed_origins = [origin.strip() for origin in cors_origins.split(',')]
-        print(f"✅ CORS: Allowing origins: {allowed_origins}")
+        logger.info("✅ CORS: Allowing origins: %s", allowed_origins)
     
     # Настройки CORS
     cors_config = {
@@ -31,13 +35,15 @@ def configure_cors(app):
             'Authorization',
             'X-User-ID',
             'X-Requested-With',
+            'X-Request-ID',
             'Accept',
             'Origin'
         ],
         'expose_headers': [
             'Content-Range',
             'X-Content-Range',
-            'X-Total-Count'
+            'X-Total-Count',
+            'X-Request-ID'
         ],
         'supports_credentials': True,
         'max_age': 86400  # 24 hours
@@ -0,0 +1,111 @@
+"""
+Database Configuration для AgentFlow Video Editor
+Выбор строки подключения и параметры пула соединений.
+
+STARTUP_MODE=eager (по умолчанию): при старте проверяем варианты подключения к
+Postgres и при неудаче переходим на SQLite, затем создаем схему.
+STARTUP_MODE=lazy: одна строка подключения без проверки, соединения открываются
+при первом запросе, схему создает отдельная команда (python -m src.migrations upgrade).
+
+API, worker'ы и python -m src.migrations настраивают БД только через
+configure_database: у всех процессов одна строка подключения и один файл SQLite.
+"""
+
+import os
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy import create_engine, text
+
+from src.config.logging_config import get_logger
+
+logger = get_logger('database')
+
+# Абсолютный путь: относительный sqlite:/// Flask-SQLAlchemy отсчитывает от instance_path
+# приложения, а он разный у API (cd src && python main.py), worker'ов и CLI миграций
+SQLITE_FALLBACK_PATH = os.getenv('SQLITE_FALLBACK_PATH') or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'fallback.db'
+)
+SQLITE_FALLBACK_URI = f'sqlite:///{SQLITE_FALLBACK_PATH}'
+
+
+def get_startup_mode() -> str:
+    mode = os.getenv('STARTUP_MODE', 'eager').lower()
+    return mode if mode in ('eager', 'lazy') else 'eager'
+
+
+def database_candidates(database_url: str) -> List[str]:
+    """Варианты подключения в порядке предпочтения"""
+    return [
+        # Pooler connection (рекомендуемый)
+        database_url.replace('postgresql://', 'postgresql+psycopg://'),
+        # Direct connection
+        database_url.replace('db.vahgmyuowsilbxqdjjii.supabase.co:5432', 'aws-0-eu-central-1.pooler.supabase.com:6543'),
+        # Fallback to original
+        database_url
+    ]
+
+
+def engine_options(uri: str) -> Dict[str, Any]:
+    """Параметры пула: один пул на процесс, проверка соединения перед выдачей,
+    пересоздание старых соединений (pooler закрывает простаивающие)"""
+    options = {
+        'pool_pre_ping': True,
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '1800'))
+    }
+
+    if not uri.startswith('sqlite'):
+        options.update({
+            'pool_size': int(os.getenv('DB_POOL_SIZE', '5')),
+            'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '10')),
+            'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', '30'))
+        })
+
+    return options
+
+
+def probe_database(database_url: str) -> Optional[str]:
+    """Первый вариант подключения, который отвечает на SELECT 1"""
+    candidates = database_candidates(database_url)
+
+    for i, conn_str in enumerate(candidates):
+        try:
+            logger.info("🔄 Trying database connection %s/%s: %s", i + 1, len(candidates), conn_str.split('@')[1] if '@' in conn_str else 'unknown')
+
+            engine = create_engine(conn_str, pool_pre_ping=True)
+            try:
+                with engine.connect() as connection:
+                    connection.execute(text('SELECT 1'))
+            finally:
+                engine.dispose()
+
+            logger.info("✅ Database connected successfully")
+            return conn_str
+
+        except Exception as e:
+            logger.warning("❌ Database connection failed: %s...", str(e)[:100])
+
+    return None
+
+
+def configure_database(app, mode: str = None) -> Tuple[str, bool]:
+    """Задает SQLALCHEMY_DATABASE_URI и параметры пула; возвращает (uri, используется ли DATABASE_URL)"""
+    mode = mode or get_startup_mode()
+    database_url = os.getenv('DATABASE_URL')
+
+    uri = None
+    if database_url:
+        if mode == 'lazy':
+            # Без сетевых проверок: ошибку подключения покажет первый запрос
+            uri = database_candidates(database_url)[0]
+        else:
+            uri = probe_database(database_url)
+
+    connected = uri is not None
+    if not connected:
+        logger.warning("🔄 Using SQLite fallback database: %s", SQLITE_FALLBACK_PATH)
+        os.makedirs(os.path.dirname(SQLITE_FALLBACK_PATH), exist_ok=True)
+        uri = SQLITE_FALLBACK_URI
+
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(uri)
+    return uri, connected
@@ -0,0 +1,165 @@
+"""
+Logging Configuration для AgentFlow Video Editor
+Логи с уровнями, JSON выводом, request id и выборкой запросов.
+
+LOG_LEVEL (INFO) отсекает записи до форматирования: logger.debug('... %s', value)
+при выключенном DEBUG не строит строку, а дорогие подробности в горячих путях
+дополнительно закрыты logger.isEnabledFor(logging.DEBUG).
+
+Запись в stdout выполняет отдельный поток (QueueHandler -> QueueListener):
+поток запроса только кладет запись в очередь и не ждет вывода.
+
+LOG_FORMAT=json (по умолчанию) - одна JSON строка на запись; text - для локальной
+разработки. LOG_REQUEST_SAMPLE_RATE - доля запросов, для которых пишутся
+записи ниже WARNING (access log, отладка); предупреждения и ошибки пишутся всегда.
+"""
+
+import os
+import sys
+import copy
+import json
+import time
+import uuid
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+
+from flask import g, has_request_context, request
+
+LOGGER_NAME = 'agentflow'
+
+# Поля LogRecord, которые не переносим в JSON как extra
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'request_id'}
+
+_listener = None
+
+
+def get_logger(name: str = None) -> logging.Logger:
+    """Логгер подсистемы: agentflow.<name>"""
+    return logging.getLogger(f'{LOGGER_NAME}.{name}' if name else LOGGER_NAME)
+
+
+class RequestContextFilter(logging.Filter):
+    """Добавляет request_id и отбрасывает записи ниже WARNING для запросов вне выборки"""
+
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = getattr(g, 'request_id', None)
+            if record.levelno < logging.WARNING and not getattr(g, 'log_sampled', True):
+                return False
+        else:
+            record.request_id = None
+        return True
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Подставляет аргументы сообщения в потоке вызова (они могут измениться позже),
+    а JSON форматирование и запись оставляет потоку вывода"""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        if getattr(record, 'request_id', None):
+            entry['request_id'] = record.request_id
+
+        # logger.info('...', extra={...}) - структурированные поля записи
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and not key.startswith('_'):
+                entry[key] = value
+
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s%(request_tag)s: %(message)s')
+
+    def format(self, record):
+        record.request_tag = f" [{record.request_id}]" if getattr(record, 'request_id', None) else ''
+        return super().format(record)
+
+
+def configure_logging(level: str = None, log_format: str = None):
+    """Настраивает логгер agentflow (повторный вызов перенастраивает его)"""
+    global _listener
+
+    level = (level or os.getenv('LOG_LEVEL', 'INFO')).upper()
+    log_format = (log_format or os.getenv('LOG_FORMAT', 'json')).lower()
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(TextFormatter() if log_format == 'text' else JsonFormatter())
+
+    if _listener:
+        _listener.stop()
+
+    # Фильтр контекста запроса работает в потоке запроса (до очереди): там есть g
+    queue_handler = DeferredQueueHandler(queue.SimpleQueue())
+    queue_handler.addFilter(RequestContextFilter())
+    _listener = logging.handlers.QueueListener(queue_handler.queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.handlers = [queue_handler]
+    logger.setLevel(getattr(logging, level, logging.INFO))
+    logger.propagate = False
+
+    return logger
+
+
+def stop_logging():
+    """Дописывает записи из очереди в stdout (перед os._exit atexit не вызывается)"""
+    global _listener
+    if _listener:
+        _listener.stop()
+        _listener = None
+
+atexit.register(stop_logging)
+
+
+def init_request_logging(app):
+    """Request id (X-Request-ID), выборка запросов и одна строка access log на запрос"""
+    sample_rate = float(os.getenv('LOG_REQUEST_SAMPLE_RATE', '1.0'))
+    access_logger = get_logger('access')
+
+    @app.before_request
+    def start_request_log():
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+        g.log_sampled = sample_rate >= 1.0 or random.random() < sample_rate
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def finish_request_log(response):
+        response.headers['X-Request-ID'] = g.get('request_id', '')
+        if access_logger.isEnabledFor(logging.INFO):
+            access_logger.info(
+                '%s %s %s', request.method, request.path, response.status_code,
+                extra={
+                    'method': request.method,
+                    'path': request.path,
+                    'status': response.status_code,
+                    'duration_ms': round((time.perf_counter() - g.get('request_started', time.perf_counter())) * 1000, 2),
+                    'content_length': request.content_length
+                }
+            )
+        return response
@@ -3,15 +3,24 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-# Debug: Check environment variables
-print(f"🔍 [DEBUG] main.py - SUPABASE_URL: {os.getenv('SUPABASE_URL')}")
-print(f"🔍 [DEBUG] main.py - SUPABASE_ANON_KEY: {os.getenv('SUPABASE_ANON_KEY')}")
-print(f"🔍 [DEBUG] main.py - DATABASE_URL: {os.getenv('DATABASE_URL')}")
-
+import logging
 from flask import Flask, send_from_directory, jsonify
 from flask_cors import CORS
+from src.config.logging_config import configure_logging, init_request_logging, get_logger
+configure_logging()
+logger = get_logger('app')
+
+# Только факт наличия: значения секретов в логи не попадают
+logger.debug(
+    "Environment: SUPABASE_URL set=%s, SUPABASE_ANON_KEY set=%s, DATABASE_URL set=%s",
+    bool(os.getenv('SUPABASE_URL')), bool(os.getenv('SUPABASE_ANON_KEY')), bool(os.getenv('DATABASE_URL'))
+)
+
 from src.config.cors import configure_cors
+from src.services.metrics import init_metrics
+from src.config.database import configure_database, get_startup_mode
 from src.models.video_project import db
+from src.models.background_job import BackgroundJob  # noqa: F401 (регистрирует таблицу в metadata для create_all)
 from src.routes.user import user_bp
 from src.routes.video import video_bp
 
@@ -21,6 +30,12 @@ app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'sta
 # CORS configured in cors.py
 configure_cors(app)
 
+# Request id, выборка и access log
+init_request_logging(app)
+
+# Метрики Prometheus (/metrics)
+init_metrics(app)
+
 # Конфигурация
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'asdf#FGSgvasgf$5$WGT')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
@@ -29,126 +44,104 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500MB максимальный размер файла
 app.config['UPLOAD_FOLDER'] = '/tmp/video_uploads'
 app.config['MAX_CONTENT_PATH'] = None  # Убираем ограничения на путь
+# Локальные файлы отдает фронтовой сервер (Apache/lighttpd X-Sendfile), а не Python
+app.config['USE_X_SENDFILE'] = os.getenv('USE_X_SENDFILE', 'false').lower() == 'true'
 
 # Создаем папку для загрузок если её нет
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
-print(f"🔍 [DEBUG] Flask file upload configuration:")
-print(f"🔍 [DEBUG] - MAX_CONTENT_LENGTH: {app.config['MAX_CONTENT_LENGTH']} bytes ({app.config['MAX_CONTENT_LENGTH'] // (1024*1024)} MB)")
-print(f"🔍 [DEBUG] - UPLOAD_FOLDER: {app.config['UPLOAD_FOLDER']}")
-print(f"🔍 [DEBUG] - Upload folder exists: {os.path.exists(app.config['UPLOAD_FOLDER'])}")
-
-# Database configuration с fallback
-database_url = os.getenv('DATABASE_URL')
-database_connected = False
+logger.debug(
+    "File upload configuration: MAX_CONTENT_LENGTH=%s bytes, UPLOAD_FOLDER=%s",
+    app.config['MAX_CONTENT_LENGTH'], app.config['UPLOAD_FOLDER']
+)
 
-if database_url:
-    try:
-        # Пробуем разные варианты подключения
-        connection_strings = [
-            # Pooler connection (рекомендуемый)
-            database_url.replace('postgresql://', 'postgresql+psycopg://'),
-            # Direct connection
-            database_url.replace('db.vahgmyuowsilbxqdjjii.supabase.co:5432', 'aws-0-eu-central-1.pooler.supabase.com:6543'),
-            # Fallback to original
-            database_url
-        ]
-        
-        for i, conn_str in enumerate(connection_strings):
-            try:
-                print(f"🔄 Trying database connection {i+1}/3: {conn_str.split('@')[1] if '@' in conn_str else 'unknown'}")
-                
-                # Создаем новый Flask app для каждой попытки
-                test_app = Flask(__name__)
-                test_app.config['SQLALCHEMY_DATABASE_URI'] = conn_str
-                test_app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-                
-                # Тестируем подключение
-                from flask_sqlalchemy import SQLAlchemy
-                test_db = SQLAlchemy()
-                test_db.init_app(test_app)
-                
-                with test_app.app_context():
-                    test_db.create_all()
-                    print("✅ Database connected successfully")
-                    
-                    # Если успешно, используем эту конфигурацию
-                    app.config['SQLALCHEMY_DATABASE_URI'] = conn_str
-                    database_connected = True
-                    break
-                    
-            except Exception as e:
-                print(f"❌ Database connection failed: {str(e)[:100]}...")
-                continue
-                
-    except Exception as e:
-        print(f"❌ Database configuration error: {e}")
+# Режим старта: eager - проверки и создание схемы при старте, lazy - все при первом использовании
+startup_mode = get_startup_mode()
 
-# Fallback к SQLite если PostgreSQL не работает
-if not database_connected:
-    print("🔄 Using SQLite fallback database")
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///fallback.db'
+# Database configuration с fallback (один пул соединений на процесс)
+database_url = os.getenv('DATABASE_URL')
+database_uri, database_connected = configure_database(app, startup_mode)
 
 # Инициализируем БД только один раз
 db.init_app(app)
 
-# Создаем таблицы
-with app.app_context():
-    try:
-        db.create_all()
-        print("✅ Database tables created")
-    except Exception as e:
-        print(f"❌ Database table creation failed: {e}")
+# Создаем таблицы (в lazy режиме схему создает python -m src.migrations upgrade)
+if startup_mode == 'eager':
+    with app.app_context():
+        try:
+            db.create_all()
+            logger.info("✅ Database tables created")
+        except Exception as e:
+            logger.error("❌ Database table creation failed: %s", e)
+        
+        # Старые БД догоняют схему моделей (колонки, индексы) версионными миграциями
+        try:
+            from src.migrations import run_migrations
+            run_migrations(db.engine)
+        except Exception as e:
+            logger.error("❌ Database migrations failed: %s", e)
 
-# Инициализация Supabase Storage (опционально)
+# Инициализация Supabase Storage (опционально; в lazy режиме - при первой загрузке)
 supabase_url = os.getenv('SUPABASE_URL')
 supabase_key = os.getenv('SUPABASE_ANON_KEY')
 storage_available = False
 
 if supabase_url and supabase_key:
-    try:
-        from src.services.storage_service import init_storage_service
-        init_storage_service(supabase_url, supabase_key)
+    if startup_mode == 'lazy':
         storage_available = True
-        print("✅ Supabase Storage initialized")
-    except Exception as e:
-        print(f"⚠️ Supabase Storage initialization failed: {e}")
+        logger.info("⏳ Supabase Storage will connect on first use")
+    else:
+        try:
+            from src.services.storage_service import init_storage_service
+            init_storage_service(supabase_url, supabase_key)
+            storage_available = True
+            logger.info("✅ Supabase Storage initialized")
+        except Exception as e:
+            logger.warning("⚠️ Supabase Storage initialization failed: %s", e)
 else:
-    print("⚠️ Supabase credentials not found. Storage service disabled.")
+    logger.warning("⚠️ Supabase credentials not found. Storage service disabled.")
+
+# Локальный пул задач (fallback без Redis)
+from src.services.local_executor import init_local_executor
+init_local_executor(app)
 
-# Инициализация Queue Manager (опционально)
+# Queue Manager, broker событий SSE и кэш документов. В lazy режиме подключаются к Redis
+# при первом обращении (get_queue() / get_event_broker() / get_document_cache())
 redis_url = os.getenv('REDIS_URL')
-queue_manager = None
-queue_available = False
+from src.services.queue_service import init_queue_manager, get_queue_manager
+from src.services.events import init_event_broker, get_event_broker
+from src.services.cache import init_document_cache, get_document_cache
 
-if redis_url and redis_url.strip():
-    try:
-        from src.services.queue_service import init_queue_manager
-        queue_manager = init_queue_manager(redis_url)
-        queue_available = True
-        print("✅ Redis Queue initialized")
-    except Exception as e:
-        print(f"⚠️ Redis Queue initialization failed: {e}")
+if startup_mode == 'eager':
+    init_queue_manager(redis_url)
+    init_event_broker(redis_url)
+    init_document_cache(redis_url)
+    
+    if get_queue_manager().is_available():
+        logger.info("✅ Redis Queue initialized")
+    else:
+        logger.warning("⚠️ Redis Queue unavailable. Using bounded local worker pool.")
 else:
-    print("⚠️ Redis URL not provided. Queue service disabled.")
+    logger.info("⏳ Queue, event broker and document cache will connect on first use")
 
-# 🔍 Middleware для логирования всех запросов с файлами
+def queue_available():
+    """Доступна ли очередь (None - в lazy режиме к Redis еще не подключались)"""
+    queue_manager = get_queue_manager()
+    return queue_manager.is_available() if queue_manager else None
+
+# 🔍 Отладка запросов с файлами: только при LOG_LEVEL=DEBUG (иначе тело формы не разбирается)
 @app.before_request
 def log_request_info():
     from flask import request
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
     if request.method == 'POST' and request.endpoint and 'video' in request.endpoint:
-        print(f"🔍 [DEBUG] === INCOMING REQUEST ===")
-        print(f"🔍 [DEBUG] Method: {request.method}")
-        print(f"🔍 [DEBUG] URL: {request.url}")
-        print(f"🔍 [DEBUG] Endpoint: {request.endpoint}")
-        print(f"🔍 [DEBUG] Content-Type: {request.content_type}")
-        print(f"🔍 [DEBUG] Content-Length: {request.content_length}")
-        print(f"🔍 [DEBUG] Files in request: {list(request.files.keys())}")
-        print(f"🔍 [DEBUG] Form data keys: {list(request.form.keys())}")
-        
-        # Логируем информацию о каждом файле
-        for field_name, file_obj in request.files.items():
-            print(f"🔍 [DEBUG] File field '{field_name}': filename='{file_obj.filename}', content_type='{file_obj.content_type}'")
+        logger.debug(
+            "🔍 Incoming %s %s: endpoint=%s, content_type=%s, content_length=%s, files=%s, form=%s",
+            request.method, request.url, request.endpoint, request.content_type, request.content_length,
+            [(name, file.filename, file.content_type) for name, file in request.files.items()],
+            list(request.form.keys())
+        )
 
 # Регистрация blueprints
 app.register_blueprint(user_bp, url_prefix='/api')
@@ -157,7 +150,8 @@ app.register_blueprint(video_bp, url_prefix='/api/video')
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    queue_info = queue_manager.get_queue_info() if queue_manager else {'available': False}
+    queue_manager = get_queue_manager()
+    queue_info = queue_manager.get_queue_info() if queue_manager else {'available': None, 'initialized': False}
     
     return jsonify({
         'success': True,
@@ -167,11 +161,12 @@ def health_check():
         'features': {
             'database': database_connected,
             'storage': storage_available,
-            'queue': queue_available,
+            'queue': queue_available(),
             'cors': True,
             'file_uploads': True
         },
-        'database_type': 'PostgreSQL' if database_connected and database_url else 'SQLite',
+        'database_type': 'PostgreSQL' if database_connected else 'SQLite',
+        'startup_mode': startup_mode,
         'queue_info': queue_info,
         'file_config': {
             'max_content_length': app.config['MAX_CONTENT_LENGTH'],
@@ -183,6 +178,7 @@ def health_check():
 @app.route('/api/queue/status', methods=['GET'])
 def queue_status():
     """Queue status endpoint"""
+    queue_manager = get_queue_manager()
     if not queue_manager:
         return jsonify({
             'success': False,
@@ -198,7 +194,7 @@ def queue_status():
 # 🚨 Обработчик ошибок для слишком больших файлов
 @app.errorhandler(413)
 def too_large(e):
-    print(f"❌ [DEBUG] File too large error: {e}")
+    logger.warning("❌ File too large: %s", e)
     return jsonify({
         'success': False,
         'error': 'File too large',
@@ -219,7 +215,7 @@ def serve(path):
             'features': {
                 'database': database_connected,
                 'storage': storage_available,
-                'queue': queue_available,
+                'queue': queue_available(),
                 'file_uploads': True
             }
         })
@@ -238,7 +234,7 @@ def serve(path):
                 'features': {
                     'database': database_connected,
                     'storage': storage_available,
-                    'queue': queue_available,
+                    'queue': queue_available(),
                     'file_uploads': True
                 }
             })
@@ -247,12 +243,15 @@ if __name__ == '__main__':
     port = int(os.getenv('PORT', 5000))
     debug = os.getenv('FLASK_ENV') == 'development'
     
-    print(f"🚀 Starting AgentFlow Video Editor Backend on port {port}")
-    print(f"🔧 Debug mode: {debug}")
-    print(f"🗄️ Database: {'PostgreSQL' if database_connected and database_url else 'SQLite (fallback)'}")
-    print(f"📦 Storage: {'Supabase' if storage_available else 'Disabled'}")
-    print(f"🔄 Queue: {'Redis' if queue_available else 'Disabled (sync processing)'}")
-    print(f"📁 File uploads: Enabled (max {app.config['MAX_CONTENT_LENGTH'] // (1024*1024)} MB)")
+    logger.info("🚀 Starting AgentFlow Video Editor Backend on port %s", port)
+    logger.info("🔧 Debug mode: %s, ⚡ Startup mode: %s", debug, startup_mode)
+    logger.info("🗄️ Database: %s", 'PostgreSQL' if database_connected else 'SQLite (fallback)')
+    logger.info("📦 Storage: %s", 'Supabase' if storage_available else 'Disabled')
+    if startup_mode == 'eager':
+        logger.info("🔄 Queue: %s", 'Redis' if queue_available() else 'Local worker pool')
+        logger.info("📡 Events: %s", 'Redis pub/sub' if get_event_broker().mode == 'redis' else 'In-process')
+        logger.info("🗃️ Document cache: %s", 'Redis' if get_document_cache().mode == 'redis' else 'In-process LRU')
+    logger.info("📁 File uploads: Enabled (max %s MB)", app.config['MAX_CONTENT_LENGTH'] // (1024*1024))
     
     app.run(host='0.0.0.0', port=port, debug=debug)
 
@@ -4,11 +4,21 @@ Shared Authentication Middleware для интеграции с ClipsAI
 """
 
 import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
 import jwt
+from jwt.algorithms import has_crypto
 from functools import wraps
 from flask import request, jsonify, g
 from supabase import create_client
 
+from src.config.logging_config import get_logger
+from src.services.metrics import count_cache_lookup
+
+logger = get_logger('auth')
+
 # Инициализация Supabase клиента
 supabase_url = os.getenv('SUPABASE_URL')
 supabase_key = os.getenv('SUPABASE_ANON_KEY')
@@ -19,42 +29,110 @@ if supabase_url and supabase_key:
 else:
     supabase = None
 
+# Асимметричные ключи проекта (JWKS): проверяем подпись локально, ключи кэшируются.
+# RS256/ES256 требуют пакет cryptography; без него остается проверка через Supabase API
+JWKS_ALGORITHMS = ['RS256', 'ES256', 'EdDSA']
+JWKS_CACHE_SECONDS = int(os.getenv('SUPABASE_JWKS_CACHE_SECONDS', '600'))
+
+if supabase_url and has_crypto:
+    jwks_client = jwt.PyJWKClient(
+        f"{supabase_url.rstrip('/')}/auth/v1/.well-known/jwks.json",
+        cache_keys=True,
+        lifespan=JWKS_CACHE_SECONDS,
+        timeout=5
+    )
+else:
+    jwks_client = None
+
+# Проверенные токены: повторный запрос с тем же токеном не проверяет подпись и не ходит в сеть
+TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', '10000'))
+
+
+class TokenCache:
+    """LRU проверенных токенов: sha256(токен) -> (exp, данные пользователя).
+    Запись живет до exp токена; токены без exp не кэшируются."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, expires_at, user_data):
+        if not expires_at or expires_at <= time.time():
+            return
+        with self._lock:
+            self._entries[key] = (expires_at, user_data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+token_cache = TokenCache(TOKEN_CACHE_SIZE)
+
 def verify_token(token):
     """Проверяет JWT токен от Supabase"""
+    cache_key = hashlib.sha256(token.encode('utf-8')).hexdigest()
+    cached = token_cache.get(cache_key)
+    count_cache_lookup('auth_token', cached is not None)
+    if cached is not None:
+        return cached
+    
     try:
-        if not supabase_jwt_secret:
-            # Fallback: проверяем через Supabase API
+        algorithm = jwt.get_unverified_header(token).get('alg')
+        
+        if algorithm == 'HS256' and supabase_jwt_secret:
+            key = supabase_jwt_secret
+        elif algorithm in JWKS_ALGORITHMS and jwks_client:
+            key = jwks_client.get_signing_key_from_jwt(token).key
+        else:
+            # Fallback: проверяем через Supabase API (один раз на токен - дальше из кэша)
             if supabase:
                 response = supabase.auth.get_user(token)
                 if response.user:
-                    return {
+                    user_data = {
                         'user_id': response.user.id,
                         'email': response.user.email,
                         'metadata': response.user.user_metadata
                     }
+                    claims = jwt.decode(token, options={'verify_signature': False})
+                    token_cache.put(cache_key, claims.get('exp'), user_data)
+                    return user_data
             return None
         
         # Декодируем JWT токен
         payload = jwt.decode(
             token, 
-            supabase_jwt_secret, 
-            algorithms=['HS256'],
+            key, 
+            algorithms=[algorithm],
             audience='authenticated'
         )
         
-        return {
+        user_data = {
             'user_id': payload.get('sub'),
             'email': payload.get('email'),
             'role': payload.get('role', 'authenticated'),
             'metadata': payload.get('user_metadata', {})
         }
+        token_cache.put(cache_key, payload.get('exp'), user_data)
+        return user_data
         
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
         return None
     except Exception as e:
-        print(f"Token verification error: {e}")
+        logger.info("Token verification error: %s", e)
         return None
 
 def require_auth(f):
@@ -0,0 +1,189 @@
+"""
+Migrations для AgentFlow Video Editor
+Версионные миграции схемы поверх db.create_all().
+
+Миграция - модуль src/migrations/versions/vNNNN_<name>.py с функцией
+upgrade(connection) и docstring'ом-описанием. Примененные версии хранятся в
+таблице schema_migrations; run_migrations применяет недостающие по порядку,
+каждую в своей транзакции. Миграция с TRANSACTIONAL = False выполняется в
+autocommit (CREATE INDEX CONCURRENTLY в Postgres не работает в транзакции).
+
+Миграции идемпотентны (add_column / create_index проверяют, что объекта еще нет):
+новая БД получает актуальную схему от create_all, а старая догоняет ее миграциями.
+
+Запуск: python -m src.migrations [upgrade|status|check-plans]
+"""
+
+import re
+import pkgutil
+import importlib
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+from sqlalchemy import inspect, text
+
+from src.config.logging_config import get_logger
+
+logger = get_logger('migrations')
+
+MIGRATIONS_TABLE = 'schema_migrations'
+
+# Ключ advisory lock в Postgres: одновременно стартующие процессы не применяют миграции дважды
+ADVISORY_LOCK_ID = 7_331_041
+
+VERSION_PATTERN = re.compile(r'^v(\d{4})_(\w+)$')
+
+
+class Migration:
+    def __init__(self, version: str, name: str, module):
+        self.version = version
+        self.name = name
+        self.module = module
+        self.description = (module.__doc__ or '').strip().split('\n')[0]
+        self.transactional = getattr(module, 'TRANSACTIONAL', True)
+
+    def upgrade(self, connection):
+        self.module.upgrade(connection)
+
+
+def discover_migrations() -> List[Migration]:
+    """Все миграции пакета versions в порядке версий"""
+    from src.migrations import versions
+
+    migrations = []
+    for module_info in pkgutil.iter_modules(versions.__path__):
+        match = VERSION_PATTERN.match(module_info.name)
+        if not match:
+            continue
+        module = importlib.import_module(f'{versions.__name__}.{module_info.name}')
+        migrations.append(Migration(match.group(1), match.group(2), module))
+
+    migrations.sort(key=lambda migration: migration.version)
+
+    versions_seen = [migration.version for migration in migrations]
+    if len(versions_seen) != len(set(versions_seen)):
+        raise RuntimeError(f"Duplicate migration versions: {versions_seen}")
+
+    return migrations
+
+
+def run_migrations(engine) -> List[str]:
+    """Применяет недостающие миграции, возвращает список примененных версий"""
+    applied_now = []
+
+    with engine.connect() as lock_connection:
+        is_postgres = engine.dialect.name == 'postgresql'
+        if is_postgres:
+            lock_connection.execute(text('SELECT pg_advisory_lock(:id)'), {'id': ADVISORY_LOCK_ID})
+
+        try:
+            with engine.begin() as connection:
+                _ensure_migrations_table(connection)
+
+            with engine.connect() as connection:
+                applied = _applied_versions(connection)
+
+            for migration in discover_migrations():
+                if migration.version in applied:
+                    continue
+
+                logger.info("🔧 Applying migration %s_%s: %s", migration.version, migration.name, migration.description)
+
+                if migration.transactional:
+                    with engine.begin() as connection:
+                        migration.upgrade(connection)
+                        _record(connection, migration)
+                else:
+                    with engine.connect() as connection:
+                        connection = connection.execution_options(isolation_level='AUTOCOMMIT')
+                        migration.upgrade(connection)
+                        _record(connection, migration)
+
+                applied_now.append(migration.version)
+        finally:
+            if is_postgres:
+                lock_connection.execute(text('SELECT pg_advisory_unlock(:id)'), {'id': ADVISORY_LOCK_ID})
+                lock_connection.commit()
+
+    if applied_now:
+        logger.info("✅ Applied %s migrations", len(applied_now))
+
+    return applied_now
+
+
+def migration_status(engine) -> List[Dict[str, Any]]:
+    """Все известные миграции и время их применения (None - еще не применена)"""
+    with engine.connect() as connection:
+        if MIGRATIONS_TABLE in inspect(connection).get_table_names():
+            rows = connection.execute(text(f'SELECT version, applied_at FROM {MIGRATIONS_TABLE}')).all()
+        else:
+            rows = []
+
+    applied = {row[0]: row[1] for row in rows}
+    return [
+        {
+            'version': migration.version,
+            'name': migration.name,
+            'description': migration.description,
+            'applied_at': applied.get(migration.version)
+        }
+        for migration in discover_migrations()
+    ]
+
+
+def add_column(connection, table: str, column: str, column_type: str):
+    """ALTER TABLE ... ADD COLUMN, если колонки еще нет"""
+    columns = {info['name'] for info in inspect(connection).get_columns(table)}
+    if column in columns:
+        return False
+
+    connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {column_type}'))
+    return True
+
+
+def create_index(connection, name: str, table: str, columns: List[str], unique: bool = False,
+                 where: Optional[str] = None):
+    """CREATE INDEX IF NOT EXISTS; в Postgres вне транзакции - CONCURRENTLY (без блокировки записи)"""
+    concurrently = (
+        connection.dialect.name == 'postgresql'
+        and connection.get_execution_options().get('isolation_level') == 'AUTOCOMMIT'
+    )
+
+    statement = (
+        f"CREATE {'UNIQUE ' if unique else ''}INDEX {'CONCURRENTLY ' if concurrently else ''}"
+        f"IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"
+    )
+    if where:
+        statement += f' WHERE {where}'
+
+    connection.execute(text(statement))
+
+
+def drop_index(connection, name: str):
+    """DROP INDEX IF EXISTS; в Postgres вне транзакции - CONCURRENTLY"""
+    concurrently = (
+        connection.dialect.name == 'postgresql'
+        and connection.get_execution_options().get('isolation_level') == 'AUTOCOMMIT'
+    )
+
+    connection.execute(text(f"DROP INDEX {'CONCURRENTLY ' if concurrently else ''}IF EXISTS {name}"))
+
+
+def _ensure_migrations_table(connection):
+    connection.execute(text(
+        f'CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} ('
+        'version VARCHAR(16) PRIMARY KEY, '
+        'name VARCHAR(255) NOT NULL, '
+        'applied_at TIMESTAMP NOT NULL)'
+    ))
+
+
+def _applied_versions(connection) -> set:
+    return {row[0] for row in connection.execute(text(f'SELECT version FROM {MIGRATIONS_TABLE}'))}
+
+
+def _record(connection, migration: Migration):
+    connection.execute(
+        text(f'INSERT INTO {MIGRATIONS_TABLE} (version, name, applied_at) VALUES (:version, :name, :applied_at)'),
+        {'version': migration.version, 'name': migration.name, 'applied_at': datetime.utcnow()}
+    )
@@ -0,0 +1,63 @@
+"""
+CLI миграций: python -m src.migrations [upgrade|status|check-plans]
+
+upgrade      - применить недостающие миграции (по умолчанию)
+status       - список миграций и время их применения
+check-plans  - проверить, что запросы API идут по индексам (код выхода 1, если нет)
+"""
+
+import os
+import sys
+
+# Добавляем путь к проекту
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+
+def main(argv):
+    command = argv[1] if len(argv) > 1 else 'upgrade'
+    if command not in ('upgrade', 'status', 'check-plans'):
+        print(__doc__.strip())
+        return 2
+
+    # Приложение поднимаем без проверок и create_all: схемой здесь управляют миграции
+    os.environ.setdefault('STARTUP_MODE', 'lazy')
+    from src.main import app
+    from src.models.video_project import db
+    from src.migrations import run_migrations, migration_status
+    from src.migrations.plan_check import check_query_plans
+
+    with app.app_context():
+        engine = db.engine
+
+        if command == 'upgrade':
+            applied = run_migrations(engine)
+            if not applied:
+                print("✅ Schema is up to date")
+            return 0
+
+        if command == 'status':
+            for migration in migration_status(engine):
+                state = migration['applied_at'] or 'pending'
+                print(f"{migration['version']}_{migration['name']}: {state} - {migration['description']}")
+            return 0
+
+        results = check_query_plans(engine)
+        failed = 0
+        for result in results:
+            mark = '❌' if result['problems'] else '✅'
+            print(f"{mark} {result['name']}")
+            for line in result['plan']:
+                print(f"     {line}")
+            for problem in result['problems']:
+                print(f"     ⚠️ {problem}")
+            failed += bool(result['problems'])
+
+        if failed:
+            print(f"❌ {failed} of {len(results)} queries do not use an index")
+        else:
+            print(f"✅ All {len(results)} queries use indexes")
+        return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,174 @@
+"""
+Query Plan Check для AgentFlow Video Editor
+Проверяет, что основные запросы routes/video.py и выдачи задач персистентной
+очереди (services/db_queue.py) идут по индексам (SQLite и Postgres).
+
+Запросы строятся теми же конструкциями SQLAlchemy, что и в API, и выполняются
+через EXPLAIN (SQLite: EXPLAIN QUERY PLAN, Postgres: EXPLAIN (FORMAT JSON)).
+Запрос не проходит проверку, если план читает таблицу целиком (SCAN без
+индекса / Seq Scan) или сортирует результат отдельно от индекса.
+
+В Postgres на маленьких таблицах планировщик честно предпочитает Seq Scan,
+поэтому проверка выключает его (enable_seqscan/enable_sort = off): так видно,
+может ли запрос вообще использовать индекс.
+"""
+
+import uuid
+from datetime import datetime
+from typing import Dict, Any, List
+
+from sqlalchemy import select, tuple_, text, func
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import Executable, ClauseElement
+
+from src.models.video_project import VideoProject, VideoRender, VideoSession, REUSABLE_RENDER_STATUSES
+from src.services.db_queue import claim_statements
+
+CHECKED_TABLES = ('video_projects', 'video_renders', 'video_sessions', 'background_jobs')
+
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN произвольного select'а с обычной обработкой параметров"""
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain)
+def _compile_explain(element, compiler, **kw):
+    if compiler.dialect.name == 'postgresql':
+        prefix = 'EXPLAIN (FORMAT JSON) '
+    else:
+        prefix = 'EXPLAIN QUERY PLAN '
+    return prefix + compiler.process(element.statement, **kw)
+
+
+def plan_queries() -> Dict[str, Any]:
+    """Запросы API с характерными параметрами"""
+    user_id = 'plan-check-user'
+    project_id = uuid.uuid4()
+    now = datetime.utcnow()
+
+    return {
+        'projects_page': select(VideoProject.id).where(
+            VideoProject.user_id == user_id
+        ).order_by(VideoProject.updated_at.desc(), VideoProject.id.desc()).limit(51),
+
+        'projects_page_after_cursor': select(VideoProject.id).where(
+            VideoProject.user_id == user_id,
+            tuple_(VideoProject.updated_at, VideoProject.id) < (now, project_id)
+        ).order_by(VideoProject.updated_at.desc(), VideoProject.id.desc()).limit(51),
+
+        'processing_projects': select(VideoProject.id).where(
+            VideoProject.user_id == user_id,
+            VideoProject.status == 'processing'
+        ),
+
+        'project_renders': select(VideoRender.id).where(
+            VideoRender.project_id == project_id
+        ).order_by(VideoRender.created_at.desc()),
+
+        # Версия списка рендеров для ETag (get_project_renders)
+        'project_renders_version': select(
+            func.count(VideoRender.id), func.max(VideoRender.updated_at)
+        ).where(VideoRender.project_id == project_id),
+
+        'active_renders': select(VideoRender.id).where(
+            VideoRender.user_id == user_id,
+            VideoRender.status.in_(['queued', 'processing'])
+        ),
+
+        'reusable_render': select(VideoRender.id).where(
+            VideoRender.fingerprint == 'f' * 64,
+            VideoRender.status.in_(REUSABLE_RENDER_STATUSES)
+        ).order_by(VideoRender.created_at.desc()).limit(1),
+
+        'project_sessions': select(VideoSession.id).where(
+            VideoSession.project_id == project_id
+        ).order_by(VideoSession.last_seen.desc()),
+
+        # claim_job: те же запросы кандидатов, что выполняет worker (с fair-share подзапросом)
+        **{
+            f'claim_{name}_jobs': statement
+            for name, statement in claim_statements(
+                ['video_processing', 'video_rendering'], now, max_active_per_user=2
+            ).items()
+        },
+    }
+
+
+def check_query_plans(engine) -> List[Dict[str, Any]]:
+    """План каждого запроса и найденные проблемы ({'name', 'plan', 'problems'})"""
+    results = []
+
+    with engine.connect() as connection:
+        is_postgres = connection.dialect.name == 'postgresql'
+        if is_postgres:
+            connection.execute(text('SET enable_seqscan = off'))
+            connection.execute(text('SET enable_sort = off'))
+
+        try:
+            for name, statement in plan_queries().items():
+                # Строки EXPLAIN читаем напрямую из курсора: типы колонок select'а к ним не относятся
+                result = connection.execute(Explain(statement))
+                rows = result.cursor.fetchall()
+                result.close()
+
+                if is_postgres:
+                    plan = rows[0][0][0]['Plan']
+                    lines = _postgres_plan_lines(plan)
+                    problems = _postgres_problems(plan)
+                else:
+                    lines = [row[3] for row in rows]
+                    problems = _sqlite_problems(lines)
+
+                results.append({'name': name, 'plan': lines, 'problems': problems})
+        finally:
+            if is_postgres:
+                connection.execute(text('RESET enable_seqscan'))
+                connection.execute(text('RESET enable_sort'))
+
+    return results
+
+
+def _sqlite_problems(lines: List[str]) -> List[str]:
+    problems = []
+    for line in lines:
+        # "SCAN video_projects" - полный просмотр; "SCAN ... USING INDEX" и "SEARCH ..." - по индексу
+        if line.startswith('SCAN ') and 'INDEX' not in line:
+            table = line.split()[1]
+            if table in CHECKED_TABLES:
+                problems.append(f'full table scan: {line}')
+        if 'USE TEMP B-TREE' in line:
+            problems.append(f'sort outside index: {line}')
+    return problems
+
+
+def _postgres_problems(plan: Dict[str, Any]) -> List[str]:
+    problems = []
+    for node in _walk(plan):
+        if node.get('Node Type') == 'Seq Scan' and node.get('Relation Name') in CHECKED_TABLES:
+            problems.append(f"sequential scan on {node['Relation Name']}")
+        if node.get('Node Type') in ('Sort', 'Incremental Sort'):
+            problems.append(f"sort outside index: {', '.join(node.get('Sort Key', []))}")
+    return problems
+
+
+def _postgres_plan_lines(plan: Dict[str, Any], depth: int = 0) -> List[str]:
+    line = '  ' * depth + plan.get('Node Type', '?')
+    if plan.get('Index Name'):
+        line += f" using {plan['Index Name']}"
+    if plan.get('Relation Name'):
+        line += f" on {plan['Relation Name']}"
+
+    lines = [line]
+    for child in plan.get('Plans', []):
+        lines.extend(_postgres_plan_lines(child, depth + 1))
+    return lines
+
+
+def _walk(plan: Dict[str, Any]):
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from _walk(child)
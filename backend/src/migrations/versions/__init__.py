@@ -0,0 +1 @@
+"""Версии миграций: vNNNN_<name>.py с функцией upgrade(connection)"""
@@ -0,0 +1,38 @@
+"""Baseline: таблицы моделей и колонки, добавленные после первого деплоя
+
+БД, созданные db.create_all() до появления миграций, не получили колонки,
+добавленные в модели позже (create_all не меняет существующие таблицы).
+"""
+
+from src.migrations import add_column, create_index
+
+# (таблица, колонка, тип) - колонки, которых нет в БД первого деплоя
+ADDED_COLUMNS = [
+    ('video_projects', 'silences', 'JSON'),
+    ('video_projects', 'loudness_stats', 'JSON'),
+    ('video_projects', 'pipeline_state', 'JSON'),
+    ('video_renders', 'loudness_target', 'FLOAT'),
+    ('video_renders', 'fingerprint', 'VARCHAR(64)'),
+    ('video_renders', 'pipeline_state', 'JSON'),
+]
+
+
+def upgrade(connection):
+    from src.models.video_project import db
+    from src.models.background_job import BackgroundJob  # noqa: F401 (регистрирует таблицу в metadata)
+
+    # Недостающие таблицы (новая БД без create_all, например при отдельном запуске миграций)
+    db.metadata.create_all(bind=connection)
+
+    for table, column, column_type in ADDED_COLUMNS:
+        add_column(connection, table, column, column_type)
+
+    # Индекс из __table_args__ VideoRender: в старой БД его нет
+    create_index(
+        connection,
+        'uq_video_renders_fingerprint_active',
+        'video_renders',
+        ['fingerprint'],
+        unique=True,
+        where="status IN ('queued', 'processing', 'completed')"
+    )
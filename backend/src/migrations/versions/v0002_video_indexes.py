@@ -0,0 +1,30 @@
+"""Составные индексы под запросы routes/video.py
+
+Индексы объявлены и в __table_args__ моделей (новые БД получают их от
+create_all); в Postgres миграция строит их CONCURRENTLY, без блокировки записи.
+"""
+
+from src.migrations import create_index
+
+TRANSACTIONAL = False
+
+# (имя, таблица, колонки) - те же, что в __table_args__ моделей
+INDEXES = [
+    # Список проектов: WHERE user_id ORDER BY updated_at DESC, id DESC (+ keyset курсор)
+    ('ix_video_projects_user_updated', 'video_projects', ['user_id', 'updated_at', 'id']),
+    # Снимок SSE: проекты пользователя в обработке
+    ('ix_video_projects_user_status', 'video_projects', ['user_id', 'status']),
+    # Рендеры проекта: WHERE project_id ORDER BY created_at DESC, удаление проекта
+    ('ix_video_renders_project_created', 'video_renders', ['project_id', 'created_at']),
+    # Поиск переиспользуемого рендера по отпечатку (find_reusable_render)
+    ('ix_video_renders_fingerprint_created', 'video_renders', ['fingerprint', 'created_at']),
+    # Активные рендеры пользователя (снимок SSE)
+    ('ix_video_renders_user_status', 'video_renders', ['user_id', 'status']),
+    # Сессии редактора проекта
+    ('ix_video_sessions_project_seen', 'video_sessions', ['project_id', 'last_seen']),
+]
+
+
+def upgrade(connection):
+    for name, table, columns in INDEXES:
+        create_index(connection, name, table, columns)
@@ -0,0 +1,18 @@
+"""VideoRender.updated_at: версия рендера для ETag
+
+Существующие рендеры получают updated_at по последнему известному изменению
+(completed_at, started_at или created_at).
+"""
+
+from sqlalchemy import text
+
+from src.migrations import add_column
+
+
+def upgrade(connection):
+    add_column(connection, 'video_renders', 'updated_at', 'TIMESTAMP')
+
+    connection.execute(text(
+        'UPDATE video_renders SET updated_at = COALESCE(completed_at, started_at, created_at) '
+        'WHERE updated_at IS NULL'
+    ))
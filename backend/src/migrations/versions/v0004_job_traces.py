@@ -0,0 +1,8 @@
+"""Колонка trace у проектов и рендеров: span'ы этапов последних попыток задачи"""
+
+from src.migrations import add_column
+
+
+def upgrade(connection):
+    add_column(connection, 'video_projects', 'trace', 'JSON')
+    add_column(connection, 'video_renders', 'trace', 'JSON')
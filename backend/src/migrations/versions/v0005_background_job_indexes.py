@@ -0,0 +1,23 @@
+"""Индексы персистентной очереди задач (background_jobs) под claim_job
+
+Индексы объявлены и в __table_args__ BackgroundJob; в Postgres миграция строит
+их CONCURRENTLY, без блокировки записи.
+"""
+
+from src.migrations import create_index
+
+TRANSACTIONAL = False
+
+# (имя, таблица, колонки) - те же, что в __table_args__ модели
+INDEXES = [
+    # Очередные задачи: WHERE status, queue IN, run_at <= now ORDER BY priority, run_at, created_at
+    # (заменен ix_background_jobs_queued в v0007)
+    ('ix_background_jobs_claim', 'background_jobs', ['status', 'queue', 'priority', 'run_at', 'created_at']),
+    # Задачи с истекшим lease и активные задачи пользователей (fair-share)
+    ('ix_background_jobs_lease', 'background_jobs', ['status', 'lease_expires_at']),
+]
+
+
+def upgrade(connection):
+    for name, table, columns in INDEXES:
+        create_index(connection, name, table, columns)
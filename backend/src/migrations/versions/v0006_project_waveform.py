@@ -0,0 +1,7 @@
+"""Колонка waveform у проектов: пики, посчитанные при ingest"""
+
+from src.migrations import add_column
+
+
+def upgrade(connection):
+    add_column(connection, 'video_projects', 'waveform', 'JSON')
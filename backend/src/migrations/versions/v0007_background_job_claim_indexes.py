@@ -0,0 +1,23 @@
+"""Индексы claim_job под раздельные запросы кандидатов (db_queue.claim_statements)
+
+Очередные задачи выбираются по (status, priority, run_at, created_at) в порядке
+выдачи для любого набора очередей; прежний ix_background_jobs_claim с queue
+перед priority требовал отдельной сортировки. Подзапрос fair-share группирует
+активные задачи по user_id по индексу (status, user_id, lease_expires_at).
+"""
+
+from src.migrations import create_index, drop_index
+
+TRANSACTIONAL = False
+
+# (имя, таблица, колонки) - те же, что в __table_args__ модели
+INDEXES = [
+    ('ix_background_jobs_queued', 'background_jobs', ['status', 'priority', 'run_at', 'created_at']),
+    ('ix_background_jobs_active_users', 'background_jobs', ['status', 'user_id', 'lease_expires_at']),
+]
+
+
+def upgrade(connection):
+    for name, table, columns in INDEXES:
+        create_index(connection, name, table, columns)
+    drop_index(connection, 'ix_background_jobs_claim')
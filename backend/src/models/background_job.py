@@ -0,0 +1,61 @@
+from datetime import datetime
+
+from src.models.video_project import db
+
+class BackgroundJob(db.Model):
+    __tablename__ = 'background_jobs'
+    __table_args__ = (
+        # claim_job: очередные задачи в порядке выдачи, задачи с истекшим lease
+        # и активные задачи пользователей (fair-share)
+        db.Index('ix_background_jobs_queued', 'status', 'priority', 'run_at', 'created_at'),
+        db.Index('ix_background_jobs_lease', 'status', 'lease_expires_at'),
+        db.Index('ix_background_jobs_active_users', 'status', 'user_id', 'lease_expires_at'),
+    )
+
+    id = db.Column(db.String(100), primary_key=True)  # job_id, например process_<project_id>
+    queue = db.Column(db.String(50), nullable=False)
+    func = db.Column(db.String(255), nullable=False)
+    args = db.Column(db.JSON, default=list)
+    meta = db.Column(db.JSON, default=dict)
+    user_id = db.Column(db.String(36))
+    priority = db.Column(db.Integer, default=0)  # меньше - раньше
+
+    # Status
+    status = db.Column(db.String(20), default='queued')  # queued, started, finished, failed, canceled
+    attempts = db.Column(db.Integer, default=0)
+    max_attempts = db.Column(db.Integer, default=3)
+    timeout = db.Column(db.Integer, default=1800)  # секунды
+
+    # Scheduling / lease
+    run_at = db.Column(db.DateTime, default=datetime.utcnow)
+    lease_owner = db.Column(db.String(100))
+    lease_expires_at = db.Column(db.DateTime)
+
+    # Output
+    result = db.Column(db.JSON)
+    last_error = db.Column(db.Text)
+
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    ended_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'queue': self.queue,
+            'func': self.func,
+            'args': self.args,
+            'user_id': self.user_id,
+            'priority': self.priority,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'run_at': self.run_at.isoformat() if self.run_at else None,
+            'lease_owner': self.lease_owner,
+            'lease_expires_at': self.lease_expires_at.isoformat() if self.lease_expires_at else None,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'ended_at': self.ended_at.isoformat() if self.ended_at else None
+        }
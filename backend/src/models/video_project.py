@@ -1,12 +1,49 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 import uuid
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.types import TypeDecorator
 
 db = SQLAlchemy()
 
+# Статусы рендера, результат которых можно переиспользовать для идентичного запроса
+REUSABLE_RENDER_STATUSES = ('queued', 'processing', 'completed')
+
+# Поля проекта, доступные в списках (fields=), и набор по умолчанию: без больших JSON колонок
+PROJECT_LIST_FIELDS = (
+    'id', 'user_id', 'name', 'description', 'original_url', 'proxy_url', 'thumbnail_url',
+    'duration', 'resolution', 'file_size', 'status', 'transcript', 'subtitle_styles',
+    'silences', 'loudness_stats', 'created_at', 'updated_at'
+)
+PROJECT_SUMMARY_FIELDS = (
+    'id', 'user_id', 'name', 'status', 'thumbnail_url', 'duration', 'resolution', 'file_size',
+    'created_at', 'updated_at'
+)
+
+class UUID(TypeDecorator):
+    """UUID колонка, принимающая и строковые id (иначе на SQLite fallback запросы по id падают)"""
+    impl = PG_UUID
+    cache_ok = True
+    
+    def __init__(self, as_uuid=True):
+        super().__init__(as_uuid=as_uuid)
+    
+    def process_bind_param(self, value, dialect):
+        if isinstance(value, str):
+            try:
+                return uuid.UUID(value)
+            except ValueError:
+                # Невалидный id не совпадет ни с одной строкой
+                return None
+        return value
+
 class VideoProject(db.Model):
     __tablename__ = 'video_projects'
+    __table_args__ = (
+        # Список проектов пользователя: сортировка и keyset курсор по (updated_at, id)
+        db.Index('ix_video_projects_user_updated', 'user_id', 'updated_at', 'id'),
+        db.Index('ix_video_projects_user_status', 'user_id', 'status'),
+    )
     
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = db.Column(db.String(36), nullable=False)
@@ -24,12 +61,20 @@ class VideoProject(db.Model):
     file_size = db.Column(db.BigInteger)
     
     # Processing status
-    status = db.Column(db.String(20), default='uploading')  # uploading, processing, ready, error
+    status = db.Column(db.String(20), default='uploading')  # uploading, processing, ready, error, cancelling, cancelled
     
     # Content
     transcript = db.Column(db.JSON, default=list)
     subtitle_styles = db.Column(db.JSON, default=dict)
     
+    # Audio analysis
+    silences = db.Column(db.JSON)  # [{start, end, duration}], None пока анализ не выполнен
+    # Пики waveform с ingest (см. VideoProcessor._generate_waveform); большой - грузится только по запросу
+    waveform = db.deferred(db.Column(db.JSON))
+    loudness_stats = db.Column(db.JSON)  # замер loudnorm при ingest: input_i, input_tp, input_lra, input_thresh
+    pipeline_state = db.Column(db.JSON)  # checkpoint'ы этапов ingest (см. workers/pipeline.py)
+    trace = db.Column(db.JSON)  # span'ы этапов последних попыток ingest (см. workers/tracing.py)
+    
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -49,12 +94,43 @@ class VideoProject(db.Model):
             'status': self.status,
             'transcript': self.transcript,
             'subtitle_styles': self.subtitle_styles,
+            'silences': self.silences,
+            'loudness_stats': self.loudness_stats,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+    
+    def to_summary_dict(self, fields=PROJECT_SUMMARY_FIELDS):
+        """Облегченное представление для списков: обращается только к полям fields,
+        поэтому не подгружает колонки, отложенные запросом (load_only)"""
+        data = {}
+        for field in fields:
+            value = getattr(self, field)
+            if field == 'id':
+                value = str(value)
+            elif isinstance(value, datetime):
+                value = value.isoformat()
+            data[field] = value
+        return data
 
 class VideoRender(db.Model):
     __tablename__ = 'video_renders'
+    __table_args__ = (
+        # Не больше одного активного/готового рендера на отпечаток: закрывает гонку двойных кликов
+        db.Index(
+            'uq_video_renders_fingerprint_active',
+            'fingerprint',
+            unique=True,
+            postgresql_where=db.text("status IN ('queued', 'processing', 'completed')"),
+            sqlite_where=db.text("status IN ('queued', 'processing', 'completed')")
+        ),
+        # Поиск переиспользуемого рендера: частичный индекс выше планировщик не может
+        # применить к запросу со status IN (параметры)
+        db.Index('ix_video_renders_fingerprint_created', 'fingerprint', 'created_at'),
+        # Рендеры проекта по дате и активные рендеры пользователя
+        db.Index('ix_video_renders_project_created', 'project_id', 'created_at'),
+        db.Index('ix_video_renders_user_status', 'user_id', 'status'),
+    )
     
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     project_id = db.Column(UUID(as_uuid=True), db.ForeignKey('video_projects.id'), nullable=False)
@@ -65,20 +141,25 @@ class VideoRender(db.Model):
     quality = db.Column(db.String(20), default='medium')
     resolution = db.Column(db.String(20))
     include_subtitles = db.Column(db.Boolean, default=True)
+    loudness_target = db.Column(db.Float)  # LUFS, None - без нормализации
+    fingerprint = db.Column(db.String(64))  # sha256 состояния проекта и настроек (см. routes/video.py)
     
     # Status
-    status = db.Column(db.String(20), default='queued')  # queued, processing, completed, failed
+    status = db.Column(db.String(20), default='queued')  # queued, processing, completed, failed, cancelling, cancelled
     progress = db.Column(db.Integer, default=0)
     
     # Output
     output_url = db.Column(db.Text)
     output_size = db.Column(db.BigInteger)
     error_message = db.Column(db.Text)
+    pipeline_state = db.Column(db.JSON)  # checkpoint'ы этапов рендера (см. workers/pipeline.py)
+    trace = db.Column(db.JSON)  # span'ы этапов последних попыток рендера (см. workers/tracing.py)
     
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     started_at = db.Column(db.DateTime)
     completed_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # версия для ETag
     
     # Relationship
     project = db.relationship('VideoProject', backref='renders')
@@ -92,6 +173,8 @@ class VideoRender(db.Model):
             'quality': self.quality,
             'resolution': self.resolution,
             'include_subtitles': self.include_subtitles,
+            'loudness_target': self.loudness_target,
+            'fingerprint': self.fingerprint,
             'status': self.status,
             'progress': self.progress,
             'output_url': self.output_url,
@@ -99,11 +182,15 @@ class VideoRender(db.Model):
             'error_message': self.error_message,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'started_at': self.started_at.isoformat() if self.started_at else None,
-            'completed_at': self.completed_at.isoformat() if self.completed_at else None
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
 class VideoSession(db.Model):
     __tablename__ = 'video_sessions'
+    __table_args__ = (
+        db.Index('ix_video_sessions_project_seen', 'project_id', 'last_seen'),
+    )
     
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     project_id = db.Column(UUID(as_uuid=True), db.ForeignKey('video_projects.id'), nullable=False)
@@ -1,21 +1,70 @@
-from flask import Blueprint, request, jsonify, send_file, Response, make_response
+from flask import Blueprint, request, jsonify, send_file, Response, make_response, redirect
 from flask_cors import cross_origin
 from werkzeug.utils import secure_filename
-from datetime import datetime
+from werkzeug.security import safe_join
+from werkzeug.exceptions import RequestedRangeNotSatisfiable
+from datetime import datetime, timezone
 import os
 import uuid
 import json
+import logging
 import random
-import math
+import hashlib
+import base64
+import mimetypes
+from sqlalchemy import tuple_, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import load_only
 
-from src.models.video_project import db, VideoProject, VideoRender, VideoSession
+from src.models.video_project import (
+    db, VideoProject, VideoRender, VideoSession, REUSABLE_RENDER_STATUSES,
+    PROJECT_LIST_FIELDS, PROJECT_SUMMARY_FIELDS
+)
+from src.services.events import get_event_broker, publish_event
+from src.services.cache import get_document_cache, invalidate_on_commit, DOCUMENT_KINDS
+from src.config.logging_config import get_logger
 
 video_bp = Blueprint('video', __name__)
+logger = get_logger('video')
 
 # Конфигурация
 UPLOAD_FOLDER = '/tmp/video_uploads'
 ALLOWED_EXTENSIONS = {'mp4', 'mov', 'avi', 'webm', 'mkv'}
 MAX_FILE_SIZE = 500 * 1024 * 1024  # 500MB
+MIN_LOUDNESS_TARGET = -70.0
+MAX_LOUDNESS_TARGET = -5.0
+
+# Размер страницы списка проектов (limit=)
+PROJECT_PAGE_SIZE = 50
+MAX_PROJECT_PAGE_SIZE = 200
+
+# Лимиты пакетных запросов (/renders/batch, /renders/status)
+MAX_BATCH_RENDERS = 100
+MAX_STATUS_IDS = 200
+
+# Conditional GET: опрос редактора ревалидирует ответы по ETag и получает 304 без тела.
+# ETAG_SCHEMA_VERSION увеличивается при изменении формата to_dict
+ETAG_SCHEMA_VERSION = 1
+REVALIDATE_CACHE_CONTROL = 'private, no-cache'
+WAVEFORM_CACHE_CONTROL = 'private, max-age=60'
+
+# Локальные файлы (/files/): оригиналы (<uuid>_<имя>) и рендеры (render_<id>) не меняются
+# после записи и кэшируются навсегда; proxy и thumbnail проекта перезаписываются при
+# повторной обработке и ревалидируются по ETag
+IMMUTABLE_FILE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+DERIVED_FILE_SUFFIXES = ('_720p.mp4', '_thumb.jpg')
+
+# Время жизни подписанной ссылки на скачивание рендера из storage (секунд)
+RENDER_DOWNLOAD_URL_TTL = int(os.getenv('RENDER_DOWNLOAD_URL_TTL', '300'))
+LOCAL_FILES_URL_PREFIX = '/api/video/files/'
+
+# Отдача файлов без Python: nginx location с internal + alias на UPLOAD_FOLDER
+# (X-Accel-Redirect); Apache/lighttpd - USE_X_SENDFILE=true в main.py
+LOCAL_FILES_ACCEL_PREFIX = os.getenv('LOCAL_FILES_ACCEL_PREFIX')
+
+# SSE: интервал keep-alive комментариев и задержка переподключения клиента
+EVENTS_HEARTBEAT_SECONDS = 15
+EVENTS_RETRY_MS = 3000
 
 # Создаем папку для загрузок
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
@@ -32,33 +81,207 @@ def get_user_id():
         user_id = 'demo-user-' + str(uuid.uuid4())[:8]
     return user_id
 
+def get_queue():
+    """Получить queue manager (инициализируется при первом обращении, если main.py этого не сделал)"""
+    from src.services.queue_service import get_queue_manager, init_queue_manager
+    return get_queue_manager() or init_queue_manager()
+
+def compute_render_fingerprint(project, settings):
+    """Отпечаток рендера: все, от чего зависит результат (состояние проекта и настройки)"""
+    payload = {
+        'project_id': str(project.id),
+        'source': project.original_url,
+        'transcript': project.transcript,
+        'subtitle_styles': project.subtitle_styles,
+        'loudness_stats': project.loudness_stats,
+        'settings': settings
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+def find_reusable_render(fingerprint):
+    """Найти рендер с тем же отпечатком, который выполняется или уже готов"""
+    if not fingerprint:
+        return None
+    
+    return VideoRender.query.filter(
+        VideoRender.fingerprint == fingerprint,
+        VideoRender.status.in_(REUSABLE_RENDER_STATUSES)
+    ).order_by(VideoRender.created_at.desc()).first()
+
+def encode_project_cursor(project):
+    """Курсор списка проектов: позиция (updated_at, id) последнего элемента страницы"""
+    payload = json.dumps([project.updated_at.isoformat(), str(project.id)])
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_project_cursor(cursor):
+    """(updated_at, id) из курсора; ValueError для поврежденного курсора"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        updated_at, project_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(updated_at), str(uuid.UUID(project_id))
+    except (TypeError, ValueError, UnicodeError):
+        raise ValueError('Invalid cursor')
+
+def parse_project_fields(value):
+    """Поля из параметра fields= (по умолчанию краткий набор); ValueError для неизвестных"""
+    if not value:
+        return PROJECT_SUMMARY_FIELDS
+    
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in PROJECT_LIST_FIELDS]
+    if unknown:
+        raise ValueError(f'Unknown fields: {", ".join(unknown)}')
+    
+    # id нужен всегда: по нему клиент открывает проект
+    return tuple(dict.fromkeys(['id'] + fields))
+
+def make_etag(*parts):
+    """ETag из частей версии ресурса (тип, id, updated_at, ...)"""
+    payload = json.dumps([ETAG_SCHEMA_VERSION, *parts], default=str, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+def with_cache_headers(response, etag, last_modified=None, cache_control=REVALIDATE_CACHE_CONTROL):
+    """ETag, Last-Modified и Cache-Control ответа; ответ зависит от пользователя из заголовков"""
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified.replace(microsecond=0, tzinfo=timezone.utc)
+    response.headers['Cache-Control'] = cache_control
+    response.vary.update(('X-User-ID', 'Authorization'))
+    return response
+
+def not_modified(etag, last_modified=None, cache_control=REVALIDATE_CACHE_CONTROL):
+    """304, если у клиента актуальная версия (If-None-Match, иначе If-Modified-Since); None - нужен полный ответ"""
+    if request.if_none_match:
+        fresh = request.if_none_match.contains_weak(etag)
+    elif last_modified and request.if_modified_since:
+        fresh = last_modified.replace(microsecond=0, tzinfo=timezone.utc) <= request.if_modified_since
+    else:
+        fresh = False
+    
+    if not fresh:
+        return None
+    return with_cache_headers(Response(status=304), etag, last_modified, cache_control)
+
+def load_document(model, object_id):
+    """to_dict() объекта для кэша документов (None, если объекта нет)"""
+    instance = model.query.filter_by(id=object_id).first()
+    return instance.to_dict() if instance else None
+
+def parse_document_time(value):
+    """datetime из ISO строки документа (to_dict)"""
+    return datetime.fromisoformat(value) if value else None
+
+def is_immutable_file(filename):
+    """Файл с уникальным именем, содержимое которого не меняется после записи"""
+    if filename.startswith('render_'):
+        return True
+    prefix, _, _ = filename.partition('_')
+    try:
+        uuid.UUID(prefix)
+    except ValueError:
+        return False
+    return not filename.endswith(DERIVED_FILE_SUFFIXES)
+
+def send_local_file(filename, as_attachment=False, download_name=None):
+    """Отдает файл из UPLOAD_FOLDER: Range/206, ETag и Last-Modified (If-None-Match,
+    If-Range), Cache-Control по типу файла. Тело не читается в память: отдает
+    фронтовой сервер (X-Accel-Redirect / X-Sendfile) или wsgi.file_wrapper (sendfile)."""
+    file_path = safe_join(UPLOAD_FOLDER, filename)
+    if not file_path or not os.path.isfile(file_path):
+        return jsonify({'success': False, 'error': 'File not found'}), 404
+    
+    immutable = is_immutable_file(filename)
+    
+    if LOCAL_FILES_ACCEL_PREFIX:
+        # Range, ETag и sendfile обрабатывает nginx
+        response = Response(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+        response.headers['X-Accel-Redirect'] = LOCAL_FILES_ACCEL_PREFIX.rstrip('/') + '/' + filename
+        if as_attachment:
+            response.headers.set('Content-Disposition', 'attachment', filename=download_name or filename)
+    else:
+        response = send_file(
+            file_path,
+            as_attachment=as_attachment,
+            download_name=download_name,
+            conditional=True,
+            etag=True
+        )
+    
+    if immutable:
+        response.headers['Cache-Control'] = IMMUTABLE_FILE_CACHE_CONTROL
+    else:
+        response.headers['Cache-Control'] = 'public, no-cache'
+    response.headers['Accept-Ranges'] = 'bytes'
+    return response
+
+def find_reusable_renders(fingerprints):
+    """find_reusable_render для пачки отпечатков одним запросом: {отпечаток: рендер}"""
+    fingerprints = {fingerprint for fingerprint in fingerprints if fingerprint}
+    if not fingerprints:
+        return {}
+    
+    renders = VideoRender.query.filter(
+        VideoRender.fingerprint.in_(fingerprints),
+        VideoRender.status.in_(REUSABLE_RENDER_STATUSES)
+    ).order_by(VideoRender.created_at.asc()).all()
+    
+    # Более новые рендеры перезаписывают старые
+    return {render.fingerprint: render for render in renders}
+
+def parse_render_settings(data, project):
+    """Настройки рендера из тела запроса: (settings, None) или (None, ошибка валидации)"""
+    # Целевая громкость (LUFS), опционально
+    loudness_target = data.get('loudness_target')
+    if loudness_target is not None:
+        try:
+            loudness_target = float(loudness_target)
+        except (TypeError, ValueError):
+            loudness_target = None
+        if loudness_target is None or not (MIN_LOUDNESS_TARGET <= loudness_target <= MAX_LOUDNESS_TARGET):
+            return None, f'loudness_target must be between {MIN_LOUDNESS_TARGET} and {MAX_LOUDNESS_TARGET} LUFS'
+    
+    return {
+        'format': data.get('format', 'mp4'),
+        'quality': data.get('quality', 'medium'),
+        'resolution': data.get('resolution', project.resolution),
+        'include_subtitles': data.get('include_subtitles', True),
+        'loudness_target': loudness_target
+    }, None
+
+def reused_render_response(render):
+    """Ответ start_render для присоединенного или переиспользованного рендера"""
+    return jsonify({
+        'success': True,
+        'render_id': render.id,
+        'status': render.status,
+        'output_url': render.output_url,
+        'reused': render.status == 'completed',
+        'coalesced': render.status != 'completed'
+    })
+
 def upload_to_storage(file_path, filename):
     """Загрузить файл в Supabase Storage"""
-    print(f"🔍 [DEBUG] Starting upload_to_storage for file: {filename}")
-    print(f"🔍 [DEBUG] File path: {file_path}")
-    print(f"🔍 [DEBUG] File exists: {os.path.exists(file_path)}")
+    logger.debug("🔍 upload_to_storage: %s (%s)", filename, file_path)
     
     if not os.path.exists(file_path):
-        print(f"❌ [DEBUG] File does not exist: {file_path}")
+        logger.error("❌ File does not exist: %s", file_path)
         return None
     
     try:
         from src.services.storage_service import get_storage_client
         storage = get_storage_client()
         
-        print(f"🔍 [DEBUG] Storage client initialized: {storage is not None}")
-        
         if storage:
             with open(file_path, 'rb') as f:
                 file_content = f.read()
             
-            print(f"🔍 [DEBUG] File content read. Size: {len(file_content)} bytes")
             
             # Используем правильный bucket name
             bucket_name = "video-editor"
             file_path_in_storage = f"videos/{filename}"
             
-            print(f"🔍 [DEBUG] Uploading to bucket: {bucket_name}, path: {file_path_in_storage}")
+            logger.debug("🔍 Uploading %s bytes to %s/%s", len(file_content), bucket_name, file_path_in_storage)
             
             try:
                 result = storage.from_(bucket_name).upload(
@@ -70,60 +293,27 @@ def upload_to_storage(file_path, filename):
                     }
                 )
                 
-                print(f"🔍 [DEBUG] Supabase upload result: {result}")
-                
                 if result:
                     public_url = storage.from_(bucket_name).get_public_url(file_path_in_storage)
-                    print(f"✅ [DEBUG] File uploaded to Supabase. Public URL: {public_url}")
+                    logger.info("✅ File uploaded to Supabase: %s", file_path_in_storage)
                     return public_url
                 else:
-                    print(f"❌ [DEBUG] Supabase upload failed. Result: {result}")
+                    logger.error("❌ Supabase upload failed. Result: %s", result)
                     
-            except Exception as upload_error:
-                print(f"❌ [DEBUG] Supabase upload exception: {upload_error}")
-                import traceback
-                print(f"❌ [DEBUG] Upload traceback: {traceback.format_exc()}")
+            except Exception:
+                logger.exception("❌ Supabase upload exception")
                 
         else:
-            print("❌ [DEBUG] Supabase storage client not available.")
+            logger.debug("Supabase storage client not available")
         
         # Fallback - возвращаем локальный путь (ВРЕМЕННО для отладки)
-        print(f"🔄 [DEBUG] Using fallback local path for: {filename}")
+        logger.info("🔄 Using fallback local path for: %s", filename)
         return f"/api/video/files/{filename}"
         
-    except Exception as e:
-        print(f"❌ [DEBUG] Error during upload_to_storage: {e}")
-        import traceback
-        print(f"❌ [DEBUG] Full traceback: {traceback.format_exc()}")
+    except Exception:
+        logger.exception("❌ Error during upload_to_storage")
         return f"/api/video/files/{filename}"
 
-def generate_waveform_data(duration=60):
-    """Генерировать реалистичные waveform данные"""
-    sample_rate = 8000
-    samples_per_pixel = 160
-    length = int(duration * sample_rate / samples_per_pixel)
-    
-    # Генерируем реалистичные данные с вариациями
-    data = []
-    for i in range(length):
-        # Базовый уровень с вариациями
-        base = 0.3 + 0.2 * math.sin(i * 0.01)
-        # Добавляем случайные пики
-        if random.random() < 0.1:
-            base += random.uniform(0.3, 0.7)
-        # Нормализуем
-        data.append(max(0, min(1, base + random.uniform(-0.1, 0.1))))
-    
-    return {
-        'version': 2,
-        'channels': 1,
-        'sample_rate': sample_rate,
-        'samples_per_pixel': samples_per_pixel,
-        'bits': 8,
-        'length': length,
-        'data': data
-    }
-
 def simulate_video_processing(file_path):
     """Симуляция обработки видео для получения метаданных"""
     # В реальном проекте здесь был бы FFmpeg
@@ -142,18 +332,49 @@ def simulate_video_processing(file_path):
 @video_bp.route('/projects', methods=['GET'])
 @cross_origin()
 def get_projects():
-    """Получить список проектов пользователя"""
+    """Получить список проектов пользователя.
+    
+    Страница по limit= (по умолчанию PROJECT_PAGE_SIZE) в порядке updated_at, id по
+    убыванию; следующая страница - ?cursor=<next_cursor>. fields= выбирает поля
+    (по умолчанию краткий набор без transcript/subtitle_styles), остальные колонки
+    не читаются из БД.
+    """
     try:
         user_id = get_user_id()
         
-        projects = VideoProject.query.filter_by(user_id=user_id).order_by(
-            VideoProject.updated_at.desc()
-        ).all()
+        try:
+            fields = parse_project_fields(request.args.get('fields'))
+            limit = min(max(int(request.args.get('limit', PROJECT_PAGE_SIZE)), 1), MAX_PROJECT_PAGE_SIZE)
+            cursor = request.args.get('cursor')
+            position = decode_project_cursor(cursor) if cursor else None
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        # updated_at и id нужны для курсора, даже если их не запросили
+        columns = dict.fromkeys(fields + ('id', 'updated_at'))
+        query = VideoProject.query.options(
+            load_only(*[getattr(VideoProject, column) for column in columns])
+        ).filter(VideoProject.user_id == user_id)
+        
+        # Keyset: строки строго после последнего элемента предыдущей страницы.
+        # Сравнение кортежей индекс (user_id, updated_at, id) отрабатывает как seek
+        if position:
+            query = query.filter(tuple_(VideoProject.updated_at, VideoProject.id) < position)
+        
+        projects = query.order_by(
+            VideoProject.updated_at.desc(),
+            VideoProject.id.desc()
+        ).limit(limit + 1).all()
+        
+        has_more = len(projects) > limit
+        projects = projects[:limit]
         
         return jsonify({
             'success': True,
-            'projects': [project.to_dict() for project in projects],
-            'total': len(projects)
+            'projects': [project.to_summary_dict(fields) for project in projects],
+            'next_cursor': encode_project_cursor(projects[-1]) if has_more else None,
+            'has_more': has_more,
+            'limit': limit
         })
         
     except Exception as e:
@@ -167,14 +388,12 @@ def get_projects():
 def create_project():
     """Создать новый проект с улучшенной обработкой FormData"""
     try:
-        print(f"🔍 [DEBUG] === CREATE PROJECT STARTED ===")
-        print(f"🔍 [DEBUG] Request method: {request.method}")
-        print(f"🔍 [DEBUG] Content-Type: {request.content_type}")
-        print(f"🔍 [DEBUG] Request files keys: {list(request.files.keys())}")
-        print(f"🔍 [DEBUG] Request form keys: {list(request.form.keys())}")
-        
         user_id = get_user_id()
-        print(f"🔍 [DEBUG] User ID: {user_id}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "🔍 create_project: user=%s, content_type=%s, files=%s, form=%s",
+                user_id, request.content_type, list(request.files.keys()), list(request.form.keys())
+            )
         
         # Ищем файл под разными возможными именами
         file = None
@@ -185,30 +404,27 @@ def create_project():
             if field_name in request.files:
                 file = request.files[field_name]
                 file_field_name = field_name
-                print(f"🔍 [DEBUG] Found file in field: {field_name}")
                 break
         
         if not file:
-            print(f"❌ [DEBUG] No video file found in any field")
+            logger.info("❌ No video file found in any field")
             return jsonify({
                 'success': False,
                 'error': 'No video file provided',
                 'available_fields': list(request.files.keys())
             }), 400
         
-        print(f"🔍 [DEBUG] File field name: {file_field_name}")
-        print(f"🔍 [DEBUG] File filename: {file.filename}")
-        print(f"🔍 [DEBUG] File content type: {file.content_type}")
+        logger.debug("🔍 File field '%s': filename=%s, content_type=%s", file_field_name, file.filename, file.content_type)
         
         if file.filename == '':
-            print(f"❌ [DEBUG] Empty filename")
+            logger.info("❌ Empty filename")
             return jsonify({
                 'success': False,
                 'error': 'No file selected'
             }), 400
         
         if not allowed_file(file.filename):
-            print(f"❌ [DEBUG] File type not allowed: {file.filename}")
+            logger.info("❌ File type not allowed: %s", file.filename)
             return jsonify({
                 'success': False,
                 'error': f'File type not allowed. Supported: {", ".join(ALLOWED_EXTENSIONS)}'
@@ -219,15 +435,14 @@ def create_project():
         unique_filename = f"{uuid.uuid4()}_{filename}"
         file_path = os.path.join(UPLOAD_FOLDER, unique_filename)
         
-        print(f"🔍 [DEBUG] Saving file to: {file_path}")
         file.save(file_path)
         
         # Проверяем размер файла
         file_size = os.path.getsize(file_path)
-        print(f"🔍 [DEBUG] File saved. Size: {file_size} bytes")
+        logger.debug("🔍 File saved to %s (%s bytes)", file_path, file_size)
         
         if file_size > MAX_FILE_SIZE:
-            print(f"❌ [DEBUG] File too large: {file_size} > {MAX_FILE_SIZE}")
+            logger.info("❌ File too large: %s > %s", file_size, MAX_FILE_SIZE)
             os.remove(file_path)
             return jsonify({
                 'success': False,
@@ -235,24 +450,17 @@ def create_project():
             }), 400
         
         # Обрабатываем видео
-        print(f"🔍 [DEBUG] Processing video metadata...")
         metadata = simulate_video_processing(file_path)
-        print(f"🔍 [DEBUG] Video metadata: {metadata}")
+        logger.debug("🔍 Video metadata: %s", metadata)
         
         # Загружаем в storage
-        print(f"🔍 [DEBUG] Starting upload to storage...")
         original_url = upload_to_storage(file_path, unique_filename)
-        print(f"🔍 [DEBUG] Upload to storage completed. URL: {original_url}")
         
         # Получаем данные из формы
         project_name = request.form.get('name', filename.rsplit('.', 1)[0])
         project_description = request.form.get('description', '')
         
-        print(f"🔍 [DEBUG] Project name: {project_name}")
-        print(f"🔍 [DEBUG] Project description: {project_description}")
-        
         # Создаем проект
-        print(f"🔍 [DEBUG] Creating project in database...")
         project = VideoProject(
             user_id=user_id,
             name=project_name,
@@ -261,32 +469,40 @@ def create_project():
             duration=metadata['duration'],
             resolution=metadata['resolution'],
             file_size=metadata['file_size'],
-            status='ready'
+            status='processing'
         )
         
         db.session.add(project)
         db.session.commit()
         
-        print(f"✅ [DEBUG] Project created successfully. ID: {project.id}")
+        logger.info("✅ Project created: %s", project.id, extra={'project_id': str(project.id), 'file_size': file_size})
         
-        # Удаляем временный файл
-        try:
-            os.remove(file_path)
-            print(f"🔍 [DEBUG] Temporary file removed: {file_path}")
-        except Exception as cleanup_error:
-            print(f"⚠️ [DEBUG] Could not remove temporary file: {cleanup_error}")
-        
-        print(f"🔍 [DEBUG] === CREATE PROJECT COMPLETED ===")
+        # Удаляем временный файл (если он не служит локальным fallback хранилищем)
+        if not original_url.startswith('/api/video/files/'):
+            try:
+                os.remove(file_path)
+            except Exception as cleanup_error:
+                logger.warning("⚠️ Could not remove temporary file %s: %s", file_path, cleanup_error)
+        
+        # Ставим обработку (proxy, thumbnail, waveform, анализ аудио) в очередь
+        job_id = get_queue().enqueue_video_processing(str(project.id), user_id=user_id)
+        if not job_id:
+            project.status = 'error'
+            db.session.commit()
+            return jsonify({
+                'success': False,
+                'error': 'Processing queue is full, retry later',
+                'project': project.to_dict()
+            }), 503
         
         return jsonify({
             'success': True,
-            'project': project.to_dict()
+            'project': project.to_dict(),
+            'job_id': job_id
         })
         
     except Exception as e:
-        print(f"❌ [DEBUG] Error in create_project: {e}")
-        import traceback
-        print(f"❌ [DEBUG] Full traceback: {traceback.format_exc()}")
+        logger.exception("❌ Error in create_project")
         return jsonify({
             'success': False,
             'error': str(e)
@@ -299,15 +515,22 @@ def get_project(project_id):
     try:
         user_id = get_user_id()
         
-        project = VideoProject.query.filter_by(id=project_id, user_id=user_id).first()
+        # Документ из кэша (Redis/LRU), в БД идем только при промахе
+        project = get_document_cache().get_or_load('project', project_id, lambda: load_document(VideoProject, project_id))
         
-        if not project:
+        if not project or project['user_id'] != user_id:
             return jsonify({'success': False, 'error': 'Project not found'}), 404
         
-        return jsonify({
+        updated_at = parse_document_time(project['updated_at'])
+        etag = make_etag('project', project['id'], updated_at)
+        cached = not_modified(etag, updated_at)
+        if cached:
+            return cached
+        
+        return with_cache_headers(jsonify({
             'success': True,
-            'project': project.to_dict()
-        })
+            'project': project
+        }), etag, updated_at)
         
     except Exception as e:
         return jsonify({
@@ -366,13 +589,19 @@ def delete_project(project_id):
         if not project:
             return jsonify({'success': False, 'error': 'Project not found'}), 404
         
-        # Удаляем связанные рендеры
+        # Удаляем связанные рендеры (массовый delete: их документы сбрасываем сами)
+        render_ids = [render_id for (render_id,) in db.session.query(VideoRender.id).filter_by(project_id=project_id)]
+        invalidate_on_commit(db.session, 'render', render_ids)
         VideoRender.query.filter_by(project_id=project_id).delete()
         
         # Удаляем проект
         db.session.delete(project)
         db.session.commit()
         
+        # Удаляем декодированный аудио-артефакт, если он на этой машине
+        from src.workers.audio_artifact import audio_store
+        audio_store.remove(project_id)
+        
         return jsonify({
             'success': True,
             'message': 'Project deleted successfully'
@@ -384,6 +613,84 @@ def delete_project(project_id):
             'error': str(e)
         }), 500
 
+@video_bp.route('/projects/<project_id>/process', methods=['POST'])
+@cross_origin()
+def process_project(project_id):
+    """Повторно запустить обработку загруженного видео.
+    
+    По умолчанию обработка продолжается с первого незавершенного этапа;
+    {"restart": true} (или ?restart=true) начинает ее заново.
+    """
+    try:
+        user_id = get_user_id()
+        data = request.get_json(silent=True) or {}
+        restart = bool(data.get('restart')) or request.args.get('restart', '').lower() in ('1', 'true')
+        
+        project = VideoProject.query.filter_by(id=project_id, user_id=user_id).first()
+        
+        if not project:
+            return jsonify({'success': False, 'error': 'Project not found'}), 404
+        
+        if project.status in ('processing', 'cancelling'):
+            return jsonify({'success': False, 'error': f'Project is already {project.status}'}), 409
+        
+        previous_status = project.status
+        project.status = 'processing'
+        if restart:
+            project.pipeline_state = None
+        db.session.commit()
+        
+        job_id = get_queue().enqueue_video_processing(str(project.id), user_id=user_id)
+        if not job_id:
+            project.status = previous_status
+            db.session.commit()
+            return jsonify({'success': False, 'error': 'Processing queue is full, retry later'}), 503
+        
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'status': project.status
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@video_bp.route('/projects/<project_id>/cancel', methods=['POST'])
+@cross_origin()
+def cancel_processing(project_id):
+    """Отменить обработку загруженного видео"""
+    try:
+        user_id = get_user_id()
+        
+        project = VideoProject.query.filter_by(id=project_id, user_id=user_id).first()
+        
+        if not project:
+            return jsonify({'success': False, 'error': 'Project not found'}), 404
+        
+        if project.status == 'cancelling':
+            return jsonify({'success': True, 'project_id': project.id, 'status': project.status}), 202
+        
+        status = request_cancellation(VideoProject, project.id, 'process', ('processing',))
+        if not status:
+            return jsonify({'success': False, 'error': 'Project is not processing', 'status': project.status}), 409
+        
+        publish_event(f'ingest_{status}', user_id, str(project.id), status=status)
+        
+        return jsonify({
+            'success': True,
+            'project_id': project.id,
+            'status': status
+        }), 200 if status == 'cancelled' else 202
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @video_bp.route('/projects/<project_id>/render', methods=['POST'])
 @cross_origin()
 def start_render(project_id):
@@ -398,51 +705,273 @@ def start_render(project_id):
         
         data = request.get_json() or {}
         
+        settings, error = parse_render_settings(data, project)
+        if error:
+            return jsonify({'success': False, 'error': error}), 400
+        
+        # Идентичный рендер уже идет или готов: возвращаем его вместо повторного кодирования
+        fingerprint = None if data.get('force') else compute_render_fingerprint(project, settings)
+        existing = find_reusable_render(fingerprint)
+        if existing:
+            return reused_render_response(existing)
+        
         # Создаем задачу рендеринга
         render = VideoRender(
             project_id=project_id,
             user_id=user_id,
-            format=data.get('format', 'mp4'),
-            quality=data.get('quality', 'medium'),
-            resolution=data.get('resolution', project.resolution),
-            include_subtitles=data.get('include_subtitles', True),
-            status='processing',
-            started_at=datetime.utcnow()
+            fingerprint=fingerprint,
+            status='queued',
+            **settings
         )
         
         db.session.add(render)
-        db.session.commit()
-        
-        # Симулируем рендеринг (в реальности здесь была бы очередь)
         try:
-            # Симулируем процесс рендеринга
-            import time
-            import threading
+            db.session.commit()
+        except IntegrityError:
+            # Параллельный идентичный запрос успел первым (уникальный индекс по fingerprint)
+            db.session.rollback()
+            existing = find_reusable_render(fingerprint)
+            if existing:
+                return reused_render_response(existing)
+            raise
+        
+        # Превью короткие и интерактивные, поэтому идут вперед массовых рендеров
+        priority = 'interactive' if data.get('preview') else 'bulk'
+        job_id = get_queue().enqueue_video_render(str(render.id), user_id=user_id, priority=priority)
+        
+        if not job_id:
+            render.status = 'failed'
+            render.error_message = 'Render queue is full, retry later'
+            db.session.commit()
+            return jsonify({
+                'success': False,
+                'error': render.error_message,
+                'render_id': render.id
+            }), 503
+        
+        publish_event('render_queued', user_id, project_id, render_id=str(render.id), status=render.status, progress=0)
+        
+        return jsonify({
+            'success': True,
+            'render_id': render.id,
+            'job_id': job_id,
+            'status': render.status
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@video_bp.route('/renders/batch', methods=['POST'])
+@cross_origin()
+def start_render_batch():
+    """Запустить рендеринг нескольких проектов одним запросом.
+    
+    Тело: {"renders": [{"project_id": ..., <настройки как у /render>}, ...], <общие настройки>}.
+    Рендеры создаются одной транзакцией и ставятся в очередь одной операцией;
+    идентичные идущим или готовым рендерам переиспользуются, как в start_render.
+    """
+    try:
+        user_id = get_user_id()
+        data = request.get_json() or {}
+        
+        items = data.get('renders')
+        if not isinstance(items, list) or not items:
+            return jsonify({'success': False, 'error': 'renders must be a non-empty list'}), 400
+        
+        if len(items) > MAX_BATCH_RENDERS:
+            return jsonify({
+                'success': False,
+                'error': f'Too many renders in one batch (max {MAX_BATCH_RENDERS})'
+            }), 400
+        
+        defaults = {key: value for key, value in data.items() if key != 'renders'}
+        
+        # Все проекты пачки одним запросом
+        project_ids = {str(item.get('project_id')) for item in items if isinstance(item, dict)}
+        projects = {
+            str(project.id): project
+            for project in VideoProject.query.filter(
+                VideoProject.id.in_(project_ids),
+                VideoProject.user_id == user_id
+            ).all()
+        }
+        
+        # Пачка принимается целиком: ошибки всех элементов возвращаются сразу
+        entries = []
+        errors = []
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                errors.append({'index': index, 'error': 'Render entry must be an object'})
+                continue
             
-            def simulate_render():
-                time.sleep(2)  # Симуляция обработки
-                
-                # Обновляем статус
-                render.status = 'completed'
-                render.progress = 100
-                render.completed_at = datetime.utcnow()
-                render.output_url = f"/api/video/renders/{render.id}/download"
-                render.output_size = project.file_size  # Примерный размер
-                
+            project = projects.get(str(item.get('project_id')))
+            if not project:
+                errors.append({'index': index, 'project_id': item.get('project_id'), 'error': 'Project not found'})
+                continue
+            
+            options = {**defaults, **item}
+            settings, error = parse_render_settings(options, project)
+            if error:
+                errors.append({'index': index, 'project_id': item.get('project_id'), 'error': error})
+                continue
+            
+            fingerprint = None if options.get('force') else compute_render_fingerprint(project, settings)
+            entries.append((project, settings, fingerprint))
+        
+        if errors:
+            return jsonify({'success': False, 'error': 'Invalid render entries', 'errors': errors}), 400
+        
+        # Создаем задачи одной транзакцией; при гонке с параллельным идентичным
+        # запросом (уникальный индекс по fingerprint) повторяем поиск переиспользуемых
+        for attempt in range(2):
+            reusable = find_reusable_renders(fingerprint for _, _, fingerprint in entries)
+            results = []
+            created = []
+            
+            for project, settings, fingerprint in entries:
+                render = reusable.get(fingerprint) if fingerprint else None
+                if not render:
+                    render = VideoRender(
+                        project_id=project.id,
+                        user_id=user_id,
+                        fingerprint=fingerprint,
+                        status='queued',
+                        **settings
+                    )
+                    created.append(render)
+                    # Одинаковые элементы внутри пачки получают один рендер
+                    if fingerprint:
+                        reusable[fingerprint] = render
+                results.append(render)
+            
+            db.session.add_all(created)
+            try:
                 db.session.commit()
+                break
+            except IntegrityError:
+                db.session.rollback()
+                if attempt:
+                    raise
+        
+        # Превью короткие и интерактивные, поэтому идут вперед массовых рендеров
+        priority = 'interactive' if data.get('preview') else 'bulk'
+        job_ids = get_queue().enqueue_video_renders(
+            [str(render.id) for render in created],
+            user_id=user_id,
+            priority=priority
+        )
+        
+        rejected = [render for render in created if not job_ids.get(str(render.id))]
+        for render in rejected:
+            render.status = 'failed'
+            render.error_message = 'Render queue is full, retry later'
+        if rejected:
+            db.session.commit()
+        
+        created_ids = {render.id for render in created}
+        response_items = []
+        for render in results:
+            item = {
+                'project_id': render.project_id,
+                'render_id': render.id,
+                'status': render.status
+            }
             
-            # Запускаем в фоне
-            thread = threading.Thread(target=simulate_render)
-            thread.daemon = True
-            thread.start()
+            if render.id in created_ids:
+                created_ids.discard(render.id)
+                item['job_id'] = job_ids.get(str(render.id))
+                if render.status == 'queued':
+                    publish_event(
+                        'render_queued',
+                        user_id,
+                        str(render.project_id),
+                        render_id=str(render.id),
+                        status=render.status,
+                        progress=0
+                    )
+                else:
+                    item['error'] = render.error_message
+            else:
+                item.update({
+                    'output_url': render.output_url,
+                    'reused': render.status == 'completed',
+                    'coalesced': render.status != 'completed'
+                })
             
-        except Exception as e:
-            print(f"Render simulation error: {e}")
+            response_items.append(item)
+        
+        accepted = len(created) - len(rejected)
+        return jsonify({
+            'success': not created or accepted > 0,
+            'renders': response_items,
+            'created': accepted,
+            'reused': len(results) - len(created),
+            'rejected': len(rejected)
+        }), 503 if created and not accepted else 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@video_bp.route('/renders/status', methods=['GET'])
+@cross_origin()
+def get_renders_status():
+    """Статусы нескольких рендеров одним запросом: ?ids=<id>,<id>,..."""
+    try:
+        user_id = get_user_id()
+        
+        ids = [
+            render_id.strip()
+            for value in request.args.getlist('ids')
+            for render_id in value.split(',')
+            if render_id.strip()
+        ]
+        ids = list(dict.fromkeys(ids))
+        
+        if not ids:
+            return jsonify({'success': False, 'error': 'ids query parameter is required'}), 400
+        
+        if len(ids) > MAX_STATUS_IDS:
+            return jsonify({'success': False, 'error': f'Too many ids (max {MAX_STATUS_IDS})'}), 400
+        
+        # Только нужные для polling колонки, без загрузки ORM объектов
+        rows = db.session.query(
+            VideoRender.id,
+            VideoRender.project_id,
+            VideoRender.status,
+            VideoRender.progress,
+            VideoRender.output_url,
+            VideoRender.output_size,
+            VideoRender.error_message,
+            VideoRender.completed_at
+        ).filter(
+            VideoRender.id.in_(ids),
+            VideoRender.user_id == user_id
+        ).all()
+        
+        renders = {
+            str(row.id): {
+                'project_id': str(row.project_id),
+                'status': row.status,
+                'progress': row.progress,
+                'output_url': row.output_url,
+                'output_size': row.output_size,
+                'error_message': row.error_message,
+                'completed_at': row.completed_at.isoformat() if row.completed_at else None
+            }
+            for row in rows
+        }
         
         return jsonify({
             'success': True,
-            'render_id': render.id,
-            'status': 'processing'
+            'renders': renders,
+            'missing': [render_id for render_id in ids if render_id.lower() not in renders]
         })
         
     except Exception as e:
@@ -451,6 +980,45 @@ def start_render(project_id):
             'error': str(e)
         }), 500
 
+@video_bp.route('/renders/<render_id>/cancel', methods=['POST'])
+@cross_origin()
+def cancel_render(render_id):
+    """Отменить рендеринг (в очереди или уже выполняющийся)"""
+    try:
+        user_id = get_user_id()
+        
+        render = VideoRender.query.filter_by(id=render_id, user_id=user_id).first()
+        
+        if not render:
+            return jsonify({'success': False, 'error': 'Render not found'}), 404
+        
+        if render.status == 'cancelling':
+            return jsonify({'success': True, 'render_id': render.id, 'status': render.status}), 202
+        
+        status = request_cancellation(VideoRender, render.id, 'render', ('queued', 'processing'))
+        if not status:
+            db.session.refresh(render)
+            return jsonify({
+                'success': False,
+                'error': f'Render is already {render.status}',
+                'status': render.status
+            }), 409
+        
+        publish_event(f'render_{status}', user_id, str(render.project_id), render_id=str(render.id), status=status)
+        
+        # cancelling: worker остановит ffmpeg и сам переведет рендер в cancelled
+        return jsonify({
+            'success': True,
+            'render_id': render.id,
+            'status': status
+        }), 200 if status == 'cancelled' else 202
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @video_bp.route('/renders/<render_id>', methods=['GET'])
 @cross_origin()
 def get_render_status(render_id):
@@ -458,15 +1026,88 @@ def get_render_status(render_id):
     try:
         user_id = get_user_id()
         
-        render = VideoRender.query.filter_by(id=render_id, user_id=user_id).first()
+        render = get_document_cache().get_or_load('render', render_id, lambda: load_document(VideoRender, render_id))
+        
+        if not render or render['user_id'] != user_id:
+            return jsonify({'success': False, 'error': 'Render not found'}), 404
+        
+        updated_at = parse_document_time(render['updated_at'])
+        etag = make_etag('render', render['id'], updated_at)
+        cached = not_modified(etag, updated_at)
+        if cached:
+            return cached
+        
+        return with_cache_headers(jsonify({
+            'success': True,
+            'render': render
+        }), etag, updated_at)
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@video_bp.route('/renders/<render_id>/trace', methods=['GET'])
+@cross_origin()
+def get_render_trace(render_id):
+    """Трасса рендера: span'ы этапов (wall time, CPU, байты) последних попыток"""
+    try:
+        user_id = get_user_id()
+        
+        render = db.session.query(VideoRender.status, VideoRender.trace, VideoRender.updated_at).filter(
+            VideoRender.id == render_id,
+            VideoRender.user_id == user_id
+        ).first()
         
         if not render:
             return jsonify({'success': False, 'error': 'Render not found'}), 404
         
+        # Трасса пишется вместе со статусом, updated_at меняется вместе с ней
+        etag = make_etag('render_trace', render_id, render.updated_at)
+        cached = not_modified(etag, render.updated_at)
+        if cached:
+            return cached
+        
+        return with_cache_headers(jsonify({
+            'success': True,
+            'render_id': render_id,
+            'status': render.status,
+            'attempts': (render.trace or {}).get('attempts', [])
+        }), etag, render.updated_at)
+        
+    except Exception as e:
         return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@video_bp.route('/projects/<project_id>/trace', methods=['GET'])
+@cross_origin()
+def get_project_trace(project_id):
+    """Трасса ingest проекта: span'ы этапов последних попыток"""
+    try:
+        user_id = get_user_id()
+        
+        project = db.session.query(VideoProject.status, VideoProject.trace, VideoProject.updated_at).filter(
+            VideoProject.id == project_id,
+            VideoProject.user_id == user_id
+        ).first()
+        
+        if not project:
+            return jsonify({'success': False, 'error': 'Project not found'}), 404
+        
+        etag = make_etag('project_trace', project_id, project.updated_at)
+        cached = not_modified(etag, project.updated_at)
+        if cached:
+            return cached
+        
+        return with_cache_headers(jsonify({
             'success': True,
-            'render': render.to_dict()
-        })
+            'project_id': project_id,
+            'status': project.status,
+            'attempts': (project.trace or {}).get('attempts', [])
+        }), etag, project.updated_at)
         
     except Exception as e:
         return jsonify({
@@ -482,18 +1123,31 @@ def get_project_renders(project_id):
         user_id = get_user_id()
         
         # Проверяем доступ к проекту
-        project = VideoProject.query.filter_by(id=project_id, user_id=user_id).first()
+        project = db.session.query(VideoProject.id).filter(
+            VideoProject.id == project_id,
+            VideoProject.user_id == user_id
+        ).first()
         if not project:
             return jsonify({'success': False, 'error': 'Project not found'}), 404
         
+        # Версия списка: число рендеров и последнее изменение любого из них
+        count, last_updated = db.session.query(
+            func.count(VideoRender.id), func.max(VideoRender.updated_at)
+        ).filter(VideoRender.project_id == project_id).one()
+        
+        etag = make_etag('renders', project_id, count, last_updated)
+        cached = not_modified(etag, last_updated)
+        if cached:
+            return cached
+        
         renders = VideoRender.query.filter_by(project_id=project_id).order_by(
             VideoRender.created_at.desc()
         ).all()
         
-        return jsonify({
+        return with_cache_headers(jsonify({
             'success': True,
             'renders': [render.to_dict() for render in renders]
-        })
+        }), etag, last_updated)
         
     except Exception as e:
         return jsonify({
@@ -501,6 +1155,90 @@ def get_project_renders(project_id):
             'error': str(e)
         }), 500
 
+def request_cancellation(model, object_id, kind, active_statuses):
+    """Снимает задачу с очереди или просит выполняющий ее worker остановиться.
+    
+    Возвращает новый статус ('cancelled' или 'cancelling') либо None, если задача
+    уже завершилась.
+    """
+    new_status = 'cancelled' if get_queue().cancel_pending_task(kind, str(object_id)) else 'cancelling'
+    
+    # Условный UPDATE: не перетираем статус, если worker успел завершить задачу
+    updated = model.query.filter(
+        model.id == object_id,
+        model.status.in_(active_statuses)
+    ).update({'status': new_status}, synchronize_session=False)
+    invalidate_on_commit(db.session, DOCUMENT_KINDS[model], [object_id])
+    db.session.commit()
+    
+    return new_status if updated else None
+
+def format_sse(event_type, data):
+    """Сериализует событие в формат text/event-stream"""
+    return f"event: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@video_bp.route('/events', methods=['GET'])
+@cross_origin()
+def stream_events():
+    """SSE стрим прогресса ingest и рендеринга (всех проектов пользователя или одного проекта)"""
+    # EventSource не умеет слать заголовки, поэтому user_id можно передать в query
+    user_id = request.headers.get('X-User-ID') or request.args.get('user_id') or get_user_id()
+    project_id = request.args.get('project_id')
+    
+    if project_id:
+        project = VideoProject.query.filter_by(id=project_id, user_id=user_id).first()
+        if not project:
+            return jsonify({'success': False, 'error': 'Project not found'}), 404
+        projects = [project]
+        channels = [f'project:{project_id}']
+    else:
+        projects = VideoProject.query.filter_by(user_id=user_id, status='processing').all()
+        channels = [f'user:{user_id}']
+    
+    # Подписываемся до снимка состояния, чтобы не потерять события между ними
+    subscription = get_event_broker().subscribe(channels)
+    
+    active_renders = VideoRender.query.filter(
+        VideoRender.user_id == user_id,
+        VideoRender.status.in_(['queued', 'processing'])
+    )
+    if project_id:
+        active_renders = active_renders.filter(VideoRender.project_id == project_id)
+    
+    snapshot = {
+        'projects': [
+            {'project_id': str(project.id), 'status': project.status} for project in projects
+        ],
+        'renders': [
+            {
+                'render_id': str(render.id),
+                'project_id': str(render.project_id),
+                'status': render.status,
+                'progress': render.progress
+            }
+            for render in active_renders.all()
+        ]
+    }
+    
+    def generate():
+        with subscription:
+            yield f"retry: {EVENTS_RETRY_MS}\n\n"
+            yield format_sse('snapshot', snapshot)
+            
+            while True:
+                event = subscription.get(timeout=EVENTS_HEARTBEAT_SECONDS)
+                if event is None:
+                    # Комментарий держит соединение через прокси и выявляет отключившихся клиентов
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(event.get('type', 'message'), event)
+    
+    # Генератор не держит app context: соединение с БД возвращается в пул сразу
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @video_bp.route('/projects/<project_id>/waveform', methods=['GET'])
 @cross_origin()
 def get_waveform(project_id):
@@ -508,17 +1246,96 @@ def get_waveform(project_id):
     try:
         user_id = get_user_id()
         
+        project = db.session.query(VideoProject.waveform).filter(
+            VideoProject.id == project_id,
+            VideoProject.user_id == user_id
+        ).first()
+        
+        if not project:
+            return jsonify({'success': False, 'error': 'Project not found'}), 404
+        
+        # Waveform считает ingest; до его завершения данных нет
+        if project.waveform is None:
+            return jsonify({'success': False, 'error': 'Waveform is not ready'}), 404
+        
+        # ETag по сохраненным пикам: меняется только при повторном ingest, правки проекта его не трогают
+        etag = make_etag('waveform', project_id, project.waveform)
+        cached = not_modified(etag, cache_control=WAVEFORM_CACHE_CONTROL)
+        if cached:
+            return cached
+        
+        return with_cache_headers(jsonify({
+            'success': True,
+            'waveform': project.waveform
+        }), etag, cache_control=WAVEFORM_CACHE_CONTROL)
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@video_bp.route('/projects/<project_id>/silences', methods=['GET'])
+@cross_origin()
+def get_silence_cuts(project_id):
+    """Получить найденную тишину и предложения по нарезке.
+    
+    ?threshold_db= пересчитывает тишину с другим порогом по PCM артефакту; если
+    артефакта уже нет, возвращается тишина с ingest и threshold_applied: false.
+    """
+    try:
+        user_id = get_user_id()
+        
         project = VideoProject.query.filter_by(id=project_id, user_id=user_id).first()
         
         if not project:
             return jsonify({'success': False, 'error': 'Project not found'}), 404
         
-        # Генерируем waveform данные
-        waveform_data = generate_waveform_data(project.duration or 60)
+        try:
+            min_duration = float(request.args.get('min_duration', 0))
+            padding = float(request.args.get('padding', 0.1))
+            threshold_db = request.args.get('threshold_db')
+            threshold_db = float(threshold_db) if threshold_db not in (None, '') else None
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'min_duration, padding and threshold_db must be numbers'
+            }), 400
+        
+        from src.workers.audio_analysis import detect_silences, suggest_cuts
+        from src.workers.audio_artifact import audio_store
+        
+        silences = project.silences or []
+        reanalyzed = False
+        
+        # Другой порог: пересчитываем по PCM артефакту без повторного декодирования
+        if threshold_db is not None:
+            audio_data = audio_store.open(str(project.id))
+            if audio_data is not None:
+                silences = detect_silences(
+                    audio_data,
+                    audio_store.sample_rate,
+                    threshold_db=threshold_db,
+                    min_duration=max(min_duration, 0.0)
+                )
+                reanalyzed = True
+        suggestions = suggest_cuts(
+            silences,
+            duration=project.duration,
+            min_duration=min_duration,
+            padding=max(padding, 0.0)
+        )
         
         return jsonify({
             'success': True,
-            'waveform': waveform_data
+            'analyzed': project.silences is not None,
+            'reanalyzed': reanalyzed,
+            # Запрошенный порог не применен: PCM артефакт удален (AUDIO_ARTIFACT_TTL)
+            'threshold_applied': threshold_db is None or reanalyzed,
+            'silences': silences,
+            'cuts': suggestions['cuts'],
+            'keep_segments': suggestions['keep_segments'],
+            'total_cut_duration': suggestions['total_cut_duration']
         })
         
     except Exception as e:
@@ -530,30 +1347,64 @@ def get_waveform(project_id):
 @video_bp.route('/renders/<render_id>/download', methods=['GET'])
 @cross_origin()
 def download_render(render_id):
-    """Скачать готовый рендер"""
+    """Скачать готовый рендер: файл из локальной папки отдается потоком (Range,
+    Content-Disposition), из storage - редиректом 302 на подписанную ссылку.
+    ?redirect=false возвращает ссылку в JSON (для клиентов, которые скачивают сами)."""
     try:
         user_id = get_user_id()
         
-        render = VideoRender.query.filter_by(id=render_id, user_id=user_id).first()
+        render = get_document_cache().get_or_load('render', render_id, lambda: load_document(VideoRender, render_id))
         
-        if not render:
+        if not render or render['user_id'] != user_id:
             return jsonify({'success': False, 'error': 'Render not found'}), 404
         
-        if render.status != 'completed':
+        if render['status'] != 'completed' or not render['output_url']:
             return jsonify({
                 'success': False, 
-                'error': f'Render not ready. Status: {render.status}'
+                'error': f"Render not ready. Status: {render['status']}"
             }), 400
         
-        # В реальности здесь был бы файл из storage
-        # Пока возвращаем заглушку
-        return jsonify({
-            'success': True,
-            'download_url': render.output_url,
-            'filename': f"render_{render_id}.{render.format}",
-            'size': render.output_size
-        })
+        download_name = f"render_{render['id']}.{render['format']}"
+        output_url = render['output_url']
+        
+        if output_url.startswith(LOCAL_FILES_URL_PREFIX):
+            if request.args.get('redirect') == 'false':
+                return jsonify({
+                    'success': True,
+                    'download_url': request.base_url,
+                    'filename': download_name,
+                    'size': render['output_size']
+                })
+            response = send_local_file(output_url[len(LOCAL_FILES_URL_PREFIX):], as_attachment=True, download_name=download_name)
+            if isinstance(response, Response):
+                # Ответ зависит от пользователя: в общие кэши не попадает
+                response.headers['Cache-Control'] = 'private, no-store'
+            return response
+        
+        # Bucket публичный: если подписать ссылку не удалось, отдаем публичный URL
+        from src.services.storage_service import get_storage_service
+        storage = get_storage_service()
+        storage_path = storage.path_from_url(output_url) if storage else None
+        signed_url = storage.create_signed_url(storage_path, RENDER_DOWNLOAD_URL_TTL, download_name) if storage_path else None
+        download_url = signed_url or output_url
+        
+        if request.args.get('redirect') == 'false':
+            response = jsonify({
+                'success': True,
+                'download_url': download_url,
+                'filename': download_name,
+                'size': render['output_size'],
+                'expires_in': RENDER_DOWNLOAD_URL_TTL if signed_url else None
+            })
+        else:
+            response = redirect(download_url, code=302)
+        
+        # Подписанная ссылка короткоживущая: ответ не кэшируем
+        response.headers['Cache-Control'] = 'private, no-store'
+        return response
         
+    except RequestedRangeNotSatisfiable as e:
+        return e
     except Exception as e:
         return jsonify({
             'success': False,
@@ -563,15 +1414,12 @@ def download_render(render_id):
 @video_bp.route('/files/<filename>', methods=['GET'])
 @cross_origin()
 def serve_file(filename):
-    """Отдать файл (fallback для локальных файлов)"""
+    """Отдать файл (fallback для локальных файлов) с поддержкой перемотки (Range)"""
     try:
-        file_path = os.path.join(UPLOAD_FOLDER, filename)
-        
-        if not os.path.exists(file_path):
-            return jsonify({'success': False, 'error': 'File not found'}), 404
-        
-        return send_file(file_path, as_attachment=False)
+        return send_local_file(filename)
         
+    except RequestedRangeNotSatisfiable as e:
+        return e
     except Exception as e:
         return jsonify({
             'success': False,
@@ -0,0 +1,223 @@
+"""
+Document Cache для AgentFlow Video Editor
+Read-through кэш сериализованных проектов и рендеров (to_dict) для частых GET.
+
+С Redis документы общие для всех процессов API: рядом с документом хранится
+счетчик версии объекта, инвалидация увеличивает его (INCR). Документ с другой
+версией считается промахом, поэтому читатель, загрузивший из БД данные до
+коммита записи, не может закэшировать их как актуальные. Без Redis работает LRU
+в памяти процесса с коротким TTL: worker'ы в других процессах (db_worker) не
+могут сбросить этот кэш, TTL ограничивает устаревание.
+
+Инвалидация выполняется после коммита сессии: изменения и удаления
+VideoProject/VideoRender через ORM отслеживаются автоматически (after_flush ->
+after_commit), массовые query.update()/delete() регистрируют id вручную через
+invalidate_on_commit.
+"""
+
+import os
+import json
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+import redis
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from src.models.video_project import VideoProject, VideoRender
+from src.config.logging_config import get_logger
+from src.services.metrics import count_cache_lookup
+
+logger = get_logger('cache')
+
+KEY_PREFIX = 'agentflow:cache:'
+
+# Виды документов по моделям
+DOCUMENT_KINDS = {VideoProject: 'project', VideoRender: 'render'}
+
+# Ключ session.info со списком документов для инвалидации после коммита
+PENDING_INFO_KEY = 'document_cache_pending'
+
+
+class DocumentCache:
+    def __init__(self, redis_url: str = None, ttl: int = None, local_ttl: float = None, max_entries: int = None):
+        self.redis_url = redis_url or os.getenv('REDIS_URL')
+        self.ttl = ttl if ttl is not None else int(os.getenv('CACHE_TTL', '300'))
+        self.local_ttl = local_ttl if local_ttl is not None else float(os.getenv('CACHE_LOCAL_TTL', '5'))
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv('CACHE_MAX_ENTRIES', '1000'))
+
+        self.redis_conn = None
+        if self.redis_url and self.redis_url.strip():
+            try:
+                self.redis_conn = redis.from_url(self.redis_url, socket_timeout=1.0)
+                self.redis_conn.ping()
+            except Exception as e:
+                logger.warning("⚠️ Document cache: Redis unavailable (%s), using in-process LRU", e)
+                self.redis_conn = None
+
+        self._local: 'OrderedDict[Tuple[str, str], Tuple[float, Dict[str, Any]]]' = OrderedDict()
+        self._lock = threading.Lock()
+        # Счетчик инвалидаций: загрузка, во время которой он изменился, не кэшируется
+        self._generation = 0
+
+    @property
+    def mode(self) -> str:
+        return 'redis' if self.redis_conn else 'local'
+
+    def get_or_load(self, kind: str, object_id: str, loader: Callable[[], Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """Документ из кэша или loader() (None - объекта нет, не кэшируется).
+
+        Документ разделяется между запросами: вызывающий код не должен его менять.
+        """
+        object_id = canonical_id(object_id)
+        if object_id is None:
+            return loader()
+
+        document, version = self._read(kind, object_id)
+        count_cache_lookup(f'document_{kind}', document is not None)
+        if document is not None:
+            return document
+
+        document = loader()
+        if document is not None:
+            self._write(kind, object_id, document, version)
+        return document
+
+    def invalidate(self, kind: str, object_ids: Iterable[Any]):
+        """Сбрасывает документы (вызывать после коммита изменений)"""
+        object_ids = [object_id for object_id in map(canonical_id, object_ids) if object_id]
+        if not object_ids:
+            return
+
+        with self._lock:
+            self._generation += 1
+            for object_id in object_ids:
+                self._local.pop((kind, object_id), None)
+
+        if self.redis_conn:
+            try:
+                pipe = self.redis_conn.pipeline(transaction=False)
+                for object_id in object_ids:
+                    version_key = self._version_key(kind, object_id)
+                    pipe.incr(version_key)
+                    # Счетчик живет дольше документов: старый документ не совпадет со сброшенной версией
+                    pipe.expire(version_key, self.ttl * 2)
+                pipe.execute()
+            except Exception as e:
+                logger.warning("⚠️ Document cache invalidation failed: %s", e)
+
+    def _read(self, kind: str, object_id: str) -> Tuple[Optional[Dict[str, Any]], Any]:
+        """(документ или None, версия для записи после загрузки)"""
+        if self.redis_conn:
+            try:
+                version, payload = self.redis_conn.mget(
+                    self._version_key(kind, object_id), self._document_key(kind, object_id)
+                )
+                version = int(version or 0)
+                if payload:
+                    entry = json.loads(payload)
+                    if entry.get('version') == version:
+                        return entry['document'], version
+                return None, version
+            except Exception as e:
+                logger.warning("⚠️ Document cache read failed: %s", e)
+                return None, None
+
+        key = (kind, object_id)
+        with self._lock:
+            entry = self._local.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._local.move_to_end(key)
+                return entry[1], self._generation
+            self._local.pop(key, None)
+            return None, self._generation
+
+    def _write(self, kind: str, object_id: str, document: Dict[str, Any], version: Any):
+        if version is None:
+            return
+
+        if self.redis_conn:
+            try:
+                payload = json.dumps({'version': version, 'document': document}, default=str)
+                self.redis_conn.set(self._document_key(kind, object_id), payload, ex=self.ttl)
+            except Exception as e:
+                logger.warning("⚠️ Document cache write failed: %s", e)
+            return
+
+        with self._lock:
+            if self._generation != version:
+                return
+            self._local[(kind, object_id)] = (time.monotonic() + self.local_ttl, document)
+            self._local.move_to_end((kind, object_id))
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+
+    def _version_key(self, kind: str, object_id: str) -> str:
+        return f'{KEY_PREFIX}{kind}:{object_id}:version'
+
+    def _document_key(self, kind: str, object_id: str) -> str:
+        return f'{KEY_PREFIX}{kind}:{object_id}'
+
+
+def canonical_id(object_id: Any) -> Optional[str]:
+    """Единое строковое представление UUID (None для невалидного id)"""
+    try:
+        return str(object_id if isinstance(object_id, uuid.UUID) else uuid.UUID(str(object_id)))
+    except ValueError:
+        return None
+
+
+def invalidate_on_commit(session, kind: str, object_ids: Iterable[Any]):
+    """Сбросить документы после коммита session (для массовых update/delete мимо flush)"""
+    pending = session.info.setdefault(PENDING_INFO_KEY, set())
+    pending.update((kind, object_id) for object_id in object_ids)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_documents(session, flush_context):
+    for instance in list(session.dirty) + list(session.deleted):
+        kind = DOCUMENT_KINDS.get(type(instance))
+        if kind and instance.id is not None:
+            invalidate_on_commit(session, kind, [instance.id])
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed_documents(session):
+    pending = session.info.pop(PENDING_INFO_KEY, None)
+    if not pending:
+        return
+
+    by_kind: Dict[str, list] = {}
+    for kind, object_id in pending:
+        by_kind.setdefault(kind, []).append(object_id)
+
+    cache = get_document_cache()
+    for kind, object_ids in by_kind.items():
+        cache.invalidate(kind, object_ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending_documents(session):
+    session.info.pop(PENDING_INFO_KEY, None)
+
+
+# Глобальный экземпляр
+document_cache = None
+_init_lock = threading.Lock()
+
+def init_document_cache(redis_url: str = None) -> DocumentCache:
+    """Инициализирует кэш документов"""
+    global document_cache
+    document_cache = DocumentCache(redis_url)
+    return document_cache
+
+def get_document_cache() -> DocumentCache:
+    """Получает кэш документов (создается при первом обращении)"""
+    if document_cache is None:
+        with _init_lock:
+            if document_cache is None:
+                init_document_cache()
+    return document_cache
@@ -0,0 +1,371 @@
+"""
+Database Queue для AgentFlow Video Editor
+Персистентная очередь задач поверх SQLAlchemy (SQLite/PostgreSQL) для работы без Redis.
+
+Реализует тот же интерфейс, который QueueManager использует у RQ (Queue.enqueue,
+len(queue), failed/started registries, Job.fetch/get_status/cancel), поэтому
+QueueManager переключается на нее без изменения вызывающего кода.
+
+Worker (workers/db_worker.py) забирает задачи через lease: атомарный
+compare-and-swap UPDATE, продление lease heartbeat'ом и повторная выдача задачи,
+если worker умер и lease истек. Неудачные попытки повторяются с экспоненциальной
+задержкой до max_attempts. Завершенные задачи worker удаляет через
+DB_QUEUE_RETENTION_DAYS дней (prune_jobs).
+"""
+
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, List
+
+from sqlalchemy import and_, or_, select, func as sql_func
+
+from src.models.video_project import db
+from src.models.background_job import BackgroundJob
+
+# Параметры lease и повторов
+DEFAULT_LEASE_SECONDS = int(os.getenv('DB_QUEUE_LEASE_SECONDS', '60'))
+DEFAULT_MAX_ATTEMPTS = int(os.getenv('DB_QUEUE_MAX_ATTEMPTS', '3'))
+RETRY_BACKOFF_SECONDS = int(os.getenv('DB_QUEUE_RETRY_BACKOFF', '30'))
+MAX_RETRY_BACKOFF_SECONDS = 30 * 60
+
+# Сколько кандидатов рассматривать за одну попытку claim
+CLAIM_BATCH_SIZE = 10
+
+ACTIVE_STATUSES = ('queued', 'started')
+FINISHED_STATUSES = ('finished', 'failed', 'canceled')
+
+# Сколько дней хранить завершенные задачи (0 - не удалять) и сколько строк удалять за раз
+RETENTION_DAYS = float(os.getenv('DB_QUEUE_RETENTION_DAYS', '7'))
+PRUNE_BATCH_SIZE = 1000
+
+
+def parse_timeout(timeout) -> int:
+    """Переводит timeout в секунды ('30m', '1h', '90s' или число)"""
+    if timeout is None:
+        return 1800
+    if isinstance(timeout, (int, float)):
+        return int(timeout)
+
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+    value = str(timeout).strip().lower()
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+class DatabaseJob:
+    """Обертка строки BackgroundJob с интерфейсом rq.job.Job"""
+
+    def __init__(self, row: BackgroundJob):
+        self._row = row
+
+    @classmethod
+    def fetch(cls, job_id: str) -> 'DatabaseJob':
+        row = db.session.get(BackgroundJob, job_id)
+        if not row:
+            raise LookupError(f"No such job: {job_id}")
+        return cls(row)
+
+    @property
+    def id(self) -> str:
+        return self._row.id
+
+    @property
+    def meta(self) -> Dict[str, Any]:
+        return self._row.meta or {}
+
+    @property
+    def created_at(self) -> Optional[datetime]:
+        return self._row.created_at
+
+    @property
+    def started_at(self) -> Optional[datetime]:
+        return self._row.started_at
+
+    @property
+    def ended_at(self) -> Optional[datetime]:
+        return self._row.ended_at
+
+    @property
+    def result(self) -> Any:
+        return self._row.result
+
+    @property
+    def exc_info(self) -> Optional[str]:
+        return self._row.last_error
+
+    def get_status(self) -> str:
+        db.session.refresh(self._row)
+        return self._row.status
+
+    def cancel(self):
+        """Отменяет задачу, которая еще не взята worker'ом"""
+        updated = BackgroundJob.query.filter_by(id=self._row.id, status='queued').update(
+            {'status': 'canceled', 'ended_at': datetime.utcnow()},
+            synchronize_session=False
+        )
+        db.session.commit()
+        if not updated:
+            raise RuntimeError(f"Job {self._row.id} is not queued")
+
+
+class _Registry:
+    """Аналог RQ registry: счетчик и requeue по статусу"""
+
+    def __init__(self, queue: 'DatabaseQueue', status: str):
+        self.queue = queue
+        self.status = status
+
+    @property
+    def count(self) -> int:
+        return BackgroundJob.query.filter_by(queue=self.queue.name, status=self.status).count()
+
+    def requeue(self) -> List[str]:
+        rows = BackgroundJob.query.filter_by(queue=self.queue.name, status=self.status).all()
+        for row in rows:
+            row.status = 'queued'
+            row.attempts = 0
+            row.run_at = datetime.utcnow()
+            row.lease_owner = None
+            row.lease_expires_at = None
+        db.session.commit()
+        return [row.id for row in rows]
+
+
+class DatabaseQueue:
+    """Очередь задач в таблице background_jobs"""
+
+    def __init__(self, name: str, priority: int = 0):
+        self.name = name
+        self.priority = priority
+
+    def enqueue(self, func: str, *args, job_id: str, job_timeout=None,
+                meta: Dict[str, Any] = None, at_front: bool = False,
+                max_attempts: int = None) -> DatabaseJob:
+        """Добавляет задачу; повторный enqueue активной задачи ничего не дублирует"""
+        job = self._stage_job(func, args, job_id, job_timeout, meta, at_front, max_attempts)
+        db.session.commit()
+        return job
+
+    def enqueue_many(self, jobs: List[Dict[str, Any]]) -> List[DatabaseJob]:
+        """Добавляет пачку задач одним commit'ом (ключи как у аргументов enqueue)"""
+        staged = [
+            self._stage_job(
+                job['func'], job.get('args', ()), job['job_id'], job.get('job_timeout'),
+                job.get('meta'), job.get('at_front', False), job.get('max_attempts')
+            )
+            for job in jobs
+        ]
+        db.session.commit()
+        return staged
+
+    def _stage_job(self, func: str, args, job_id: str, job_timeout, meta: Optional[Dict[str, Any]],
+                   at_front: bool, max_attempts: Optional[int]) -> DatabaseJob:
+        meta = meta or {}
+        now = datetime.utcnow()
+
+        row = db.session.get(BackgroundJob, job_id)
+        if row and row.status in ACTIVE_STATUSES:
+            return DatabaseJob(row)
+
+        if not row:
+            row = BackgroundJob(id=job_id)
+            db.session.add(row)
+
+        row.queue = self.name
+        row.func = func
+        row.args = list(args)
+        row.meta = meta
+        row.user_id = meta.get('user_id')
+        # at_front: поднимаем задачу выше остальных задач своей очереди
+        row.priority = self.priority * 2 + (0 if at_front else 1)
+        row.status = 'queued'
+        row.attempts = 0
+        row.max_attempts = max_attempts or DEFAULT_MAX_ATTEMPTS
+        row.timeout = parse_timeout(job_timeout)
+        row.run_at = now
+        row.lease_owner = None
+        row.lease_expires_at = None
+        row.result = None
+        row.last_error = None
+        row.created_at = now
+        row.started_at = None
+        row.ended_at = None
+
+        return DatabaseJob(row)
+
+    def __len__(self) -> int:
+        return BackgroundJob.query.filter_by(queue=self.name, status='queued').count()
+
+    @property
+    def failed_job_registry(self) -> _Registry:
+        return _Registry(self, 'failed')
+
+    @property
+    def started_job_registry(self) -> _Registry:
+        return _Registry(self, 'started')
+
+
+def claim_statements(queue_names: List[str], now: datetime,
+                     max_active_per_user: int = None) -> Dict[str, Any]:
+    """Запросы кандидатов claim_job (их же проверяет migrations/plan_check.py).
+
+    Задачи с истекшим lease и очередные задачи выбираются отдельными запросами:
+    каждый идет по своему индексу в порядке выдачи, без OR двух индексов и
+    отдельной сортировки.
+    """
+    statements = {
+        'expired': select(BackgroundJob).where(
+            BackgroundJob.status == 'started',
+            BackgroundJob.lease_expires_at < now,
+            BackgroundJob.queue.in_(queue_names)
+        ).order_by(BackgroundJob.lease_expires_at),
+        'queued': select(BackgroundJob).where(
+            BackgroundJob.status == 'queued',
+            BackgroundJob.run_at <= now,
+            BackgroundJob.queue.in_(queue_names)
+        ).order_by(BackgroundJob.priority, BackgroundJob.run_at, BackgroundJob.created_at),
+    }
+
+    # Fair-share: задачи пользователей, у которых уже max_active_per_user задач выполняется,
+    # отсекает сам запрос - иначе их задачи в начале очереди заслоняли бы задачи остальных
+    if max_active_per_user:
+        not_capped = or_(
+            BackgroundJob.user_id.is_(None),
+            BackgroundJob.user_id.notin_(_capped_users(now, max_active_per_user))
+        )
+        statements = {name: statement.where(not_capped) for name, statement in statements.items()}
+
+    return {name: statement.limit(CLAIM_BATCH_SIZE) for name, statement in statements.items()}
+
+
+def claim_job(worker_id: str, queue_names: List[str], lease_seconds: int = DEFAULT_LEASE_SECONDS,
+              max_active_per_user: int = None) -> Optional[BackgroundJob]:
+    """Атомарно забирает задачу с истекшим lease (в первую очередь) или следующую задачу"""
+    now = datetime.utcnow()
+    claimable = or_(
+        and_(BackgroundJob.status == 'queued', BackgroundJob.run_at <= now),
+        and_(BackgroundJob.status == 'started', BackgroundJob.lease_expires_at < now)
+    )
+
+    candidates = []
+    for statement in claim_statements(queue_names, now, max_active_per_user).values():
+        candidates.extend(db.session.scalars(statement).all())
+
+    for candidate in candidates:
+        # Lease истек на последней попытке: задача считается проваленной
+        if candidate.status == 'started' and candidate.attempts >= candidate.max_attempts:
+            _finish(candidate.id, candidate.lease_owner, 'failed', error='Lease expired (worker lost)')
+            continue
+
+        # Compare-and-swap: забираем задачу, только если ее никто не взял раньше нас
+        updated = BackgroundJob.query.filter(
+            BackgroundJob.id == candidate.id,
+            BackgroundJob.status == candidate.status,
+            BackgroundJob.attempts == candidate.attempts,
+            claimable
+        ).update({
+            'status': 'started',
+            'lease_owner': worker_id,
+            'lease_expires_at': now + timedelta(seconds=lease_seconds),
+            'attempts': candidate.attempts + 1,
+            'started_at': now
+        }, synchronize_session=False)
+        db.session.commit()
+
+        if updated:
+            row = db.session.get(BackgroundJob, candidate.id)
+            db.session.refresh(row)
+            return row
+
+    return None
+
+
+def _capped_users(now: datetime, max_active_per_user: int):
+    """Подзапрос: пользователи, у которых выполняется max_active_per_user задач или больше"""
+    return select(BackgroundJob.user_id).where(
+        BackgroundJob.status == 'started',
+        BackgroundJob.user_id.isnot(None),
+        BackgroundJob.lease_expires_at >= now
+    ).group_by(BackgroundJob.user_id).having(
+        sql_func.count(BackgroundJob.id) >= max_active_per_user
+    )
+
+
+def extend_lease(job_id: str, worker_id: str, lease_seconds: int = DEFAULT_LEASE_SECONDS) -> bool:
+    """Продлевает lease задачи (heartbeat). False - задачу забрал другой worker"""
+    updated = BackgroundJob.query.filter_by(id=job_id, lease_owner=worker_id, status='started').update(
+        {'lease_expires_at': datetime.utcnow() + timedelta(seconds=lease_seconds)},
+        synchronize_session=False
+    )
+    db.session.commit()
+    return bool(updated)
+
+
+def complete_job(job_id: str, worker_id: str, result: Any = None) -> bool:
+    """Отмечает задачу выполненной"""
+    return _finish(job_id, worker_id, 'finished', result=result)
+
+
+def cancel_started_job(job_id: str, worker_id: str) -> bool:
+    """Отмечает задачу, остановленную по запросу отмены (без повторов)"""
+    return _finish(job_id, worker_id, 'canceled')
+
+
+def fail_job(job_id: str, worker_id: str, error: str) -> str:
+    """Отмечает неудачную попытку: повтор с backoff или окончательный failed"""
+    row = db.session.get(BackgroundJob, job_id)
+    if not row or row.lease_owner != worker_id:
+        return 'lost'
+
+    if row.attempts < row.max_attempts:
+        delay = min(RETRY_BACKOFF_SECONDS * 2 ** (row.attempts - 1), MAX_RETRY_BACKOFF_SECONDS)
+        row.status = 'queued'
+        row.run_at = datetime.utcnow() + timedelta(seconds=delay)
+        row.lease_owner = None
+        row.lease_expires_at = None
+        row.last_error = error
+        db.session.commit()
+        return 'retrying'
+
+    _finish(job_id, worker_id, 'failed', error=error)
+    return 'failed'
+
+
+def prune_jobs(retention_days: float = RETENTION_DAYS) -> int:
+    """Удаляет завершенные задачи старше retention_days; возвращает число удаленных"""
+    if retention_days <= 0:
+        return 0
+
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    deleted = 0
+    # Пачками: короткие транзакции не держат блокировки на всей таблице
+    while True:
+        ids = [row.id for row in db.session.query(BackgroundJob.id).filter(
+            BackgroundJob.status.in_(FINISHED_STATUSES),
+            BackgroundJob.ended_at < cutoff
+        ).limit(PRUNE_BATCH_SIZE)]
+        if not ids:
+            return deleted
+
+        deleted += BackgroundJob.query.filter(BackgroundJob.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+
+
+def _finish(job_id: str, worker_id: Optional[str], status: str, result: Any = None, error: str = None) -> bool:
+    values = {
+        'status': status,
+        'ended_at': datetime.utcnow(),
+        'lease_expires_at': None
+    }
+    if result is not None:
+        values['result'] = result
+    if error is not None:
+        values['last_error'] = error
+
+    updated = BackgroundJob.query.filter_by(id=job_id, lease_owner=worker_id).update(
+        values,
+        synchronize_session=False
+    )
+    db.session.commit()
+    return bool(updated)
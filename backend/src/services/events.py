@@ -0,0 +1,197 @@
+"""
+Event Broker для AgentFlow Video Editor
+Публикует события прогресса ingest/рендеринга для SSE стрима (routes/video.py).
+
+События адресуются каналам user:<user_id> и project:<project_id>. С Redis worker'ы
+публикуют их через pub/sub, а каждый процесс API держит одну подписку
+(PSUBSCRIBE) и раздает события своим SSE клиентам через очереди в памяти - число
+соединений с Redis не растет с числом открытых редакторов. Без Redis события
+раздаются внутри процесса (локальный пул задач работает в процессе API).
+"""
+
+import os
+import json
+import time
+import queue
+import threading
+from typing import Dict, Any, Optional, Set, Iterable
+
+import redis
+
+from src.config.logging_config import get_logger
+
+logger = get_logger('events')
+
+CHANNEL_PREFIX = 'agentflow:events:'
+
+# Сколько событий держим для медленного клиента (старые вытесняются)
+SUBSCRIBER_QUEUE_SIZE = 100
+
+# Пауза перед переподключением listener'а к Redis
+LISTENER_RETRY_SECONDS = 2.0
+
+
+class Subscription:
+    """Подписка одного SSE клиента на набор каналов"""
+
+    def __init__(self, broker: 'EventBroker', channels: Iterable[str]):
+        self.broker = broker
+        self.channels = list(channels)
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Следующее событие или None, если за timeout ничего не пришло"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker._unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class EventBroker:
+    def __init__(self, redis_url: str = None):
+        self.redis_url = redis_url or os.getenv('REDIS_URL')
+        self.redis_conn = None
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self._listener = None
+
+        if self.redis_url and self.redis_url.strip():
+            try:
+                self.redis_conn = redis.from_url(self.redis_url)
+                self.redis_conn.ping()
+            except Exception as e:
+                logger.warning("⚠️ Event broker: Redis unavailable (%s), using in-process events", e)
+                self.redis_conn = None
+
+    @property
+    def mode(self) -> str:
+        return 'redis' if self.redis_conn else 'local'
+
+    def publish(self, channels: Iterable[str], event: Dict[str, Any]):
+        """Публикует событие в каналы (ошибки доставки не роняют задачу)"""
+        event = dict(event)
+        event.setdefault('timestamp', time.time())
+
+        for channel in channels:
+            if self.redis_conn:
+                try:
+                    self.redis_conn.publish(CHANNEL_PREFIX + channel, json.dumps(event, default=str))
+                except Exception as e:
+                    logger.warning("⚠️ Event publish failed for %s: %s", channel, e)
+            else:
+                self._dispatch(channel, event)
+
+    def subscribe(self, channels: Iterable[str]) -> Subscription:
+        """Подписывает клиента на каналы; закрыть подписку - Subscription.close()"""
+        subscription = Subscription(self, channels)
+
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers.setdefault(channel, set()).add(subscription)
+
+            if self.redis_conn:
+                self._ensure_listener()
+
+        return subscription
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len({subscription for subscribers in self._subscribers.values() for subscription in subscribers})
+
+    def _unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+    def _dispatch(self, channel: str, event: Dict[str, Any]):
+        """Кладет событие в очереди подписчиков канала"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(event)
+            except queue.Full:
+                # Клиент не успевает: вытесняем самое старое событие
+                try:
+                    subscription.queue.get_nowait()
+                    subscription.queue.put_nowait(event)
+                except (queue.Empty, queue.Full):
+                    pass
+
+    def _ensure_listener(self):
+        """Запускает единственный поток подписки на Redis (вызывается под lock)"""
+        if self._listener and self._listener.is_alive():
+            return
+
+        self._listener = threading.Thread(target=self._listen, name='event-broker-listener', daemon=True)
+        self._listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.redis_conn.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(CHANNEL_PREFIX + '*')
+
+                for message in pubsub.listen():
+                    if message.get('type') != 'pmessage':
+                        continue
+
+                    channel = message['channel']
+                    data = message['data']
+                    if isinstance(channel, bytes):
+                        channel = channel.decode()
+
+                    try:
+                        event = json.loads(data)
+                    except (TypeError, ValueError):
+                        continue
+
+                    self._dispatch(channel[len(CHANNEL_PREFIX):], event)
+
+            except Exception as e:
+                logger.warning("⚠️ Event listener disconnected: %s", e)
+                time.sleep(LISTENER_RETRY_SECONDS)
+
+
+# Глобальный экземпляр
+event_broker = None
+
+def init_event_broker(redis_url: str = None) -> EventBroker:
+    """Инициализирует broker событий"""
+    global event_broker
+    event_broker = EventBroker(redis_url)
+    return event_broker
+
+def get_event_broker() -> EventBroker:
+    """Получает broker событий (создается при первом обращении, например в worker'е)"""
+    return event_broker or init_event_broker()
+
+def publish_event(event_type: str, user_id: Optional[str] = None, project_id: Optional[str] = None, **data):
+    """Публикует событие в каналы пользователя и проекта"""
+    channels = []
+    if user_id:
+        channels.append(f'user:{user_id}')
+    if project_id:
+        channels.append(f'project:{project_id}')
+
+    if not channels:
+        return
+
+    try:
+        get_event_broker().publish(channels, {'type': event_type, 'project_id': project_id, **data})
+    except Exception as e:
+        logger.warning("⚠️ Event publish failed: %s", e)
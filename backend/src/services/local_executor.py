@@ -0,0 +1,225 @@
+"""
+Local Executor для AgentFlow Video Editor
+Ограниченный пул потоков для фоновых задач, когда Redis недоступен.
+
+Допуск ограничен числом ожидающих задач (max_queue): если их столько же,
+submit возвращает False и вызывающий код отвечает 503, а не порождает новый поток.
+Каждая задача выполняется в собственном app context, поэтому получает свою
+scoped-сессию БД. Статусы и тайминги хранятся в памяти процесса.
+
+Каждая постановка задачи получает токен, который хранится в записи реестра и в
+элементе очереди: элемент отмененной постановки остается в очереди, и worker
+пропускает его, если токен уже не совпадает (задачу поставили заново). Такие
+элементы не занимают места в лимите допуска.
+"""
+
+import os
+import queue
+import itertools
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, Optional, Callable
+
+from flask import current_app
+
+from src.config.logging_config import get_logger
+from src.services.metrics import observe_queue_wait
+
+logger = get_logger('local_executor')
+
+# Статусы задач в реестре
+QUEUED = 'queued'
+RUNNING = 'running'
+FINISHED = 'finished'
+FAILED = 'failed'
+CANCELED = 'canceled'
+
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+
+class LocalExecutor:
+    def __init__(self, app=None, max_workers: int = None, max_queue: int = None):
+        self.app = app
+        self.max_workers = max_workers or int(os.getenv('LOCAL_WORKERS', '2'))
+        self.max_queue = max_queue or int(os.getenv('LOCAL_QUEUE_SIZE', '32'))
+        self.job_retention = int(os.getenv('LOCAL_JOB_RETENTION', '3600'))
+
+        # Элементы отмененных постановок остаются в очереди, поэтому лимит считает
+        # только ожидающие задачи (_queued), а не размер очереди
+        self._queue = queue.Queue()
+        self._queued = 0
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._tokens = itertools.count(1)
+        self._threads = []
+
+    def init_app(self, app):
+        """Привязывает executor к Flask приложению (для app context задач)"""
+        self.app = app
+
+    def submit(self, job_id: str, func: Callable, *args) -> bool:
+        """Ставит задачу в очередь допуска. False - ожидающих задач уже max_queue"""
+        if self.app is None:
+            self.app = current_app._get_current_object()
+
+        with self._lock:
+            existing = self._jobs.get(job_id)
+            if existing and existing['status'] in ACTIVE_STATUSES:
+                # Такая задача уже ждет или выполняется
+                return True
+
+            if self._queued >= self.max_queue:
+                return False
+
+            token = next(self._tokens)
+            self._queue.put_nowait((job_id, token, func, args))
+            self._queued += 1
+
+            self._jobs[job_id] = {
+                'id': job_id,
+                'token': token,
+                'status': QUEUED,
+                'created_at': time.time(),
+                'started_at': None,
+                'ended_at': None,
+                'error': None
+            }
+            self._ensure_workers()
+
+        return True
+
+    def get_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Возвращает статус и тайминги задачи"""
+        with self._lock:
+            record = self._jobs.get(job_id)
+            if not record:
+                return None
+            record = dict(record)
+
+        return {
+            'id': record['id'],
+            'status': record['status'],
+            'created_at': self._isoformat(record['created_at']),
+            'started_at': self._isoformat(record['started_at']),
+            'ended_at': self._isoformat(record['ended_at']),
+            'wait_seconds': self._elapsed(record['created_at'], record['started_at']),
+            'run_seconds': self._elapsed(record['started_at'], record['ended_at']),
+            'error': record['error']
+        }
+
+    def cancel(self, job_id: str) -> bool:
+        """Отменяет задачу, которая еще ждет в очереди"""
+        with self._lock:
+            record = self._jobs.get(job_id)
+            if not record or record['status'] != QUEUED:
+                return False
+
+            record['status'] = CANCELED
+            record['ended_at'] = time.time()
+            self._queued -= 1
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Сводка по пулу"""
+        with self._lock:
+            statuses = [record['status'] for record in self._jobs.values()]
+
+        return {
+            'workers': self.max_workers,
+            'queue_capacity': self.max_queue,
+            'queued': statuses.count(QUEUED),
+            'running': statuses.count(RUNNING),
+            'finished': statuses.count(FINISHED),
+            'failed': statuses.count(FAILED),
+            'canceled': statuses.count(CANCELED)
+        }
+
+    def _ensure_workers(self):
+        """Запускает потоки пула при первой задаче (вызывается под lock)"""
+        self._threads = [thread for thread in self._threads if thread.is_alive()]
+        while len(self._threads) < self.max_workers:
+            thread = threading.Thread(
+                target=self._worker_loop,
+                name=f'local-executor-{len(self._threads)}',
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def _worker_loop(self):
+        while True:
+            job_id, token, func, args = self._queue.get()
+            try:
+                self._run(job_id, token, func, args)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job_id: str, token: int, func: Callable, args: tuple):
+        with self._lock:
+            record = self._jobs.get(job_id)
+            # Отмененная постановка (или задачу уже поставили заново под новым токеном)
+            if not record or record['token'] != token or record['status'] != QUEUED:
+                return
+            self._queued -= 1
+            record['status'] = RUNNING
+            record['started_at'] = time.time()
+
+        observe_queue_wait('local', record['created_at'], record['started_at'])
+
+        status = FINISHED
+        error = None
+        try:
+            # Отдельный app context = отдельная scoped-сессия БД на задачу
+            with self.app.app_context():
+                result = func(*args)
+
+            # Обработчики VideoProcessor сообщают об ошибке и отмене через результат
+            if isinstance(result, dict) and result.get('cancelled'):
+                status = CANCELED
+            elif isinstance(result, dict) and result.get('success') is False:
+                status = FAILED
+                error = result.get('error')
+
+        except Exception as e:
+            status = FAILED
+            error = str(e)
+            logger.error("❌ Local job %s failed: %s", job_id, e)
+
+        with self._lock:
+            record['status'] = status
+            record['error'] = error
+            record['ended_at'] = time.time()
+            self._prune()
+
+    def _prune(self):
+        """Удаляет из реестра давно завершенные задачи (вызывается под lock)"""
+        cutoff = time.time() - self.job_retention
+        expired = [
+            job_id for job_id, record in self._jobs.items()
+            if record['status'] not in ACTIVE_STATUSES and record['ended_at'] and record['ended_at'] < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    @staticmethod
+    def _isoformat(timestamp: Optional[float]) -> Optional[str]:
+        return datetime.utcfromtimestamp(timestamp).isoformat() if timestamp else None
+
+    @staticmethod
+    def _elapsed(start: Optional[float], end: Optional[float]) -> Optional[float]:
+        if not start:
+            return None
+        return round((end or time.time()) - start, 3)
+
+# Глобальный экземпляр
+local_executor = LocalExecutor()
+
+def init_local_executor(app) -> LocalExecutor:
+    """Инициализирует локальный executor"""
+    local_executor.init_app(app)
+    return local_executor
+
+def get_local_executor() -> LocalExecutor:
+    """Получает локальный executor"""
+    return local_executor
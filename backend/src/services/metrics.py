@@ -0,0 +1,211 @@
+"""
+Metrics для AgentFlow Video Editor
+Метрики Prometheus: задержка API по endpoint'ам, очереди задач, этапы обработки,
+трафик storage и попадания кэшей.
+
+API отдает их на GET /metrics (с METRICS_TOKEN - только с заголовком
+Authorization: Bearer <token>). Процессы worker'ов запускает supervisor: их метрики
+пишутся в общий каталог PROMETHEUS_MULTIPROC_DIR, а supervisor отдает сводку на
+своем порту WORKER_METRICS_PORT. Так же API собирает метрики нескольких своих
+процессов, если запущен с PROMETHEUS_MULTIPROC_DIR.
+
+Доля попаданий кэша: rate(agentflow_cache_requests_total{result="hit"}[5m])
+/ rate(agentflow_cache_requests_total[5m]) по метке cache.
+
+Без пакета prometheus_client функции записи ничего не делают, а /metrics отвечает 503.
+"""
+
+import os
+import time
+import hmac
+from datetime import datetime, timezone
+from typing import Optional
+
+from flask import Response, g, jsonify, request
+
+from src.config.logging_config import get_logger
+
+try:
+    import prometheus_client
+    from prometheus_client import Counter, Histogram, CollectorRegistry, CONTENT_TYPE_LATEST, generate_latest
+    from prometheus_client.core import GaugeMetricFamily
+    from prometheus_client import multiprocess
+except ImportError:
+    prometheus_client = None
+
+logger = get_logger('metrics')
+
+NAMESPACE = 'agentflow'
+
+# Этапы ffmpeg и выгрузки длятся от долей секунды до часа (таймаут рендера)
+STAGE_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+QUEUE_WAIT_BUCKETS = (0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, 7200)
+
+# Состояния задач в сводке очереди (см. QueueManager.get_queue_info)
+QUEUE_STATE_FIELDS = {'queued': 'length', 'started': 'started_count', 'failed': 'failed_count'}
+
+if prometheus_client:
+    REQUEST_LATENCY = Histogram(
+        'http_request_duration_seconds',
+        'API request latency until response headers (streamed bodies not included)',
+        ['method', 'endpoint', 'status'],
+        namespace=NAMESPACE
+    )
+    QUEUE_WAIT = Histogram(
+        'queue_wait_seconds',
+        'Time a job waited in its queue before a worker started it',
+        ['queue'],
+        namespace=NAMESPACE,
+        buckets=QUEUE_WAIT_BUCKETS
+    )
+    STAGE_DURATION = Histogram(
+        'stage_duration_seconds',
+        'Wall time of completed processing stages',
+        ['pipeline', 'stage'],
+        namespace=NAMESPACE,
+        buckets=STAGE_BUCKETS
+    )
+    STORAGE_BYTES = Counter(
+        'storage_bytes',
+        'Bytes transferred to (upload) and from (download) object storage',
+        ['direction'],
+        namespace=NAMESPACE
+    )
+    CACHE_REQUESTS = Counter(
+        'cache_requests',
+        'Cache lookups by cache and result (hit/miss)',
+        ['cache', 'result'],
+        namespace=NAMESPACE
+    )
+
+
+def observe_request(method: str, endpoint: str, status: int, seconds: float):
+    if prometheus_client:
+        REQUEST_LATENCY.labels(method, endpoint, str(status)).observe(seconds)
+
+
+def observe_queue_wait(queue: str, enqueued_at, started_at):
+    """Ожидание задачи в очереди (datetime или timestamp; naive datetime - UTC)"""
+    if not prometheus_client or not enqueued_at or not started_at:
+        return
+    seconds = _timestamp(started_at) - _timestamp(enqueued_at)
+    if seconds >= 0:
+        QUEUE_WAIT.labels(queue).observe(seconds)
+
+
+def observe_stage(pipeline: str, stage: str, seconds: float):
+    if prometheus_client:
+        STAGE_DURATION.labels(pipeline, stage).observe(seconds)
+
+
+def count_storage_bytes(direction: str, size: Optional[int]):
+    if prometheus_client and size:
+        STORAGE_BYTES.labels(direction).inc(size)
+
+
+def count_cache_lookup(cache: str, hit: bool):
+    if prometheus_client:
+        CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def _timestamp(value) -> float:
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    return float(value)
+
+
+class QueueCollector:
+    """Глубина очередей на момент опроса: задачи RQ/БД по состояниям и локальный пул"""
+
+    def describe(self):
+        return []
+
+    def collect(self):
+        from src.services.queue_service import get_queue_manager, PRIORITY_QUEUES
+        from src.services.local_executor import get_local_executor
+
+        jobs = GaugeMetricFamily(
+            f'{NAMESPACE}_queue_jobs',
+            'Jobs per queue and state at scrape time',
+            labels=['queue', 'state']
+        )
+
+        queue_manager = get_queue_manager()
+        if queue_manager and queue_manager.is_available():
+            info = queue_manager.get_queue_info()
+            for queue_name in PRIORITY_QUEUES.values():
+                queue_info = info.get(queue_name) or {}
+                for state, field in QUEUE_STATE_FIELDS.items():
+                    if field in queue_info:
+                        jobs.add_metric([queue_name, state], queue_info[field])
+
+        local = get_local_executor().stats()
+        jobs.add_metric(['local', 'queued'], local['queued'])
+        jobs.add_metric(['local', 'started'], local['running'])
+        jobs.add_metric(['local', 'failed'], local['failed'])
+
+        yield jobs
+
+
+def _registry():
+    """Registry для ответа: метрики процесса или сводка всех процессов (multiprocess)"""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return prometheus_client.REGISTRY
+
+
+def init_metrics(app):
+    """Задержка запросов (время начала ставит init_request_logging) и endpoint /metrics"""
+    token = os.getenv('METRICS_TOKEN')
+
+    if prometheus_client:
+        queue_registry = CollectorRegistry()
+        queue_registry.register(QueueCollector())
+    else:
+        logger.warning("⚠️ prometheus_client is not installed, /metrics is disabled")
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.get('request_started')
+        if started is not None and prometheus_client:
+            # Шаблон маршрута, а не путь: id в URL не плодят ряды
+            endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+            observe_request(request.method, endpoint, response.status_code, time.perf_counter() - started)
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        """Prometheus metrics endpoint"""
+        if not prometheus_client:
+            return jsonify({'success': False, 'error': 'prometheus_client is not installed'}), 503
+
+        if token:
+            provided = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+            if not hmac.compare_digest(provided, token):
+                return jsonify({'success': False, 'error': 'Unauthorized'}), 401
+
+        payload = generate_latest(_registry()) + generate_latest(queue_registry)
+        response = Response(payload, content_type=CONTENT_TYPE_LATEST)
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+
+
+def start_worker_metrics_server(port: int) -> bool:
+    """HTTP сервер метрик supervisor'а: сводка процессов worker'ов из PROMETHEUS_MULTIPROC_DIR"""
+    if not prometheus_client or not os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        return False
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    prometheus_client.start_http_server(port, registry=registry)
+    return True
+
+
+def mark_worker_process_dead(pid: int):
+    """Убирает gauge-файлы завершившегося процесса worker'а (счетчики и гистограммы остаются)"""
+    if prometheus_client and os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(pid)
@@ -1,20 +1,118 @@
 """
 Queue Manager для AgentFlow Video Editor
-Управляет задачами в Redis Queue с fallback на синхронную обработку
+Управляет задачами в Redis Queue с fallback на персистентную очередь в БД
+(QUEUE_FALLBACK=database) или на локальный пул потоков.
+
+Задачи делятся на классы приоритета (interactive > ingest > bulk), каждый класс -
+отдельная очередь RQ; worker слушает их в порядке приоритета. Для ingest и bulk
+действует fair-share: у пользователя не больше QUEUE_MAX_ACTIVE_PER_USER задач
+в очередях/работе, остальные ждут в его личном списке и продвигаются по мере
+завершения предыдущих.
 """
 
 import os
 import redis
-import threading
 import time
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List
+
+from src.services.local_executor import get_local_executor
+from src.config.logging_config import get_logger
+
+logger = get_logger('queue')
+
+# Классы приоритета -> имя очереди RQ (порядок = порядок обработки worker'ом)
+PRIORITY_QUEUES = {
+    'interactive': 'video_interactive',
+    'ingest': 'video_processing',
+    'bulk': 'video_rendering'
+}
+PRIORITY_ORDER = ['interactive', 'ingest', 'bulk']
+
+# Классы, на которые распространяется лимит активных задач пользователя
+FAIR_SHARE_CLASSES = ['ingest', 'bulk']
+
+# Ключи Redis для fair-share
+ACTIVE_KEY = 'agentflow:fairshare:active:{user_id}'
+PENDING_KEY_PREFIX = 'agentflow:fairshare:pending:'
+PENDING_KEY = PENDING_KEY_PREFIX + '{user_id}:{priority}'
+
+# Статусы задачи, взятой worker'ом (RQ/БД: started, локальный пул: running)
+RUNNING_JOB_STATUSES = ('started', 'running')
+
+# Статусы задачи, которую еще можно снять с очереди
+PENDING_JOB_STATUSES = ('queued', 'deferred', 'scheduled')
+
+# Слот активной задачи освобождается принудительно, если worker умер (больше самого длинного timeout)
+ACTIVE_SLOT_TTL = 2 * 60 * 60
+
+# Атомарно занимает слот пользователя, если лимит не превышен и у него нет отложенных задач
+# (новая задача не обгоняет ранее отложенные). KEYS[2..] - списки отложенных задач пользователя
+ACQUIRE_SLOT_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[3] - ARGV[4])
+for i = 2, #KEYS do
+    if redis.call('LLEN', KEYS[i]) > 0 then
+        return 0
+    end
+end
+if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[2]) then
+    redis.call('ZADD', KEYS[1], ARGV[3], ARGV[1])
+    return 1
+end
+return 0
+"""
+
+# Атомарно занимает слоты для пачки задач (сколько позволяет лимит), возвращает число занятых
+ACQUIRE_SLOTS_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[2] - ARGV[3])
+for i = 2, #KEYS do
+    if redis.call('LLEN', KEYS[i]) > 0 then
+        return 0
+    end
+end
+local admitted = 0
+for i = 4, #ARGV do
+    if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[1]) then
+        break
+    end
+    redis.call('ZADD', KEYS[1], ARGV[2], ARGV[i])
+    admitted = admitted + 1
+end
+return admitted
+"""
+
+# Атомарно освобождает слот (ARGV[1], может быть пустым) и забирает столько отложенных
+# задач пользователя, сколько свободных слотов (включая освобожденные по TTL умерших worker'ов)
+RELEASE_SLOT_SCRIPT = """
+if ARGV[1] ~= '' then
+    redis.call('ZREM', KEYS[1], ARGV[1])
+end
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[3] - ARGV[4])
+local promoted = {}
+for i = 2, #KEYS do
+    while redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[2]) do
+        local job_id = redis.call('LPOP', KEYS[i])
+        if not job_id then
+            break
+        end
+        redis.call('ZADD', KEYS[1], ARGV[3], job_id)
+        table.insert(promoted, job_id)
+    end
+end
+return promoted
+"""
 
 class QueueManager:
     def __init__(self, redis_url: str = None):
         self.redis_url = redis_url or os.getenv('REDIS_URL')
         self.redis_conn = None
+        self.queues = {}
         self.video_queue = None
         self.render_queue = None
+        self.max_active_per_user = int(os.getenv('QUEUE_MAX_ACTIVE_PER_USER', '2'))
+        
+        # Бэкенд очереди: redis, database (персистентная очередь в БД) или local (пул потоков)
+        self.backend = 'local'
+        self.job_module = 'src.workers.worker'
         
         # Пытаемся подключиться к Redis
         if self.redis_url and self.redis_url.strip():
@@ -25,114 +123,165 @@ class QueueManager:
                 
                 # Импортируем RQ только если Redis доступен
                 from rq import Queue
-                self.video_queue = Queue('video_processing', connection=self.redis_conn)
-                self.render_queue = Queue('video_rendering', connection=self.redis_conn)
+                self.queues = {
+                    priority: Queue(name, connection=self.redis_conn)
+                    for priority, name in PRIORITY_QUEUES.items()
+                }
+                self.video_queue = self.queues['ingest']
+                self.render_queue = self.queues['bulk']
+                
+                self._acquire_slot = self.redis_conn.register_script(ACQUIRE_SLOT_SCRIPT)
+                self._acquire_slots = self.redis_conn.register_script(ACQUIRE_SLOTS_SCRIPT)
+                self._release_slot = self.redis_conn.register_script(RELEASE_SLOT_SCRIPT)
                 
-                print(f"✅ Redis connected: {self.redis_url}")
+                self.backend = 'redis'
+                logger.info("✅ Redis connected")
                 
             except Exception as e:
-                print(f"❌ Redis connection failed: {e}")
-                print("🔄 Falling back to synchronous processing")
+                logger.error("❌ Redis connection failed: %s", e)
                 self.redis_conn = None
         else:
-            print("⚠️ Redis URL not provided. Using synchronous processing.")
+            logger.warning("⚠️ Redis URL not provided.")
+        
+        if self.backend != 'redis':
+            if os.getenv('QUEUE_FALLBACK', 'local') == 'database':
+                self._init_database_queues()
+            else:
+                logger.info("🔄 Using local worker pool")
+    
+    def _init_database_queues(self):
+        """Переключается на персистентную очередь в БД (нужен отдельный db_worker)"""
+        from src.services.db_queue import DatabaseQueue
+        
+        self.queues = {
+            priority: DatabaseQueue(PRIORITY_QUEUES[priority], priority=index)
+            for index, priority in enumerate(PRIORITY_ORDER)
+        }
+        self.video_queue = self.queues['ingest']
+        self.render_queue = self.queues['bulk']
+        self.backend = 'database'
+        self.job_module = 'src.workers.db_worker'
+        logger.info("🔄 Using database-backed job queue")
     
     def is_available(self) -> bool:
-        """Проверяет доступность Redis"""
-        return self.redis_conn is not None
+        """Проверяет доступность очереди (Redis или персистентной очереди в БД)"""
+        return self.backend in ('redis', 'database')
     
-    def enqueue_video_processing(self, project_id: str) -> Optional[str]:
-        """Добавляет задачу обработки видео в очередь или выполняет синхронно"""
+    def _fetch_job(self, job_id: str):
+        """Получает задачу из текущего бэкенда (интерфейс rq.job.Job)"""
+        if self.backend == 'database':
+            from src.services.db_queue import DatabaseJob
+            return DatabaseJob.fetch(job_id)
+        
+        from rq.job import Job
+        return Job.fetch(job_id, connection=self.redis_conn)
+    
+    def enqueue_video_processing(self, project_id: str, user_id: str = None) -> Optional[str]:
+        """Добавляет задачу обработки видео в очередь (или в локальный пул)"""
         if self.is_available():
             try:
-                from src.workers.video_processor import processor
-                
-                job = self.video_queue.enqueue(
-                    'src.workers.worker.process_video_job',
+                job_id = self._submit(
+                    'ingest',
+                    f'{self.job_module}.process_video_job',
                     project_id,
-                    timeout='30m',
-                    job_id=f'process_{project_id}'
+                    job_id=f'process_{project_id}',
+                    job_timeout='30m',
+                    user_id=user_id
                 )
                 
-                print(f"📋 Video processing job queued: {job.id}")
-                return job.id
+                logger.info("📋 Video processing job queued: %s", job_id)
+                return job_id
                 
             except Exception as e:
-                print(f"❌ Failed to queue video processing: {e}")
-                print("🔄 Falling back to synchronous processing")
+                logger.error("❌ Failed to queue video processing: %s", e)
+                logger.info("🔄 Falling back to local worker pool")
         
-        # Fallback: синхронная обработка
-        try:
-            def sync_process():
-                from src.workers.video_processor import processor
-                processor.process_uploaded_video(project_id)
-            
-            thread = threading.Thread(target=sync_process)
-            thread.daemon = True
-            thread.start()
-            
-            job_id = f'sync_process_{project_id}'
-            print(f"🔄 Video processing started synchronously: {job_id}")
+        # Fallback: ограниченный локальный пул
+        job_id = f'sync_process_{project_id}'
+        if self._submit_local(job_id, 'process_uploaded_video', project_id):
+            logger.info("🔄 Video processing queued locally: %s", job_id)
             return job_id
-            
-        except Exception as e:
-            print(f"❌ Synchronous processing failed: {e}")
-            return None
+        
+        logger.error("❌ Local queue is full, video processing rejected: %s", job_id)
+        return None
     
-    def enqueue_video_render(self, render_id: str) -> Optional[str]:
-        """Добавляет задачу рендеринга в очередь или выполняет синхронно"""
+    def enqueue_video_render(self, render_id: str, user_id: str = None,
+                             priority: str = 'bulk') -> Optional[str]:
+        """Добавляет задачу рендеринга в очередь (или в локальный пул)"""
         if self.is_available():
             try:
-                from src.workers.video_processor import processor
-                
-                job = self.render_queue.enqueue(
-                    'src.workers.worker.render_video_job',
+                job_id = self._submit(
+                    priority,
+                    f'{self.job_module}.render_video_job',
                     render_id,
-                    timeout='60m',
-                    job_id=f'render_{render_id}'
+                    job_id=f'render_{render_id}',
+                    job_timeout='60m',
+                    user_id=user_id
                 )
                 
-                print(f"📋 Video render job queued: {job.id}")
-                return job.id
+                logger.info("📋 Video render job queued: %s (%s)", job_id, priority)
+                return job_id
                 
             except Exception as e:
-                print(f"❌ Failed to queue video render: {e}")
-                print("🔄 Falling back to synchronous processing")
+                logger.error("❌ Failed to queue video render: %s", e)
+                logger.info("🔄 Falling back to local worker pool")
         
-        # Fallback: синхронная обработка
-        try:
-            def sync_render():
-                from src.workers.video_processor import processor
-                processor.render_video(render_id)
-            
-            thread = threading.Thread(target=sync_render)
-            thread.daemon = True
-            thread.start()
-            
-            job_id = f'sync_render_{render_id}'
-            print(f"🔄 Video render started synchronously: {job_id}")
+        # Fallback: ограниченный локальный пул
+        job_id = f'sync_render_{render_id}'
+        if self._submit_local(job_id, 'render_video', render_id):
+            logger.info("🔄 Video render queued locally: %s", job_id)
             return job_id
-            
-        except Exception as e:
-            print(f"❌ Synchronous render failed: {e}")
-            return None
+        
+        logger.error("❌ Local queue is full, video render rejected: %s", job_id)
+        return None
+    
+    def enqueue_video_renders(self, render_ids: List[str], user_id: str = None,
+                              priority: str = 'bulk') -> Dict[str, Optional[str]]:
+        """Добавляет пачку рендеров одной операцией: {render_id: job_id или None, если очередь полна}"""
+        if not render_ids:
+            return {}
+        
+        if self.is_available():
+            try:
+                job_ids = self._submit_many(
+                    priority,
+                    f'{self.job_module}.render_video_job',
+                    [(f'render_{render_id}', (render_id,)) for render_id in render_ids],
+                    job_timeout='60m',
+                    user_id=user_id
+                )
+                
+                logger.info("📋 %s video render jobs queued (%s)", len(job_ids), priority)
+                return dict(zip(render_ids, job_ids))
+                
+            except Exception as e:
+                logger.error("❌ Failed to queue video render batch: %s", e)
+                logger.info("🔄 Falling back to local worker pool")
+        
+        # Fallback: ограниченный локальный пул, задачи сверх его лимита отклоняются
+        job_ids = {}
+        for render_id in render_ids:
+            job_id = f'sync_render_{render_id}'
+            job_ids[render_id] = job_id if self._submit_local(job_id, 'render_video', render_id) else None
+        
+        rejected = sum(1 for job_id in job_ids.values() if job_id is None)
+        logger.info("🔄 %s video renders queued locally, %s rejected", len(render_ids) - rejected, rejected)
+        return job_ids
     
     def get_job_status(self, job_id: str) -> Dict[str, Any]:
         """Получает статус задачи"""
+        # Задачи локального пула (в т.ч. fallback при сбое Redis)
+        if job_id.startswith('sync_'):
+            status = get_local_executor().get_status(job_id)
+            if status:
+                return status
+            return {'id': job_id, 'status': 'unknown', 'message': 'Job not found in local registry'}
+        
         if not self.is_available():
-            # Для синхронных задач возвращаем базовый статус
-            if job_id.startswith('sync_'):
-                return {
-                    'id': job_id,
-                    'status': 'processing',
-                    'message': 'Running synchronously'
-                }
             return {'status': 'unavailable', 'message': 'Redis not available'}
         
         try:
-            from rq import Job
-            
-            job = Job.fetch(job_id, connection=self.redis_conn)
+            job = self._fetch_job(job_id)
             
             return {
                 'id': job.id,
@@ -140,6 +289,7 @@ class QueueManager:
                 'created_at': job.created_at.isoformat() if job.created_at else None,
                 'started_at': job.started_at.isoformat() if job.started_at else None,
                 'ended_at': job.ended_at.isoformat() if job.ended_at else None,
+                'priority': job.meta.get('priority'),
                 'result': job.result,
                 'exc_info': job.exc_info
             }
@@ -152,65 +302,298 @@ class QueueManager:
         if not self.is_available():
             return {
                 'available': False, 
-                'mode': 'synchronous',
-                'message': 'Redis not available, using synchronous processing'
+                'mode': 'local',
+                'message': 'Redis not available, using local worker pool',
+                'local': get_local_executor().stats()
             }
         
         try:
-            return {
+            info = {
                 'available': True,
-                'mode': 'redis_queue',
-                'video_processing': {
-                    'length': len(self.video_queue),
-                    'failed_count': self.video_queue.failed_job_registry.count,
-                    'started_count': self.video_queue.started_job_registry.count
-                },
-                'video_rendering': {
-                    'length': len(self.render_queue),
-                    'failed_count': self.render_queue.failed_job_registry.count,
-                    'started_count': self.render_queue.started_job_registry.count
-                }
+                'mode': 'redis_queue' if self.backend == 'redis' else 'database_queue',
+                'priority_order': PRIORITY_ORDER,
+                'max_active_per_user': self.max_active_per_user
             }
             
+            for priority in PRIORITY_ORDER:
+                queue = self.queues[priority]
+                info[queue.name] = {
+                    'priority': priority,
+                    'length': len(queue),
+                    'failed_count': queue.failed_job_registry.count,
+                    'started_count': queue.started_job_registry.count
+                }
+            
+            return info
+            
         except Exception as e:
             return {'available': False, 'error': str(e)}
     
     def cancel_job(self, job_id: str) -> bool:
         """Отменяет задачу"""
+        if job_id.startswith('sync_'):
+            cancelled = get_local_executor().cancel(job_id)
+            if not cancelled:
+                logger.warning("⚠️ Cannot cancel local job (not queued): %s", job_id)
+            return cancelled
+        
         if not self.is_available():
-            print(f"⚠️ Cannot cancel synchronous job: {job_id}")
             return False
         
         try:
-            from rq import Job
+            job = self._fetch_job(job_id)
+            
+            # job.cancel() не останавливает уже выполняющуюся задачу
+            if self.backend == 'redis' and job.get_status() not in PENDING_JOB_STATUSES:
+                logger.warning("⚠️ Cannot cancel job (not pending): %s", job_id)
+                return False
             
-            job = Job.fetch(job_id, connection=self.redis_conn)
             job.cancel()
             
-            print(f"🚫 Job cancelled: {job_id}")
+            # Отложенная задача больше не должна продвигаться, а занятый слот освобождается
+            user_id = job.meta.get('user_id')
+            if user_id and self.backend == 'redis':
+                for priority in FAIR_SHARE_CLASSES:
+                    self.redis_conn.lrem(PENDING_KEY.format(user_id=user_id, priority=priority), 0, job_id)
+                self.release_job_slot(job_id, user_id)
+            
+            logger.info("🚫 Job cancelled: %s", job_id)
             return True
             
         except Exception as e:
-            print(f"❌ Failed to cancel job {job_id}: {e}")
+            logger.error("❌ Failed to cancel job %s: %s", job_id, e)
             return False
     
+    def cancel_pending_task(self, kind: str, object_id: str) -> bool:
+        """Снимает задачу kind ('process' или 'render') с очереди.
+        
+        True - задача больше не будет выполнена (снята с очереди или ее нет ни в
+        очереди, ни у worker'а). False - задача уже выполняется, остановить ее
+        может только worker (см. VideoProcessor._raise_if_cancelled).
+        """
+        for job_id in (f'{kind}_{object_id}', f'sync_{kind}_{object_id}'):
+            status = self.get_job_status(job_id).get('status')
+            
+            if status in RUNNING_JOB_STATUSES:
+                return False
+            
+            # Задачу могли взять между проверкой статуса и отменой
+            if status in PENDING_JOB_STATUSES and not self.cancel_job(job_id):
+                return False
+        
+        return True
+    
     def clear_failed_jobs(self) -> int:
         """Очищает failed jobs"""
         if not self.is_available():
             return 0
         
         try:
-            video_cleared = self.video_queue.failed_job_registry.requeue()
-            render_cleared = self.render_queue.failed_job_registry.requeue()
+            total_cleared = 0
+            for queue in self.queues.values():
+                total_cleared += len(queue.failed_job_registry.requeue())
             
-            total_cleared = len(video_cleared) + len(render_cleared)
-            print(f"🧹 Cleared {total_cleared} failed jobs")
+            logger.info("🧹 Cleared %s failed jobs", total_cleared)
             
             return total_cleared
             
         except Exception as e:
-            print(f"❌ Failed to clear failed jobs: {e}")
+            logger.error("❌ Failed to clear failed jobs: %s", e)
+            return 0
+    
+    def _fair_share_keys(self, user_id: str) -> List[str]:
+        """Ключи fair-share пользователя: слоты активных задач и списки отложенных по классам"""
+        return [ACTIVE_KEY.format(user_id=user_id)] + [
+            PENDING_KEY.format(user_id=user_id, priority=priority)
+            for priority in FAIR_SHARE_CLASSES
+        ]
+    
+    def release_job_slot(self, job_id: str, user_id: Optional[str]) -> List[str]:
+        """Освобождает fair-share слот завершенной задачи и продвигает отложенные задачи пользователя.
+        
+        job_id='' только продвигает задачи в свободные слоты (например, освобожденные
+        по TTL после гибели worker'а). Возвращает id продвинутых задач.
+        """
+        if self.backend != 'redis' or not user_id:
+            return []
+        
+        try:
+            promoted = self._release_slot(
+                keys=self._fair_share_keys(user_id),
+                args=[job_id, self.max_active_per_user, time.time(), ACTIVE_SLOT_TTL]
+            )
+            if not promoted:
+                return []
+            
+            from rq.job import Job, JobStatus
+            from rq.exceptions import NoSuchJobError
+            
+            promoted_ids = []
+            for next_job_id in promoted:
+                next_job_id = next_job_id.decode() if isinstance(next_job_id, bytes) else next_job_id
+                try:
+                    job = Job.fetch(next_job_id, connection=self.redis_conn)
+                except NoSuchJobError:
+                    # Задача удалена, пока ждала слот: слот ей больше не нужен
+                    self.redis_conn.zrem(ACTIVE_KEY.format(user_id=user_id), next_job_id)
+                    logger.warning("⚠️ Deferred job no longer exists: %s", next_job_id)
+                    continue
+                
+                # enqueue_job не трогает DEFERRED задачи, поэтому сначала переводим в QUEUED
+                job.set_status(JobStatus.QUEUED)
+                self.queues[job.meta.get('priority', 'bulk')].enqueue_job(job)
+                
+                logger.info("📋 Deferred job promoted: %s", next_job_id)
+                promoted_ids.append(next_job_id)
+            
+            return promoted_ids
+            
+        except Exception as e:
+            logger.error("❌ Failed to release job slot %s: %s", job_id, e)
+            return []
+    
+    def promote_deferred_jobs(self) -> int:
+        """Продвигает отложенные задачи всех пользователей в свободные слоты.
+        
+        Слот задачи, чей worker убит (SIGKILL/OOM), освобождается только по
+        ACTIVE_SLOT_TTL и без вызова release_job_slot - отложенные задачи такого
+        пользователя продвигает этот периодический проход (RQ worker, см. worker.py).
+        """
+        if self.backend != 'redis':
+            return 0
+        
+        try:
+            user_ids = set()
+            for key in self.redis_conn.scan_iter(match=f'{PENDING_KEY_PREFIX}*'):
+                key = key.decode() if isinstance(key, bytes) else key
+                user_ids.add(key[len(PENDING_KEY_PREFIX):].rsplit(':', 1)[0])
+        except Exception as e:
+            logger.error("❌ Failed to scan deferred jobs: %s", e)
             return 0
+        
+        promoted = sum(len(self.release_job_slot('', user_id)) for user_id in user_ids)
+        if promoted:
+            logger.info("📋 Promoted %s deferred jobs", promoted)
+        return promoted
+    
+    def _submit_local(self, job_id: str, method: str, *args) -> bool:
+        """Ставит задачу VideoProcessor в локальный пул"""
+        def run(*job_args):
+            from src.workers.video_processor import processor
+            return getattr(processor, method)(*job_args)
+        
+        return get_local_executor().submit(job_id, run, *args)
+    
+    def _submit(self, priority: str, func: str, *args, job_id: str,
+                job_timeout: str, user_id: Optional[str] = None) -> str:
+        """Ставит задачу в очередь своего класса с учетом fair-share лимита пользователя"""
+        if priority not in PRIORITY_QUEUES:
+            raise ValueError(f"Unknown priority class: {priority}")
+        
+        queue = self.queues[priority]
+        meta = {'priority': priority, 'user_id': user_id}
+        
+        # Interactive задачи короткие и не ждут за массовыми рендерами.
+        # В очереди БД fair-share применяется при выдаче задачи worker'у (claim_job)
+        if priority not in FAIR_SHARE_CLASSES or not user_id or self.backend != 'redis':
+            job = queue.enqueue(
+                func,
+                *args,
+                job_timeout=job_timeout,
+                job_id=job_id,
+                meta=meta,
+                at_front=priority == 'interactive'
+            )
+            return job.id
+        
+        admitted = self._acquire_slot(
+            keys=self._fair_share_keys(user_id),
+            args=[job_id, self.max_active_per_user, time.time(), ACTIVE_SLOT_TTL]
+        )
+        
+        if admitted:
+            job = queue.enqueue(func, *args, job_timeout=job_timeout, job_id=job_id, meta=meta)
+            return job.id
+        
+        # Лимит пользователя исчерпан: создаем отложенную задачу и ждем освобождения слота
+        from rq.job import JobStatus
+        
+        job = queue.create_job(
+            func,
+            args=args,
+            timeout=job_timeout,
+            job_id=job_id,
+            meta=meta,
+            status=JobStatus.DEFERRED
+        )
+        job.save()
+        self.redis_conn.rpush(PENDING_KEY.format(user_id=user_id, priority=priority), job.id)
+        
+        logger.info("⏳ Job deferred by fair-share limit: %s (user %s)", job.id, user_id)
+        
+        # Слот могли освободить между проверкой лимита и записью в список
+        self.release_job_slot('', user_id)
+        return job.id
+
+    def _submit_many(self, priority: str, func: str, jobs: List[tuple], job_timeout: str,
+                     user_id: Optional[str] = None) -> List[str]:
+        """Ставит пачку задач [(job_id, args)] в очередь класса одной транзакцией.
+        
+        Redis: слоты fair-share занимаются одним скриптом, а задачи (включая
+        отложенные сверх лимита) записываются одним pipeline. БД: один commit.
+        """
+        if priority not in PRIORITY_QUEUES:
+            raise ValueError(f"Unknown priority class: {priority}")
+        
+        queue = self.queues[priority]
+        meta = {'priority': priority, 'user_id': user_id}
+        at_front = priority == 'interactive'
+        
+        if self.backend != 'redis':
+            return [
+                job.id for job in queue.enqueue_many([
+                    {'func': func, 'args': args, 'job_id': job_id, 'job_timeout': job_timeout,
+                     'meta': meta, 'at_front': at_front}
+                    for job_id, args in jobs
+                ])
+            ]
+        
+        from rq import Queue
+        from rq.job import JobStatus
+        
+        admitted = len(jobs)
+        if priority in FAIR_SHARE_CLASSES and user_id:
+            admitted = int(self._acquire_slots(
+                keys=self._fair_share_keys(user_id),
+                args=[self.max_active_per_user, time.time(), ACTIVE_SLOT_TTL] + [job_id for job_id, _ in jobs]
+            ))
+        
+        with self.redis_conn.pipeline() as pipe:
+            queue.enqueue_many([
+                Queue.prepare_data(func, args=args, timeout=job_timeout, job_id=job_id, meta=meta, at_front=at_front)
+                for job_id, args in jobs[:admitted]
+            ], pipeline=pipe)
+            
+            # Лимит пользователя исчерпан: остальные ждут освобождения слотов (см. _submit)
+            for job_id, args in jobs[admitted:]:
+                job = queue.create_job(
+                    func,
+                    args=args,
+                    timeout=job_timeout,
+                    job_id=job_id,
+                    meta=meta,
+                    status=JobStatus.DEFERRED
+                )
+                job.save(pipeline=pipe)
+                pipe.rpush(PENDING_KEY.format(user_id=user_id, priority=priority), job_id)
+            
+            pipe.execute()
+        
+        if admitted < len(jobs):
+            logger.info("⏳ %s jobs deferred by fair-share limit (user %s)", len(jobs) - admitted, user_id)
+            self.release_job_slot('', user_id)
+        
+        return [job_id for job_id, _ in jobs]
 
 # Глобальный экземпляр
 queue_manager: Optional[QueueManager] = None
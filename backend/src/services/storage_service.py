@@ -1,9 +1,15 @@
 import os
+import threading
 from supabase import create_client, Client
 from typing import Optional, Dict, Any
 import uuid
 import mimetypes
 
+from src.config.logging_config import get_logger
+from src.services.metrics import count_storage_bytes
+
+logger = get_logger('storage')
+
 class SupabaseStorageService:
     def __init__(self, url: str, key: str):
         self.supabase: Client = create_client(url, key)
@@ -33,12 +39,12 @@ class SupabaseStorageService:
                         "fileSizeLimit": 500 * 1024 * 1024  # 500MB
                     }
                 )
-                print(f"Created bucket: {self.bucket_name}")
+                logger.info("Created bucket: %s", self.bucket_name)
             else:
-                print(f"Bucket {self.bucket_name} already exists")
+                logger.info("Bucket %s already exists", self.bucket_name)
                 
         except Exception as e:
-            print(f"Error with bucket: {e}")
+            logger.error("Error with bucket: %s", e)
     
     def upload_file(self, file_data: bytes, file_path: str, content_type: str = None) -> Dict[str, Any]:
         """Загружает файл в Supabase Storage"""
@@ -59,6 +65,8 @@ class SupabaseStorageService:
                 }
             )
             
+            count_storage_bytes('upload', len(file_data))
+            
             # Получаем публичный URL
             public_url = self.supabase.storage.from_(self.bucket_name).get_public_url(file_path)
             
@@ -99,13 +107,29 @@ class SupabaseStorageService:
         file_path = f"renders/{user_id}/{render_id}.{format}"
         return self.upload_file(file_data, file_path, f"video/{format}")
     
+    def path_from_url(self, public_url: str) -> Optional[str]:
+        """Путь объекта в bucket по его публичному URL (None - URL не из этого bucket)"""
+        marker = f"/object/public/{self.bucket_name}/"
+        path = public_url.split('?', 1)[0].partition(marker)[2]
+        return path or None
+    
+    def create_signed_url(self, file_path: str, expires_in: int, download_name: str = None) -> Optional[str]:
+        """Короткоживущая подписанная ссылка на объект; с download_name браузер скачивает файл под этим именем"""
+        try:
+            options = {'download': download_name} if download_name else {}
+            result = self.supabase.storage.from_(self.bucket_name).create_signed_url(file_path, expires_in, options)
+            return result.get('signedURL') or result.get('signedUrl')
+        except Exception as e:
+            logger.error("Error signing URL for %s: %s", file_path, e)
+            return None
+    
     def delete_file(self, file_path: str) -> bool:
         """Удаляет файл"""
         try:
             self.supabase.storage.from_(self.bucket_name).remove([file_path])
             return True
         except Exception as e:
-            print(f"Error deleting file {file_path}: {e}")
+            logger.error("Error deleting file %s: %s", file_path, e)
             return False
     
     def get_file_info(self, file_path: str) -> Optional[Dict[str, Any]]:
@@ -123,11 +147,13 @@ class SupabaseStorageService:
             return None
             
         except Exception as e:
-            print(f"Error getting file info: {e}")
+            logger.error("Error getting file info: %s", e)
             return None
 
-# Глобальный экземпляр (будет инициализирован в main.py)
+# Глобальный экземпляр: main.py/воркеры инициализируют его при старте (STARTUP_MODE=eager),
+# иначе он создается при первом обращении через get_storage_service()
 storage_service: Optional[SupabaseStorageService] = None
+_storage_lock = threading.Lock()
 
 def init_storage_service(supabase_url: str, supabase_key: str):
     """Инициализирует сервис хранения"""
@@ -136,27 +162,32 @@ def init_storage_service(supabase_url: str, supabase_key: str):
     storage_service.ensure_bucket_exists()
     return storage_service
 
-
-
-def get_storage_client():
-    """Получить клиент хранения с отладочными логами"""
-    print(f"🔍 [DEBUG] Attempting to get storage client.")
+def get_storage_service() -> Optional[SupabaseStorageService]:
+    """Сервис хранения; при первом вызове подключается по SUPABASE_URL/SUPABASE_ANON_KEY.
+    None - если Storage не настроен или подключиться не удалось"""
+    if storage_service is not None:
+        return storage_service
     
     supabase_url = os.getenv("SUPABASE_URL")
     supabase_anon_key = os.getenv("SUPABASE_ANON_KEY")
+    if not (supabase_url and supabase_anon_key):
+        return None
     
-    print(f"🔍 [DEBUG] SUPABASE_URL: {supabase_url is not None}")
-    print(f"🔍 [DEBUG] SUPABASE_ANON_KEY: {supabase_anon_key is not None}")
+    with _storage_lock:
+        if storage_service is None:
+            try:
+                init_storage_service(supabase_url, supabase_anon_key)
+                logger.info("✅ Supabase Storage initialized")
+            except Exception as e:
+                logger.error("❌ Supabase Storage initialization failed: %s", e)
+                return None
     
-    if supabase_url and supabase_anon_key:
-        try:
-            client = create_client(supabase_url, supabase_anon_key)
-            print(f"✅ [DEBUG] Supabase client created successfully.")
-            return client.storage
-        except Exception as e:
-            print(f"❌ [DEBUG] Error creating Supabase client: {e}")
-            return None
-    else:
-        print("❌ [DEBUG] Supabase environment variables not set.")
-        return None
+    return storage_service
 
+def get_storage_client():
+    """Storage API общего клиента Supabase (клиент создается один раз на процесс)"""
+    service = get_storage_service()
+    if service is None:
+        logger.debug("Supabase storage is not configured or unavailable")
+        return None
+    return service.supabase.storage
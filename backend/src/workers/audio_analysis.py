@@ -0,0 +1,137 @@
+"""
+Audio Analysis для AgentFlow Video Editor
+Векторизованный анализ аудио (NumPy): RMS по окнам, поиск тишины, предложения по нарезке
+"""
+
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+# Размер окна RMS по умолчанию (20 мс)
+DEFAULT_WINDOW_SECONDS = 0.02
+
+# Сколько окон обрабатываем за один проход (ограничивает пиковую память)
+WINDOWS_PER_BLOCK = 4096
+
+# Пол для перевода в dBFS, чтобы не брать log10(0)
+MIN_RMS = 1e-10
+
+
+def _windowed(samples: np.ndarray, window: int, reducer) -> np.ndarray:
+    """Применяет reducer к непересекающимся окнам (последнее окно может быть неполным)"""
+    total = len(samples)
+    if total == 0:
+        return np.zeros(0, dtype=np.float32)
+
+    n_windows = -(-total // window)
+    result = np.empty(n_windows, dtype=np.float32)
+
+    # Обрабатываем блоками: для memmap это держит память плоской
+    block = window * WINDOWS_PER_BLOCK
+    full_windows = total // window
+    for offset in range(0, full_windows * window, block):
+        end = min(offset + block, full_windows * window)
+        frames = np.asarray(samples[offset:end], dtype=np.float32).reshape(-1, window)
+        result[offset // window:end // window] = reducer(frames)
+
+    # Хвост короче окна
+    if full_windows < n_windows:
+        tail = np.asarray(samples[full_windows * window:], dtype=np.float32)
+        result[-1] = reducer(tail.reshape(1, -1))[0]
+
+    return result
+
+
+def windowed_rms(samples: np.ndarray, sample_rate: int,
+                 window_seconds: float = DEFAULT_WINDOW_SECONDS) -> np.ndarray:
+    """Считает RMS по непересекающимся окнам"""
+    window = max(1, int(round(sample_rate * window_seconds)))
+    return _windowed(samples, window, lambda frames: np.sqrt(np.mean(np.square(frames), axis=1)))
+
+
+def windowed_peaks(samples: np.ndarray, samples_per_pixel: int) -> np.ndarray:
+    """Считает пиковую амплитуду по окнам для waveform"""
+    return _windowed(samples, samples_per_pixel, lambda frames: np.max(np.abs(frames), axis=1))
+
+
+def detect_silences(samples: np.ndarray, sample_rate: int,
+                    threshold_db: float = -40.0, min_duration: float = 0.5,
+                    window_seconds: float = DEFAULT_WINDOW_SECONDS) -> List[Dict[str, float]]:
+    """Находит интервалы тишины: уровень ниже threshold_db (dBFS) дольше min_duration секунд"""
+    rms = windowed_rms(samples, sample_rate, window_seconds)
+    if len(rms) == 0:
+        return []
+
+    levels_db = 20.0 * np.log10(np.maximum(rms, MIN_RMS))
+    silent = levels_db < threshold_db
+
+    # Границы серий тихих окон через разность булевой маски
+    edges = np.diff(np.concatenate(([0], silent.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    window = max(1, int(round(sample_rate * window_seconds)))
+    start_times = starts * window / sample_rate
+    end_times = np.minimum(ends * window, len(samples)) / sample_rate
+
+    keep = (end_times - start_times) >= min_duration
+
+    return [
+        {
+            'start': round(float(start), 3),
+            'end': round(float(end), 3),
+            'duration': round(float(end - start), 3)
+        }
+        for start, end in zip(start_times[keep], end_times[keep])
+    ]
+
+
+def suggest_cuts(silences: List[Dict[str, float]], duration: Optional[float] = None,
+                 min_duration: float = 0.0, padding: float = 0.1) -> Dict[str, Any]:
+    """Строит список вырезаемых интервалов и оставшихся сегментов по найденной тишине"""
+    intervals = []
+    for silence in silences or []:
+        start = silence['start'] + padding
+        end = silence['end'] - padding
+
+        # Тишину в самом начале/конце ролика вырезаем целиком
+        if silence['start'] <= 0:
+            start = 0.0
+        if duration is not None and silence['end'] >= duration:
+            end = duration
+
+        if end - start >= max(min_duration, 0.0) and end > start:
+            intervals.append([start, end])
+
+    # Пересекающиеся и смежные вырезы объединяем, иначе их длительность считалась бы дважды
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+
+    cuts = [
+        {
+            'start': round(start, 3),
+            'end': round(end, 3),
+            'duration': round(end - start, 3)
+        }
+        for start, end in merged
+    ]
+
+    keep_segments = []
+    if duration is not None:
+        cursor = 0.0
+        for cut in cuts:
+            if cut['start'] > cursor:
+                keep_segments.append({'start': round(cursor, 3), 'end': cut['start']})
+            cursor = max(cursor, cut['end'])
+        if cursor < duration:
+            keep_segments.append({'start': round(cursor, 3), 'end': round(duration, 3)})
+
+    return {
+        'cuts': cuts,
+        'keep_segments': keep_segments,
+        'total_cut_duration': round(sum(cut['duration'] for cut in cuts), 3)
+    }
@@ -0,0 +1,93 @@
+"""
+Audio Artifact Store для AgentFlow Video Editor
+Декодированное mono PCM (float32) хранится один раз на проект и читается через numpy.memmap
+"""
+
+import os
+import time
+from typing import Optional
+
+import numpy as np
+
+# Частота дискретизации общего аудио-артефакта (подходит и для транскрипции)
+AUDIO_SAMPLE_RATE = 16000
+
+
+class AudioArtifactStore:
+    def __init__(self, base_dir: str = None, ttl_seconds: int = None):
+        self.base_dir = base_dir or os.path.join(os.getenv('TEMP_DIR', '/tmp/video-editor'), 'audio')
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else int(os.getenv('AUDIO_ARTIFACT_TTL', '86400'))
+        self.sample_rate = AUDIO_SAMPLE_RATE
+        
+        os.makedirs(self.base_dir, exist_ok=True)
+    
+    def path_for(self, project_id: str) -> str:
+        """Путь к PCM файлу проекта"""
+        return os.path.join(self.base_dir, f"{project_id}.f32")
+    
+    def exists(self, project_id: str) -> bool:
+        """Проверяет, что артефакт есть и не просрочен"""
+        path = self.path_for(project_id)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return False
+        
+        return stat.st_size > 0 and not self._is_expired(stat.st_mtime)
+    
+    def publish(self, project_id: str, part_path: str) -> str:
+        """Атомарно публикует записанный файл как артефакт проекта"""
+        path = self.path_for(project_id)
+        os.replace(part_path, path)
+        
+        # Заодно чистим просроченные артефакты других проектов
+        self.purge_expired()
+        return path
+    
+    def open(self, project_id: str) -> Optional[np.memmap]:
+        """Открывает артефакт только для чтения; продлевает TTL"""
+        if not self.exists(project_id):
+            return None
+        
+        path = self.path_for(project_id)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        
+        return np.memmap(path, dtype=np.float32, mode='r')
+    
+    def remove(self, project_id: str):
+        """Удаляет артефакт проекта"""
+        try:
+            os.remove(self.path_for(project_id))
+        except FileNotFoundError:
+            pass
+    
+    def purge_expired(self) -> int:
+        """Удаляет просроченные артефакты"""
+        removed = 0
+        try:
+            entries = list(os.scandir(self.base_dir))
+        except FileNotFoundError:
+            return 0
+        
+        for entry in entries:
+            if not entry.name.endswith('.f32'):
+                continue
+            try:
+                if self._is_expired(entry.stat().st_mtime):
+                    os.remove(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+            except Exception as e:
+                print(f"⚠️ Failed to purge audio artifact {entry.path}: {e}")
+        
+        return removed
+    
+    def _is_expired(self, mtime: float) -> bool:
+        return self.ttl_seconds > 0 and time.time() - mtime > self.ttl_seconds
+
+# Глобальный экземпляр
+audio_store = AudioArtifactStore()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Database Queue Worker для AgentFlow Video Editor
+Выполняет задачи из персистентной очереди в БД (QUEUE_FALLBACK=database), без Redis
+"""
+
+import os
+import sys
+import time
+import signal
+import socket
+import threading
+import importlib
+from flask import Flask
+
+# Добавляем путь к проекту
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.models.video_project import db
+from src.models.background_job import BackgroundJob
+from src.services.storage_service import init_storage_service
+from src.config.logging_config import configure_logging, get_logger, stop_logging
+from src.config.database import configure_database, get_startup_mode
+from src.services.metrics import observe_queue_wait
+from src.services.queue_service import PRIORITY_QUEUES, PRIORITY_ORDER
+from src.services.db_queue import (
+    claim_job, extend_lease, complete_job, fail_job, cancel_started_job, prune_jobs, DEFAULT_LEASE_SECONDS
+)
+from src.workers.video_processor import processor
+from src.workers.media_cache import media_cache
+
+# Логи сервисов (очередь, storage, кэш, БД) в том же формате, что у API
+configure_logging()
+logger = get_logger('worker')
+
+app = Flask(__name__)
+
+# Конфигурация БД: та же строка подключения (и тот же файл SQLite), что у API
+database_uri, database_connected = configure_database(app, get_startup_mode())
+app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+# Инициализация
+db.init_app(app)
+
+# Инициализация Supabase Storage
+supabase_url = os.getenv('SUPABASE_URL')
+supabase_key = os.getenv('SUPABASE_ANON_KEY')
+
+if supabase_url and supabase_key:
+    init_storage_service(supabase_url, supabase_key)
+    logger.info("✅ Supabase Storage initialized")
+
+POLL_INTERVAL = float(os.getenv('DB_QUEUE_POLL_INTERVAL', '2'))
+MAX_ACTIVE_PER_USER = int(os.getenv('QUEUE_MAX_ACTIVE_PER_USER', '2'))
+# Сколько ждать остановки задачи после ее timeout
+TIMEOUT_GRACE_SECONDS = int(os.getenv('DB_QUEUE_TIMEOUT_GRACE', '60'))
+# Как часто удалять старые завершенные задачи (см. prune_jobs)
+PRUNE_INTERVAL = 3600
+
+def process_video_job(project_id: str):
+    """Job функция для обработки видео"""
+    return processor.process_uploaded_video(project_id)
+
+def render_video_job(render_id: str):
+    """Job функция для рендеринга видео"""
+    return processor.render_video(render_id)
+
+class LeaseHeartbeat(threading.Thread):
+    """Продлевает lease задачи, пока она выполняется.
+
+    По timeout задачу останавливает processor.time_limit (ffmpeg убивается, попытка
+    завершается ошибкой и повторяется через fail_job); lease продлевается и пока
+    задача останавливается, иначе ее забрал бы другой worker. Если задача не
+    остановилась за TIMEOUT_GRACE_SECONDS после timeout, попытка отмечается неудачной,
+    а процесс worker'а завершается (supervisor запустит новый): повтор не должен
+    выполняться параллельно с зависшей попыткой.
+    """
+
+    def __init__(self, job_id: str, worker_id: str, timeout: int):
+        super().__init__(name=f'heartbeat-{job_id}', daemon=True)
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.timeout = timeout
+        self.deadline = time.time() + timeout
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(DEFAULT_LEASE_SECONDS / 3):
+            if time.time() > self.deadline + TIMEOUT_GRACE_SECONDS:
+                self._abandon()
+                return
+            try:
+                with app.app_context():
+                    if not extend_lease(self.job_id, self.worker_id):
+                        logger.warning("⚠️ Lease lost for job %s", self.job_id)
+                        return
+            except Exception as e:
+                logger.warning("⚠️ Heartbeat failed for job %s: %s", self.job_id, e)
+
+    def _abandon(self):
+        """Задача зависла после timeout: фиксируем попытку и завершаем процесс"""
+        logger.error("⏰ Job %s did not stop %ss after its timeout, exiting worker", self.job_id, TIMEOUT_GRACE_SECONDS)
+        try:
+            with app.app_context():
+                outcome = fail_job(self.job_id, self.worker_id, f"Job exceeded its timeout ({self.timeout}s)")
+                logger.error("❌ Job %s failed (%s): timeout", self.job_id, outcome)
+        except Exception as e:
+            logger.error("⚠️ Failed to record timeout for job %s: %s", self.job_id, e)
+        stop_logging()
+        os._exit(1)
+
+    def stop(self):
+        self.stopped.set()
+
+def _resolve(func_path: str):
+    """Импортирует функцию задачи по пути 'module.function'"""
+    module_name, func_name = func_path.rsplit('.', 1)
+    return getattr(importlib.import_module(module_name), func_name)
+
+def execute_job(job: BackgroundJob, worker_id: str):
+    """Выполняет одну задачу и фиксирует результат"""
+    job_id = job.id
+    logger.info("👷 Running job %s (attempt %s/%s)", job_id, job.attempts, job.max_attempts)
+    # run_at - когда задача стала доступна (для повтора - после backoff)
+    observe_queue_wait(job.queue, job.run_at, job.started_at)
+
+    heartbeat = LeaseHeartbeat(job_id, worker_id, job.timeout)
+    heartbeat.start()
+
+    cancelled = False
+    try:
+        # Задачи VideoProcessor сами останавливаются по timeout (JobTimeout)
+        with processor.time_limit(job.timeout):
+            result = _resolve(job.func)(*(job.args or []))
+        error = None
+        # Отмененная задача не повторяется
+        cancelled = isinstance(result, dict) and bool(result.get('cancelled'))
+        # VideoProcessor сообщает об ошибке через результат, а не исключение
+        if isinstance(result, dict) and result.get('success') is False:
+            error = result.get('error') or 'Job reported failure'
+    except Exception as e:
+        db.session.rollback()
+        result = None
+        error = str(e)
+    finally:
+        heartbeat.stop()
+
+    if cancelled:
+        cancel_started_job(job_id, worker_id)
+        logger.info("🚫 Job cancelled: %s", job_id)
+    elif error is None:
+        complete_job(job_id, worker_id, result)
+        logger.info("✅ Job finished: %s", job_id)
+    else:
+        outcome = fail_job(job_id, worker_id, error)
+        logger.error("❌ Job %s failed (%s): %s", job_id, outcome, error)
+
+def _prune_finished_jobs():
+    try:
+        with app.app_context():
+            deleted = prune_jobs()
+        if deleted:
+            logger.info("🧹 Pruned %s finished jobs", deleted)
+    except Exception as e:
+        logger.error("⚠️ Failed to prune finished jobs: %s", e)
+
+def start_worker(queue_names=None, burst: bool = False):
+    """Запускает worker персистентной очереди"""
+    queue_names = queue_names or [PRIORITY_QUEUES[priority] for priority in PRIORITY_ORDER]
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    stopping = threading.Event()
+
+    def handle_signal(signum, frame):
+        logger.info("🛑 Shutdown requested, finishing current job...")
+        stopping.set()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    logger.info("🚀 Starting AgentFlow Video Editor DB Queue Worker")
+    logger.info("🗄️ Database: %s", 'PostgreSQL' if database_connected else 'SQLite')
+    logger.info("📦 Storage: %s", 'Supabase' if supabase_url else 'Local fallback')
+    logger.info("👷 Worker %s listening on: %s", worker_id, ', '.join(queue_names))
+
+    next_prune = 0.0
+    while not stopping.is_set():
+        if time.monotonic() >= next_prune:
+            _prune_finished_jobs()
+            next_prune = time.monotonic() + PRUNE_INTERVAL
+
+        # Допуск: пока на диске мало места, новые задачи остаются в очереди
+        if not media_cache.has_headroom():
+            logger.warning("⚠️ Scratch space is low, not claiming new jobs")
+            stopping.wait(POLL_INTERVAL)
+            continue
+
+        with app.app_context():
+            job = claim_job(worker_id, queue_names, max_active_per_user=MAX_ACTIVE_PER_USER)
+            if job:
+                execute_job(job, worker_id)
+                continue
+
+        if burst:
+            break
+        stopping.wait(POLL_INTERVAL)
+
+if __name__ == '__main__':
+    start_worker(burst='--burst' in sys.argv)
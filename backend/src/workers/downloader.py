@@ -0,0 +1,240 @@
+"""
+Downloader для AgentFlow Video Editor
+Загрузка исходников из storage: пул HTTP соединений, параллельные Range запросы
+в предвыделенный файл и проверка контрольной суммы.
+
+Большие объекты делятся на части по DOWNLOAD_PART_MB, которые качаются
+DOWNLOAD_CONCURRENCY потоками и пишутся через os.pwrite по своим смещениям.
+Если сервер не поддерживает Range (на пробный запрос первого байта или на
+запрос части пришел 200), объект качается одним потоком с крупным буфером записи.
+После загрузки сверяются размер и MD5 (Content-MD5 или ETag простой загрузки).
+"""
+
+import os
+import base64
+import hashlib
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+from typing import Callable, Dict, Any, Optional, List, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+MB = 1024 * 1024
+
+# Блок чтения из сокета и буфер записи на диск
+READ_BLOCK_SIZE = 1 * MB
+WRITE_BUFFER_SIZE = 8 * MB
+
+# ETag простой (не multipart) загрузки S3-совместимого storage - MD5 содержимого
+MD5_ETAG_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+class DownloadError(Exception):
+    """Объект скачан не полностью или не прошел проверку"""
+
+
+class RangeNotSupported(Exception):
+    """Сервер ответил на Range запрос не частью объекта"""
+
+
+class Downloader:
+    def __init__(self, concurrency: int = None, part_size: int = None, min_parallel_size: int = None,
+                 timeout: Tuple[float, float] = (10, 60)):
+        self.concurrency = concurrency or int(os.getenv('DOWNLOAD_CONCURRENCY', '4'))
+        self.part_size = part_size or int(os.getenv('DOWNLOAD_PART_MB', '16')) * MB
+        self.min_parallel_size = (
+            min_parallel_size if min_parallel_size is not None
+            else int(os.getenv('DOWNLOAD_PARALLEL_MIN_MB', '64')) * MB
+        )
+        self.timeout = timeout
+
+        # Одна сессия на процесс: keep-alive соединения переиспользуются между частями и задачами
+        retry = Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=('HEAD', 'GET')
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.concurrency * 2, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def download(self, url: str, dest_path: str, check: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+        """Скачивает url в dest_path.
+
+        check вызывается в вызывающем потоке во время загрузки (например, проверка
+        отмены задачи); исключение из него прерывает загрузку.
+        """
+        probe = self._probe(url)
+        size = probe['size']
+
+        mode = 'stream'
+        if probe['ranges'] and size and size >= self.min_parallel_size:
+            try:
+                self._download_ranged(probe['url'], dest_path, size, check)
+                mode = 'ranged'
+            except RangeNotSupported:
+                print(f"⚠️ Range requests not honored for {url}, falling back to a single stream")
+
+        if mode == 'stream':
+            written = self._download_stream(probe['url'], dest_path, check)
+            if size is None:
+                size = written
+
+        self._verify(dest_path, size, probe['md5'])
+
+        return {
+            'path': dest_path,
+            'size': os.path.getsize(dest_path),
+            'mode': mode,
+            'verified_md5': bool(probe['md5'])
+        }
+
+    def _probe(self, url: str) -> Dict[str, Any]:
+        """Запрос первого байта: размер, поддержка Range и ожидаемый MD5.
+
+        Range-проба надежнее HEAD: многие серверы объявляют Accept-Ranges только
+        в ответах 206, а часть storage не отвечает на HEAD вовсе.
+        """
+        try:
+            response = self.session.get(url, headers={'Range': 'bytes=0-0'}, stream=True, timeout=self.timeout)
+        except requests.RequestException:
+            return {'url': url, 'size': None, 'ranges': False, 'md5': None}
+
+        with response:
+            if response.status_code >= 400:
+                return {'url': url, 'size': None, 'ranges': False, 'md5': None}
+
+            headers = response.headers
+            size = None
+            ranges = False
+
+            if response.status_code == 206:
+                # Content-Range: bytes 0-0/<полный размер>
+                total = headers.get('Content-Range', '').rpartition('/')[2]
+                if total.isdigit():
+                    size = int(total)
+                    ranges = True
+            else:
+                length = headers.get('Content-Length')
+                size = int(length) if length and length.isdigit() else None
+
+            return {
+                'url': response.url,
+                'size': size,
+                'ranges': ranges,
+                # Content-MD5 у ответа 206 относится к части, поэтому берем только ETag
+                'md5': self._expected_md5(headers, allow_content_md5=response.status_code == 200)
+            }
+
+    def _expected_md5(self, headers, allow_content_md5: bool = True) -> Optional[str]:
+        content_md5 = headers.get('Content-MD5') if allow_content_md5 else None
+        if content_md5:
+            try:
+                return base64.b64decode(content_md5).hex()
+            except (ValueError, TypeError):
+                pass
+
+        etag = headers.get('ETag', '').strip()
+        if etag.startswith('W/'):
+            return None
+        etag = etag.strip('"').lower()
+        return etag if MD5_ETAG_PATTERN.match(etag) else None
+
+    def _download_stream(self, url: str, dest_path: str, check: Optional[Callable[[], None]]) -> int:
+        """Один поток с крупным буфером записи; возвращает число байт"""
+        written = 0
+        with self.session.get(url, stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            expected = response.headers.get('Content-Length')
+
+            with open(dest_path, 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+                for block in response.iter_content(chunk_size=READ_BLOCK_SIZE):
+                    f.write(block)
+                    written += len(block)
+                    if check:
+                        check()
+
+        if expected and expected.isdigit() and int(expected) != written:
+            raise DownloadError(f"Incomplete download: {written} of {expected} bytes")
+        return written
+
+    def _download_ranged(self, url: str, dest_path: str, size: int, check: Optional[Callable[[], None]]):
+        """Параллельные Range запросы, каждая часть пишется по своему смещению"""
+        parts = self._split(size)
+        stop = threading.Event()
+
+        fd = os.open(dest_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            self._preallocate(fd, size)
+
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='download') as pool:
+                pending = {pool.submit(self._fetch_part, url, fd, start, end, stop) for start, end in parts}
+                try:
+                    while pending:
+                        done, pending = wait(pending, timeout=1.0, return_when=FIRST_EXCEPTION)
+                        for future in done:
+                            future.result()
+                        if check:
+                            check()
+                except BaseException:
+                    stop.set()
+                    for future in pending:
+                        future.cancel()
+                    raise
+        finally:
+            os.close(fd)
+
+    def _fetch_part(self, url: str, fd: int, start: int, end: int, stop: threading.Event):
+        if stop.is_set():
+            return
+
+        headers = {'Range': f'bytes={start}-{end}'}
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 200:
+                raise RangeNotSupported()
+            response.raise_for_status()
+
+            content_range = response.headers.get('Content-Range', '')
+            if response.status_code != 206 or not content_range.startswith(f'bytes {start}-'):
+                raise RangeNotSupported()
+
+            offset = start
+            for block in response.iter_content(chunk_size=READ_BLOCK_SIZE):
+                if stop.is_set():
+                    return
+                os.pwrite(fd, block, offset)
+                offset += len(block)
+
+        if offset != end + 1:
+            raise DownloadError(f"Incomplete part {start}-{end}: got {offset - start} bytes")
+
+    def _split(self, size: int) -> List[Tuple[int, int]]:
+        return [(start, min(start + self.part_size, size) - 1) for start in range(0, size, self.part_size)]
+
+    def _preallocate(self, fd: int, size: int):
+        """Резервирует место под весь файл (меньше фрагментации, нехватка места видна сразу)"""
+        try:
+            os.posix_fallocate(fd, 0, size)
+        except (AttributeError, OSError):
+            os.ftruncate(fd, size)
+
+    def _verify(self, path: str, size: Optional[int], md5: Optional[str]):
+        actual_size = os.path.getsize(path)
+        if size is not None and actual_size != size:
+            raise DownloadError(f"Size mismatch: expected {size}, got {actual_size}")
+
+        if md5:
+            digest = hashlib.md5()
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(WRITE_BUFFER_SIZE), b''):
+                    digest.update(block)
+            if digest.hexdigest() != md5:
+                raise DownloadError(f"Checksum mismatch: expected {md5}, got {digest.hexdigest()}")
+
+# Глобальный экземпляр (пул соединений на процесс worker'а)
+downloader = Downloader()
@@ -0,0 +1,214 @@
+"""
+Media Cache для AgentFlow Video Editor
+Локальный кэш исходников (оригиналы из storage) на диске worker'а.
+
+Запись адресуется хэшем URL объекта в storage (объекты неизменяемы: новое
+содержимое получает новый URL). Кэш разделяют все процессы worker'а на машине:
+- пока задача использует файл, она держит на нем shared flock - это счетчик
+  ссылок, который видят и другие процессы; вытеснение пропускает такие файлы;
+- параллельные промахи по одному URL ждут одну загрузку (exclusive flock на .lock;
+  .lock удаляется вместе с записью или после неудачной загрузки);
+- вытеснение по LRU (mtime обновляется при каждом попадании) держит кэш в
+  пределах MEDIA_CACHE_MAX_BYTES;
+- допуск: если даже после вытеснения на диске остается меньше
+  SCRATCH_MIN_FREE_BYTES, загрузка отклоняется с ScratchSpaceError.
+"""
+
+import os
+import fcntl
+import shutil
+import hashlib
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, List, Tuple
+
+from src.services.metrics import count_cache_lookup
+
+GB = 1024 ** 3
+
+
+class ScratchSpaceError(Exception):
+    """На диске worker'а не хватает места для задачи"""
+
+
+class MediaCache:
+    def __init__(self, base_dir: str = None, max_bytes: int = None, min_free_bytes: int = None):
+        self.base_dir = base_dir or os.path.join(os.getenv('TEMP_DIR', '/tmp/video-editor'), 'media-cache')
+        self.max_bytes = max_bytes if max_bytes is not None else int(float(os.getenv('MEDIA_CACHE_MAX_GB', '20')) * GB)
+        self.min_free_bytes = (
+            min_free_bytes if min_free_bytes is not None
+            else int(float(os.getenv('SCRATCH_MIN_FREE_GB', '2')) * GB)
+        )
+
+        os.makedirs(self.base_dir, exist_ok=True)
+
+    def path_for(self, url: str) -> str:
+        """Путь к записи кэша для URL"""
+        return os.path.join(self.base_dir, hashlib.sha256(url.encode()).hexdigest())
+
+    @contextmanager
+    def acquire(self, url: str, fetch: Callable[[str], None], size_hint: Optional[int] = None) -> Iterator[str]:
+        """Отдает путь к локальной копии объекта, при промахе загружая его через fetch(path).
+
+        Файл защищен от вытеснения, пока открыт контекст.
+        """
+        path = self.path_for(url)
+
+        handle = self._open_shared(path)
+        count_cache_lookup('media', handle is not None)
+        if handle is None:
+            handle = self._fill(url, path, fetch, size_hint)
+
+        try:
+            yield path
+        finally:
+            handle.close()
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        return {
+            'entries': len(entries),
+            'bytes': sum(size for _, size, _ in entries),
+            'max_bytes': self.max_bytes,
+            'free_bytes': self._free_bytes()
+        }
+
+    def has_headroom(self, size: int = 0) -> bool:
+        """Хватит ли места под файл size с учетом того, что можно вытеснить"""
+        reclaimable = sum(size for path, size, _ in self._entries() if not self._in_use(path))
+        return self._free_bytes() + reclaimable - size >= self.min_free_bytes
+
+    def _open_shared(self, path: str):
+        """Попадание: открывает файл под shared lock и обновляет его LRU-время"""
+        try:
+            handle = open(path, 'rb')
+        except FileNotFoundError:
+            return None
+
+        fcntl.flock(handle, fcntl.LOCK_SH)
+
+        # Файл могли вытеснить между open и flock
+        if not os.path.exists(path):
+            handle.close()
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return handle
+
+    def _fill(self, url: str, path: str, fetch: Callable[[str], None], size_hint: Optional[int]):
+        """Промах: загружает объект; параллельные промахи того же URL ждут первую загрузку"""
+        with open(f"{path}.lock", 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+
+            handle = self._open_shared(path)
+            if handle is not None:
+                return handle
+
+            self._admit(size_hint or 0)
+
+            part_path = f"{path}.{os.getpid()}.part"
+            try:
+                fetch(part_path)
+                os.replace(part_path, path)
+            except BaseException:
+                self._remove_quietly(part_path)
+                self._remove_quietly(f"{path}.lock")
+                raise
+
+            handle = open(path, 'rb')
+            fcntl.flock(handle, fcntl.LOCK_SH)
+
+        # После загрузки размер точный: подрезаем кэш под бюджет
+        self._evict(0)
+        return handle
+
+    def _admit(self, size: int):
+        """Освобождает место под файл size или отклоняет его"""
+        self._evict(size)
+
+        if self._free_bytes() - size < self.min_free_bytes:
+            raise ScratchSpaceError(
+                f"Not enough scratch space: need {size} bytes plus {self.min_free_bytes} reserved, "
+                f"{self._free_bytes()} free"
+            )
+
+    def _evict(self, incoming: int):
+        """LRU вытеснение неиспользуемых записей до бюджета (и до резерва свободного места)"""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+
+        for path, size, _ in entries:
+            over_budget = total + incoming > self.max_bytes
+            low_disk = self._free_bytes() - incoming < self.min_free_bytes
+            if not over_budget and not low_disk:
+                break
+
+            if self._remove_unused(path):
+                total -= size
+
+    def _remove_unused(self, path: str) -> bool:
+        """Удаляет запись, если ее никто не держит (exclusive flock без ожидания)"""
+        try:
+            handle = open(path, 'rb')
+        except FileNotFoundError:
+            return False
+
+        with handle:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                return False
+
+            # Параллельный промах, открывший старый .lock, в худшем случае загрузит объект повторно
+            self._remove_quietly(f"{path}.lock")
+            return True
+
+    @staticmethod
+    def _remove_quietly(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _in_use(self, path: str) -> bool:
+        try:
+            with open(path, 'rb') as handle:
+                try:
+                    fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    return False
+                except BlockingIOError:
+                    return True
+        except FileNotFoundError:
+            return False
+
+    def _entries(self) -> List[Tuple[str, int, float]]:
+        """Записи кэша: (путь, размер, время последнего использования)"""
+        entries = []
+        try:
+            scanned = list(os.scandir(self.base_dir))
+        except FileNotFoundError:
+            return entries
+
+        for entry in scanned:
+            if '.' in entry.name:
+                continue  # .lock и .part
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((entry.path, stat.st_size, stat.st_mtime))
+
+        return entries
+
+    def _free_bytes(self) -> int:
+        return shutil.disk_usage(self.base_dir).free
+
+# Глобальный экземпляр
+media_cache = MediaCache()
@@ -0,0 +1,207 @@
+"""
+Stage Pipeline для AgentFlow Video Editor
+Конвейер задачи как DAG объявленных этапов с checkpoint'ами.
+
+Этап - функция от результатов своих зависимостей, возвращающая JSON-совместимый
+результат. Независимые этапы выполняются параллельно в пуле потоков; результат
+каждого завершенного этапа передается в on_complete (поток задачи сохраняет его
+в БД). При повторе задачи этапы с сохраненным и все еще валидным результатом
+(например, файл на месте) пропускаются - работа продолжается с первого
+незавершенного этапа.
+
+Функции этапов не должны обращаться к сессии БД: она принадлежит потоку задачи.
+Для этого же потока вызывается poll (проверка отмены, запись прогресса).
+"""
+
+import os
+import time
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, Any, Optional, Iterable, List
+
+from src.workers.tracing import JobTrace
+
+DEFAULT_MAX_PARALLEL = int(os.getenv('PIPELINE_MAX_PARALLEL', '3'))
+
+# Как часто поток задачи вызывает poll, пока этапы работают
+POLL_INTERVAL = 1.0
+
+
+class Stage:
+    def __init__(self, name: str, func: Callable[[Dict[str, Any]], Any], depends_on: Iterable[str] = (),
+                 checkpoint: bool = True, is_valid: Optional[Callable[[Any], bool]] = None):
+        """
+        checkpoint=False - результат не сохраняется (этап дешевый или его результат
+        привязан к процессу, например открытый файл кэша).
+        is_valid - проверка сохраненного результата перед пропуском этапа.
+        """
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+        self.checkpoint = checkpoint
+        self.is_valid = is_valid
+
+
+def file_output_exists(output: Any) -> bool:
+    """Сохраненный результат с локальным файлом валиден, только если файл на месте"""
+    path = output.get('path') if isinstance(output, dict) else None
+    return bool(path) and os.path.exists(path)
+
+
+def stage_checkpoint(output: Any, started_at: float) -> Dict[str, Any]:
+    """Запись checkpoint'а этапа для pipeline_state"""
+    return {
+        'output': output,
+        'completed_at': datetime.utcnow().isoformat(),
+        'seconds': round(time.time() - started_at, 3)
+    }
+
+
+class StagePipeline:
+    def __init__(self, stages: List[Stage], max_parallel: int = None):
+        self.stages = {stage.name: stage for stage in stages}
+        self.max_parallel = max_parallel or DEFAULT_MAX_PARALLEL
+
+        for stage in stages:
+            missing = [name for name in stage.depends_on if name not in self.stages]
+            if missing:
+                raise ValueError(f"Stage {stage.name} depends on unknown stages: {missing}")
+
+    def run(self, checkpoints: Optional[Dict[str, Any]],
+            on_complete: Callable[[str, Dict[str, Any]], None],
+            poll: Optional[Callable[[], None]] = None,
+            thread_init: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+        """Выполняет DAG и возвращает результаты всех этапов.
+
+        checkpoints - сохраненные ранее записи {этап: {'output': ...}}.
+        on_complete(name, checkpoint) вызывается в потоке задачи для каждого нового
+        результата этапа с checkpoint=True.
+        thread_init вызывается в каждом потоке пула (перенос контекста задачи).
+        Если этап упал, дожидаемся уже запущенных соседей (их результаты тоже
+        сохраняются) и пробрасываем первую ошибку.
+        """
+        results: Dict[str, Any] = {}
+        skipped = []
+
+        for name, entry in (checkpoints or {}).items():
+            stage = self.stages.get(name)
+            if not stage or not stage.checkpoint or not isinstance(entry, dict) or 'output' not in entry:
+                continue
+            if stage.is_valid and not stage.is_valid(entry['output']):
+                continue
+            results[name] = entry['output']
+            skipped.append(name)
+
+        if skipped:
+            print(f"⏭️ Resuming pipeline, completed stages: {', '.join(skipped)}")
+
+        remaining = self._needed_stages(results)
+
+        running = {}
+        error = None
+
+        with ThreadPoolExecutor(max_workers=self.max_parallel, thread_name_prefix='stage',
+                                initializer=thread_init) as pool:
+            while remaining or running:
+                if error is None:
+                    for name in sorted(remaining):
+                        stage = self.stages[name]
+                        if len(running) >= self.max_parallel:
+                            break
+                        if all(dep in results for dep in stage.depends_on):
+                            inputs = {dep: results[dep] for dep in stage.depends_on}
+                            future = pool.submit(stage.func, inputs)
+                            running[future] = (name, time.time())
+                            remaining.discard(name)
+
+                if not running:
+                    if error is None and remaining:
+                        raise RuntimeError(f"Pipeline is stuck, unresolved stages: {sorted(remaining)}")
+                    break
+
+                done, _ = wait(list(running), timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    name, started_at = running.pop(future)
+                    try:
+                        output = future.result()
+                    except BaseException as e:
+                        if error is None:
+                            error = e
+                        continue
+
+                    results[name] = output
+                    if self.stages[name].checkpoint:
+                        on_complete(name, stage_checkpoint(output, started_at))
+
+                if poll:
+                    try:
+                        poll()
+                    except BaseException as e:
+                        # Например, отмена: соседние этапы увидят ее сами и завершатся
+                        if error is None:
+                            error = e
+
+        if error is not None:
+            raise error
+
+        return results
+
+    def _needed_stages(self, results: Dict[str, Any]) -> set:
+        """Этапы, которые нужно выполнить: без результата и нужные хотя бы одному
+        невыполненному потребителю (или конечные). Промежуточный этап, все потребители
+        которого уже завершены, не перезапускается, даже если его файл пропал.
+        """
+        dependents = {name: [] for name in self.stages}
+        for stage in self.stages.values():
+            for dep in stage.depends_on:
+                dependents[dep].append(stage.name)
+
+        needed = set()
+        for name in reversed(self._topological_order()):
+            if name in results:
+                continue
+            if not dependents[name] or any(dependent in needed for dependent in dependents[name]):
+                needed.add(name)
+        return needed
+
+    def _topological_order(self) -> List[str]:
+        order = []
+        visited = set()
+
+        def visit(name, path=()):
+            if name in path:
+                raise ValueError(f"Pipeline has a dependency cycle: {' -> '.join(path + (name,))}")
+            if name in visited:
+                return
+            for dep in self.stages[name].depends_on:
+                visit(dep, path + (name,))
+            visited.add(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+
+class StageContext:
+    """Контекст задачи, разделяемый потоком задачи и потоками этапов"""
+
+    def __init__(self, model, object_id: str):
+        self.model = model
+        self.object_id = object_id
+        self.owner = threading.get_ident()
+        self.cancelled = threading.Event()
+        self.last_cancel_check = 0.0
+        # time.monotonic(), после которого задача останавливается (None - без срока)
+        self.deadline: Optional[float] = None
+        self.progress: Optional[int] = None
+        # Доля выполнения этапов (0..1), пишут потоки этапов
+        self.stage_progress: Dict[str, float] = {}
+        # Span'ы этапов текущей попытки
+        self.trace = JobTrace()
+
+    @property
+    def in_owner_thread(self) -> bool:
+        return threading.get_ident() == self.owner
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Worker Supervisor для AgentFlow Video Editor
+Запускает N процессов worker'а под размер машины и перезапускает упавшие.
+
+Каждый процесс выполняет одну задачу за раз, а ffmpeg внутри задачи получает
+бюджет потоков (FFMPEG_THREADS), поэтому параллельные задачи делят CPU, а не
+переподписывают его: WORKER_PROCESSES * FFMPEG_THREADS ~= доступные ядра.
+
+С WORKER_METRICS_PORT процессы пишут метрики Prometheus в общий каталог
+PROMETHEUS_MULTIPROC_DIR, а supervisor отдает их сводку на этом порту.
+"""
+
+import os
+import sys
+import glob
+import time
+import signal
+import subprocess
+from typing import Dict, Optional, Tuple
+
+# Добавляем путь к проекту (логи и сводка метрик, см. _start_metrics)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.config.logging_config import configure_logging, get_logger
+
+logger = get_logger('supervisor')
+
+# Минимальный интервал между перезапусками одного слота (защита от crash loop)
+RESTART_BACKOFF_SECONDS = 1.0
+MAX_RESTART_BACKOFF_SECONDS = 60.0
+
+# Процесс, проживший дольше, считается здоровым: backoff сбрасывается
+HEALTHY_UPTIME_SECONDS = 30.0
+
+SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv('WORKER_SHUTDOWN_TIMEOUT', '60'))
+
+# Порт сводки метрик worker'ов (0 - не отдавать)
+WORKER_METRICS_PORT = int(os.getenv('WORKER_METRICS_PORT', '0'))
+
+WORKER_SCRIPTS = {
+    'rq': 'worker.py',
+    'database': 'db_worker.py'
+}
+
+
+def available_cpus() -> int:
+    """Число CPU, доступных процессу: affinity и квота cgroup (контейнеры)"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    quota = _cgroup_cpu_quota()
+    if quota:
+        cpus = min(cpus, max(1, int(quota)))
+
+    return max(1, cpus)
+
+
+def _cgroup_cpu_quota() -> Optional[float]:
+    """Квота CPU из cgroup v2 (cpu.max) или v1 (cfs_quota_us / cfs_period_us)"""
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()[:2]
+        if quota != 'max':
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+
+    try:
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+            quota = int(f.read())
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+            period = int(f.read())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+
+    return None
+
+
+def plan_capacity(cpus: int = None) -> Tuple[int, int]:
+    """Возвращает (число процессов, потоков ffmpeg на задачу)
+
+    По умолчанию по 2 потока на задачу: x264 хорошо масштабируется до нескольких
+    потоков, а больше параллельных задач дает более ровную пропускную способность.
+    """
+    cpus = cpus or available_cpus()
+
+    threads = int(os.getenv('FFMPEG_THREADS', '0'))
+    processes = int(os.getenv('WORKER_PROCESSES', '0'))
+
+    if processes <= 0:
+        processes = max(1, cpus // (threads or 2))
+    if threads <= 0:
+        threads = max(1, cpus // processes)
+
+    return processes, threads
+
+
+class Supervisor:
+    def __init__(self, backend: str, processes: int, ffmpeg_threads: int):
+        if backend not in WORKER_SCRIPTS:
+            raise ValueError(f"Unknown worker backend: {backend}")
+
+        self.backend = backend
+        self.processes = processes
+        self.ffmpeg_threads = ffmpeg_threads
+        self.script = os.path.join(os.path.dirname(os.path.abspath(__file__)), WORKER_SCRIPTS[backend])
+
+        # slot -> процесс, время запуска, текущий backoff и время следующего запуска
+        self._slots: Dict[int, Dict] = {
+            slot: {'process': None, 'started_at': 0.0, 'backoff': RESTART_BACKOFF_SECONDS, 'next_start': 0.0}
+            for slot in range(processes)
+        }
+        self._stopping = False
+
+    def run(self):
+        """Основной цикл: держит все слоты занятыми, пока не придет сигнал остановки"""
+        signal.signal(signal.SIGTERM, self._handle_signal)
+        signal.signal(signal.SIGINT, self._handle_signal)
+
+        logger.info("🚀 Starting AgentFlow Video Editor Worker Supervisor")
+        logger.info("👷 %s x %s (%s), ffmpeg threads per job: %s",
+                    self.processes, WORKER_SCRIPTS[self.backend], self.backend, self.ffmpeg_threads)
+
+        if WORKER_METRICS_PORT:
+            self._start_metrics()
+
+        while not self._stopping:
+            now = time.time()
+            for slot, state in self._slots.items():
+                process = state['process']
+
+                if process is not None and process.poll() is None:
+                    continue
+
+                if process is not None:
+                    self._on_exit(slot, state, now)
+
+                if now >= state['next_start']:
+                    state['process'] = self._spawn(slot)
+                    state['started_at'] = now
+
+            time.sleep(0.5)
+
+        self._shutdown()
+
+    def _start_metrics(self):
+        """Общий каталог метрик процессов (до запуска worker'ов) и HTTP сервер сводки"""
+        metrics_dir = os.environ.setdefault(
+            'PROMETHEUS_MULTIPROC_DIR',
+            os.path.join(os.getenv('TEMP_DIR', '/tmp/video-editor'), 'prometheus')
+        )
+        # Файлы прошлого запуска дали бы ложные счетчики
+        os.makedirs(metrics_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(metrics_dir, '*.db')):
+            os.remove(path)
+
+        from src.services.metrics import start_worker_metrics_server
+
+        if start_worker_metrics_server(WORKER_METRICS_PORT):
+            logger.info("📈 Worker metrics on port %s", WORKER_METRICS_PORT)
+        else:
+            logger.warning("⚠️ prometheus_client is not installed, worker metrics are disabled")
+
+    def _spawn(self, slot: int) -> subprocess.Popen:
+        env = dict(os.environ)
+        env['FFMPEG_THREADS'] = str(self.ffmpeg_threads)
+        env['WORKER_SLOT'] = str(slot)
+
+        process = subprocess.Popen([sys.executable, self.script], env=env)
+        logger.info("▶️ Worker slot %s started (pid %s)", slot, process.pid)
+        return process
+
+    def _on_exit(self, slot: int, state: Dict, now: float):
+        """Планирует перезапуск упавшего процесса с экспоненциальным backoff"""
+        process = state['process']
+        uptime = now - state['started_at']
+
+        if uptime >= HEALTHY_UPTIME_SECONDS:
+            state['backoff'] = RESTART_BACKOFF_SECONDS
+        else:
+            state['backoff'] = min(state['backoff'] * 2, MAX_RESTART_BACKOFF_SECONDS)
+
+        state['next_start'] = now + state['backoff']
+        state['process'] = None
+        if WORKER_METRICS_PORT:
+            from src.services.metrics import mark_worker_process_dead
+            mark_worker_process_dead(process.pid)
+        logger.warning("⚠️ Worker slot %s (pid %s) exited with code %s, restarting in %.0fs",
+                       slot, process.pid, process.returncode, state['backoff'])
+
+    def _handle_signal(self, signum, frame):
+        self._stopping = True
+
+    def _shutdown(self):
+        """Пересылает SIGTERM worker'ам и ждет, пока они доделают текущие задачи"""
+        logger.info("🛑 Shutdown requested, stopping workers...")
+        running = [state['process'] for state in self._slots.values()
+                   if state['process'] is not None and state['process'].poll() is None]
+
+        for process in running:
+            process.send_signal(signal.SIGTERM)
+
+        deadline = time.time() + SHUTDOWN_TIMEOUT_SECONDS
+        for process in running:
+            try:
+                process.wait(timeout=max(0.0, deadline - time.time()))
+            except subprocess.TimeoutExpired:
+                logger.warning("⏰ Worker pid %s did not stop in time, killing", process.pid)
+                process.kill()
+                process.wait()
+
+
+def start_supervisor():
+    """Запускает supervisor с backend'ом очереди из окружения"""
+    configure_logging()
+    backend = os.getenv('WORKER_BACKEND') or ('database' if os.getenv('QUEUE_FALLBACK') == 'database' else 'rq')
+    processes, threads = plan_capacity()
+    Supervisor(backend, processes, threads).run()
+
+
+if __name__ == '__main__':
+    start_supervisor()
@@ -0,0 +1,135 @@
+"""
+Job Tracing для AgentFlow Video Editor
+Span'ы этапов задачи: wall time, CPU и объем данных по каждому этапу.
+
+Каждый запуск этапа - span. Поток этапа держит его как текущий (current_span),
+поэтому код глубже по стеку добавляет к нему свои замеры, не зная об этапе:
+- _run_ffmpeg / ffprobe - rusage своего дочернего процесса (user/system CPU,
+  пиковая память), снятый при его завершении (os.wait4 по pid, а не общий
+  RUSAGE_CHILDREN процесса, который смешал бы параллельные этапы);
+- загрузка из storage и выгрузка - скачанные и выгруженные байты.
+CPU самого потока этапа (анализ аудио, MD5) - time.thread_time.
+
+Трасса попытки сохраняется в колонку trace модели (VideoProject для ingest,
+VideoRender для рендера); хранятся последние TRACE_MAX_ATTEMPTS попыток.
+Этапы, пропущенные по checkpoint'у, в попытке отсутствуют.
+"""
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+TRACE_MAX_ATTEMPTS = int(os.getenv('TRACE_MAX_ATTEMPTS', '5'))
+
+_current = threading.local()
+
+
+class Span:
+    def __init__(self, name: str):
+        self.name = name
+        self.started_at = datetime.utcnow()
+        self.status = 'running'
+        self.wall_seconds = 0.0
+        self.thread_cpu_seconds = 0.0
+        self.child_user_seconds = 0.0
+        self.child_system_seconds = 0.0
+        self.child_max_rss_kb = 0
+        self.subprocesses = 0
+        self.counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add(self, counter: str, amount: Optional[int]):
+        """Счетчик span'а (байты и т.п.); amount None или 0 не меняет его"""
+        if not amount:
+            return
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + int(amount)
+
+    def add_rusage(self, rusage):
+        """Ресурсы завершившегося дочернего процесса (os.wait4)"""
+        with self._lock:
+            self.subprocesses += 1
+            self.child_user_seconds += rusage.ru_utime
+            self.child_system_seconds += rusage.ru_stime
+            # ru_maxrss в Linux - килобайты
+            self.child_max_rss_kb = max(self.child_max_rss_kb, rusage.ru_maxrss)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'status': self.status,
+            'started_at': self.started_at.isoformat(),
+            'wall_seconds': round(self.wall_seconds, 3),
+            'thread_cpu_seconds': round(self.thread_cpu_seconds, 3),
+            'child_user_seconds': round(self.child_user_seconds, 3),
+            'child_system_seconds': round(self.child_system_seconds, 3),
+            'child_max_rss_kb': self.child_max_rss_kb,
+            'subprocesses': self.subprocesses,
+            **self.counters
+        }
+
+
+class JobTrace:
+    """Span'ы одной попытки задачи (пишут потоки этапов)"""
+
+    def __init__(self):
+        self.started_at = datetime.utcnow()
+        self._started = time.perf_counter()
+        self._spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str):
+        """Span этапа: текущий для потока, пока этап выполняется"""
+        span = Span(name)
+        with self._lock:
+            self._spans.append(span)
+
+        previous = getattr(_current, 'span', None)
+        _current.span = span
+        started = time.perf_counter()
+        thread_started = time.thread_time()
+        try:
+            yield span
+            span.status = 'ok'
+        except BaseException:
+            # Вызывающий код мог уточнить статус (например, cancelled)
+            if span.status == 'running':
+                span.status = 'error'
+            raise
+        finally:
+            span.wall_seconds = time.perf_counter() - started
+            span.thread_cpu_seconds = time.thread_time() - thread_started
+            _current.span = previous
+
+    def finish(self, status: str) -> Dict[str, Any]:
+        """Итог попытки для сохранения в БД"""
+        with self._lock:
+            spans = [span.to_dict() for span in sorted(self._spans, key=lambda span: span.started_at)]
+
+        return {
+            'status': status,
+            'started_at': self.started_at.isoformat(),
+            'finished_at': datetime.utcnow().isoformat(),
+            'wall_seconds': round(time.perf_counter() - self._started, 3),
+            'cpu_seconds': round(sum(
+                span['thread_cpu_seconds'] + span['child_user_seconds'] + span['child_system_seconds']
+                for span in spans
+            ), 3),
+            'spans': spans
+        }
+
+
+def current_span() -> Optional[Span]:
+    """Span этапа, который выполняет текущий поток (None вне этапа)"""
+    return getattr(_current, 'span', None)
+
+
+def append_attempt(trace: Optional[Dict[str, Any]], attempt: Dict[str, Any]) -> Dict[str, Any]:
+    """Новое значение колонки trace: прежние попытки плюс attempt (новый dict для JSON колонки)"""
+    attempts = list((trace or {}).get('attempts') or [])
+    attempts.append(attempt)
+    return {'attempts': attempts[-TRACE_MAX_ATTEMPTS:]}
@@ -7,28 +7,122 @@ Video Processing Worker для AgentFlow Video Editor
 import os
 import sys
 import tempfile
+import time
 import subprocess
 import json
+import math
+import glob
+import shutil
+import signal
+import threading
+from contextlib import contextmanager, ExitStack
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple, Callable, Iterator
 
 # Добавляем путь к проекту
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
+import numpy as np
+
 from src.models.video_project import db, VideoProject, VideoRender
-from src.services.storage_service import storage_service
+from src.services import storage_service as storage_module
+from src.services.cache import invalidate_on_commit
+from src.services.events import publish_event
+from src.services.metrics import observe_stage, count_storage_bytes
+from src.workers.audio_analysis import detect_silences, windowed_peaks
+from src.workers.audio_artifact import audio_store, AUDIO_SAMPLE_RATE
+from src.workers.media_cache import media_cache
+from src.workers.downloader import downloader
+from src.workers.pipeline import Stage, StagePipeline, StageContext, file_output_exists
+from src.workers.tracing import Span, current_span, append_attempt
 import base64
 
+# Нормализация громкости (EBU R128)
+DEFAULT_LOUDNESS_TARGET = -14.0
+LOUDNESS_TRUE_PEAK = -1.5
+LOUDNESS_RANGE = 11.0
+
+# Вес этапов в общем прогрессе (%); proxy и encode сообщают и прогресс внутри этапа
+INGEST_STAGE_WEIGHTS = {
+    'download': 10,
+    'probe': 5,
+    'proxy': 40,
+    'upload_proxy': 10,
+    'thumbnail': 5,
+    'upload_thumbnail': 5,
+    'audio': 20,
+    'waveform': 5
+}
+RENDER_STAGE_WEIGHTS = {
+    'download': 10,
+    'subtitles': 0,
+    'encode': 80,
+    'upload': 10
+}
+
+# Имя pipeline задачи по модели (метки метрик этапов)
+PIPELINE_NAMES = {VideoProject: 'ingest', VideoRender: 'render'}
+
+# Поля проекта, которые заполняют результаты этапов ingest
+INGEST_OUTPUT_FIELDS = {
+    'probe': ('duration', 'resolution'),
+    'upload_proxy': ('proxy_url',),
+    'upload_thumbnail': ('thumbnail_url',),
+    'audio': ('loudness_stats',)
+}
+
+# Шаг (проценты), которым прогресс рендера сохраняется в БД
+PROGRESS_DB_STEP = 10
+
+# Сколько хранить временные файлы упавшей задачи в ожидании повтора
+SCRATCH_RETENTION_SECONDS = int(float(os.getenv('SCRATCH_RETENTION_HOURS', '24')) * 3600)
+
+# Статусы, которыми API просит остановить задачу (cancelling) или фиксирует отмену
+CANCELLATION_STATUSES = ('cancelling', 'cancelled')
+
+# Как часто задача проверяет запрос отмены и сколько ждать ffmpeg после SIGTERM
+CANCEL_POLL_INTERVAL = 1.0
+FFMPEG_KILL_TIMEOUT = 5.0
+
+# Префикс URL локальных файлов (fallback без Supabase Storage, см. routes/video.py)
+LOCAL_FILES_PREFIX = '/api/video/files/'
+
+class JobCancelled(Exception):
+    """Задачу отменили через API"""
+
+
+class JobTimeout(Exception):
+    """Задача не уложилась в свой timeout (см. VideoProcessor.time_limit)"""
+
+
 class VideoProcessor:
     def __init__(self):
         self.ffmpeg_path = os.getenv('FFMPEG_PATH', 'ffmpeg')
         self.temp_dir = os.getenv('TEMP_DIR', '/tmp/video-editor')
+        self.upload_folder = os.getenv('UPLOAD_FOLDER', '/tmp/video_uploads')
+        
+        # Параметры поиска тишины для авто-нарезки
+        self.silence_threshold_db = float(os.getenv('SILENCE_THRESHOLD_DB', '-40'))
+        self.silence_min_duration = float(os.getenv('SILENCE_MIN_DURATION', '0.5'))
+        
+        # Бюджет потоков ffmpeg на задачу (задает supervisor), 0 - по умолчанию ffmpeg (все ядра)
+        self.ffmpeg_threads = int(os.getenv('FFMPEG_THREADS', '0'))
+        
+        # Текущая задача потока (локальный пул выполняет несколько задач параллельно)
+        self._job = threading.local()
         
         # Создаем временную директорию
         os.makedirs(self.temp_dir, exist_ok=True)
     
     def process_uploaded_video(self, project_id: str) -> Dict[str, Any]:
-        """Обрабатывает загруженное видео: создает proxy, thumbnail, waveform"""
+        """Обрабатывает загруженное видео: создает proxy, thumbnail, waveform.
+        
+        Этапы выполняются как DAG (workers/pipeline.py): после загрузки proxy,
+        thumbnail и аудио идут параллельно, а повтор задачи продолжает работу
+        с первого незавершенного этапа.
+        """
+        context = self._begin_job(VideoProject, project_id)
+        sources = ExitStack()
         try:
             print(f"🎬 Processing video for project {project_id}")
             
@@ -37,43 +131,124 @@ class VideoProcessor:
             if not project:
                 raise Exception(f"Project {project_id} not found")
             
+            # Каждая попытка (и повтор после ошибки) снова отмечает проект обрабатываемым,
+            # если его не отменили, пока задача ждала в очереди
+            claimed = VideoProject.query.filter(
+                VideoProject.id == project_id,
+                VideoProject.status.notin_(CANCELLATION_STATUSES)
+            ).update({'status': 'processing'}, synchronize_session='fetch')
+            invalidate_on_commit(db.session, 'project', [project_id])
+            db.session.commit()
+            
+            if not claimed:
+                raise JobCancelled()
+            
             if not project.original_url:
                 raise Exception("No original video URL")
             
-            # Скачиваем оригинальное видео
-            original_path = self._download_video(project.original_url, project_id)
+            self._purge_stale_scratch()
             
-            # Получаем метаданные видео
-            metadata = self._get_video_metadata(original_path)
+            # Этапы работают в потоках пула и получают только простые значения:
+            # ORM объекты и сессия БД принадлежат потоку задачи
+            user_id = project.user_id
+            original_url = project.original_url
+            file_size = project.file_size
+            measure_loudness = not project.loudness_stats
             
-            # Обновляем проект с метаданными
-            project.duration = metadata.get('duration')
-            project.resolution = metadata.get('resolution')
+            def report(stage):
+                self._publish_ingest_progress(context, user_id, project_id, stage)
             
-            # Создаем proxy видео (720p)
-            proxy_path = self._create_proxy_video(original_path, project_id)
-            proxy_result = storage_service.upload_proxy_video(
-                open(proxy_path, 'rb').read(),
-                project_id,
-                project.user_id
-            )
+            def download(inputs):
+                return {'path': sources.enter_context(self._source_media(original_url, file_size))}
             
-            if proxy_result['success']:
-                project.proxy_url = proxy_result['public_url']
+            def probe(inputs):
+                metadata = self._get_video_metadata(inputs['download']['path'])
+                return {'duration': metadata.get('duration'), 'resolution': metadata.get('resolution')}
             
-            # Создаем thumbnail
-            thumbnail_path = self._create_thumbnail(original_path, project_id)
-            thumbnail_result = storage_service.upload_thumbnail(
-                open(thumbnail_path, 'rb').read(),
-                project_id,
-                project.user_id
-            )
+            def proxy(inputs):
+                path = self._create_proxy_video(
+                    inputs['download']['path'],
+                    project_id,
+                    duration=inputs['probe']['duration'],
+                    on_progress=lambda fraction: self._stage_progress(context, 'proxy', fraction, report)
+                )
+                return {'path': path}
+            
+            def upload_proxy(inputs):
+                proxy_path = inputs['proxy']['path']
+                proxy_url = self._upload(
+                    'upload_proxy_video',
+                    proxy_path,
+                    f"{project_id}_720p.mp4",
+                    project_id,
+                    user_id
+                )
+                
+                return {'proxy_url': proxy_url}
+            
+            def thumbnail(inputs):
+                return {'path': self._create_thumbnail(inputs['download']['path'], project_id)}
+            
+            def upload_thumbnail(inputs):
+                thumbnail_url = self._upload(
+                    'upload_thumbnail',
+                    inputs['thumbnail']['path'],
+                    f"{project_id}_thumb.jpg",
+                    project_id,
+                    user_id
+                )
+                return {'thumbnail_url': thumbnail_url}
+            
+            def audio(inputs):
+                # Декодируем аудио один раз в общий артефакт; анализ читает его через memmap.
+                # Статистику громкости меряем в том же проходе ffmpeg
+                audio_data, loudness_stats = self._extract_audio(
+                    inputs['download']['path'],
+                    project_id,
+                    measure_loudness=measure_loudness
+                )
+                return {'has_audio': audio_data is not None, 'loudness_stats': loudness_stats}
+            
+            def waveform(inputs):
+                audio_data = audio_store.open(project_id) if inputs['audio']['has_audio'] else None
+                
+                # Ищем тишину для предложений по нарезке
+                silences = None
+                if audio_data is not None:
+                    silences = detect_silences(
+                        audio_data,
+                        AUDIO_SAMPLE_RATE,
+                        threshold_db=self.silence_threshold_db,
+                        min_duration=self.silence_min_duration
+                    )
+                
+                return {'waveform': self._generate_waveform(audio_data), 'silences': silences}
             
-            if thumbnail_result['success']:
-                project.thumbnail_url = thumbnail_result['public_url']
+            pipeline = StagePipeline([
+                self._stage(context, 'download', download, report, checkpoint=False),
+                self._stage(context, 'probe', probe, report, depends_on=['download']),
+                self._stage(context, 'proxy', proxy, report, depends_on=['download', 'probe'],
+                            is_valid=file_output_exists),
+                self._stage(context, 'upload_proxy', upload_proxy, report, depends_on=['proxy']),
+                self._stage(context, 'thumbnail', thumbnail, report, depends_on=['download'],
+                            is_valid=file_output_exists),
+                self._stage(context, 'upload_thumbnail', upload_thumbnail, report, depends_on=['thumbnail']),
+                self._stage(context, 'audio', audio, report, depends_on=['download'],
+                            is_valid=lambda output: not output.get('has_audio') or audio_store.exists(project_id)),
+                # Waveform не сохраняем: он дешевый и слишком большой для pipeline_state
+                self._stage(context, 'waveform', waveform, report, depends_on=['audio'], checkpoint=False)
+            ])
             
-            # Генерируем waveform данные
-            waveform_data = self._generate_waveform(original_path)
+            results = self._run_pipeline(
+                pipeline,
+                context,
+                project,
+                on_checkpoint=lambda name, output: self._apply_outputs(project, INGEST_OUTPUT_FIELDS.get(name, ()), output)
+            )
+            
+            project.waveform = results['waveform']['waveform']
+            if results['waveform']['silences'] is not None:
+                project.silences = results['waveform']['silences']
             
             # TODO: Добавить AI транскрипцию
             # transcript = self._generate_transcript(original_path)
@@ -81,10 +256,21 @@ class VideoProcessor:
             
             # Обновляем статус
             project.status = 'ready'
+            self._save_trace(project, context, project.status)
             db.session.commit()
             
+            publish_event(
+                'ingest_completed',
+                project.user_id,
+                project_id,
+                status=project.status,
+                progress=100,
+                proxy_url=project.proxy_url,
+                thumbnail_url=project.thumbnail_url
+            )
+            
             # Очищаем временные файлы
-            self._cleanup_temp_files([original_path, proxy_path, thumbnail_path])
+            self._cleanup_task_files(project_id)
             
             print(f"✅ Video processing completed for project {project_id}")
             
@@ -94,27 +280,59 @@ class VideoProcessor:
                 'proxy_url': project.proxy_url,
                 'thumbnail_url': project.thumbnail_url,
                 'duration': project.duration,
-                'resolution': project.resolution,
-                'waveform': waveform_data
+                'resolution': project.resolution
+            }
+            
+        except JobCancelled:
+            print(f"🚫 Video processing cancelled for project {project_id}")
+            
+            db.session.rollback()
+            self._cleanup_task_files(project_id)
+            project = VideoProject.query.get(project_id)
+            if project:
+                project.status = 'cancelled'
+                self._save_trace(project, context, project.status)
+                db.session.commit()
+                publish_event('ingest_cancelled', project.user_id, project_id, status=project.status)
+            
+            return {
+                'success': False,
+                'cancelled': True,
+                'error': 'Cancelled',
+                'project_id': project_id
             }
             
         except Exception as e:
             print(f"❌ Video processing failed for project {project_id}: {e}")
             
-            # Обновляем статус на ошибку
+            # Обновляем статус на ошибку. Временные файлы завершенных этапов
+            # остаются для повтора (см. _purge_stale_scratch)
+            db.session.rollback()
             project = VideoProject.query.get(project_id)
             if project:
                 project.status = 'error'
+                self._save_trace(project, context, project.status)
                 db.session.commit()
+                publish_event('ingest_failed', project.user_id, project_id, status=project.status, error=str(e))
             
             return {
                 'success': False,
                 'error': str(e),
                 'project_id': project_id
             }
+        
+        finally:
+            sources.close()
+            self._end_job()
     
     def render_video(self, render_id: str) -> Dict[str, Any]:
-        """Рендерит финальное видео с субтитрами"""
+        """Рендерит финальное видео с субтитрами.
+        
+        Этапы (загрузка, субтитры, кодирование, выгрузка) выполняются как DAG с
+        checkpoint'ами: повтор после ошибки выгрузки не кодирует видео заново.
+        """
+        context = self._begin_job(VideoRender, render_id)
+        sources = ExitStack()
         try:
             print(f"🎬 Starting render {render_id}")
             
@@ -127,60 +345,120 @@ class VideoProcessor:
             if not project:
                 raise Exception("Project not found")
             
-            # Обновляем статус
-            render.status = 'processing'
-            render.started_at = datetime.utcnow()
+            # Обновляем статус, если рендер не отменили, пока он ждал в очереди
+            claimed = VideoRender.query.filter(
+                VideoRender.id == render_id,
+                VideoRender.status.notin_(CANCELLATION_STATUSES)
+            ).update({
+                'status': 'processing',
+                'started_at': datetime.utcnow(),
+                'progress': 0
+            }, synchronize_session='fetch')
+            invalidate_on_commit(db.session, 'render', [render_id])
             db.session.commit()
             
-            # Скачиваем оригинальное видео
-            original_path = self._download_video(project.original_url, render_id)
+            if not claimed:
+                raise JobCancelled()
+            
+            self._purge_stale_scratch()
+            
+            # Настройки для этапов (простые значения, см. process_uploaded_video)
+            user_id = render.user_id
+            project_id = render.project_id
+            original_url = project.original_url
+            file_size = project.file_size
+            transcript = project.transcript
+            subtitle_styles = project.subtitle_styles
+            include_subtitles = bool(render.include_subtitles and transcript)
+            resolution = render.resolution
+            quality = render.quality
+            render_format = render.format
+            loudness_target = render.loudness_target
+            loudness_stats = project.loudness_stats
+            duration = project.duration
+            
+            def report(stage):
+                self._publish_render_progress(context, user_id, project_id, render_id)
+            
+            report('start')
             
-            # Создаем ASS субтитры если нужно
-            subtitle_path = None
-            if render.include_subtitles and project.transcript:
-                subtitle_path = self._create_ass_subtitles(
-                    project.transcript,
-                    project.subtitle_styles,
-                    render_id
+            def download(inputs):
+                # Оригинал из локального кэша (повторные рендеры проекта не скачивают его заново)
+                return {'path': sources.enter_context(self._source_media(original_url, file_size))}
+            
+            def subtitles(inputs):
+                # Создаем ASS субтитры если нужно
+                if not include_subtitles:
+                    return {'path': None}
+                return {'path': self._create_ass_subtitles(transcript, subtitle_styles, render_id)}
+            
+            def encode(inputs):
+                path = self._render_final_video(
+                    inputs['download']['path'],
+                    inputs['subtitles']['path'],
+                    resolution,
+                    quality,
+                    render_id,
+                    loudness_target=loudness_target,
+                    loudness_stats=loudness_stats,
+                    duration=duration,
+                    on_progress=lambda fraction: self._stage_progress(context, 'encode', fraction, report)
                 )
+                return {'path': path}
             
-            # Рендерим финальное видео
-            output_path = self._render_final_video(
-                original_path,
-                subtitle_path,
-                render.resolution,
-                render.quality,
-                render_id
-            )
+            def upload(inputs):
+                # Загружаем результат в storage
+                output_path = inputs['encode']['path']
+                output_url = self._upload(
+                    'upload_render',
+                    output_path,
+                    f"render_{render_id}.{render_format}",
+                    render_id,
+                    user_id,
+                    render_format
+                )
+                return {'output_url': output_url, 'output_size': os.path.getsize(output_path)}
             
-            # Загружаем результат в storage
-            with open(output_path, 'rb') as f:
-                output_data = f.read()
+            pipeline = StagePipeline([
+                self._stage(context, 'download', download, report, checkpoint=False),
+                self._stage(context, 'subtitles', subtitles, report,
+                            is_valid=lambda output: not output.get('path') or os.path.exists(output['path'])),
+                self._stage(context, 'encode', encode, report, depends_on=['download', 'subtitles'],
+                            is_valid=file_output_exists),
+                self._stage(context, 'upload', upload, report, depends_on=['encode'])
+            ])
             
-            upload_result = storage_service.upload_render(
-                output_data,
-                render_id,
-                render.user_id,
-                render.format
-            )
+            def persist_progress():
+                # Прогресс в БД пишется крупными шагами для polling клиентов
+                if context.progress is not None and context.progress - (render.progress or 0) >= PROGRESS_DB_STEP:
+                    render.progress = context.progress
+                    db.session.commit()
             
-            if not upload_result['success']:
-                raise Exception(f"Upload failed: {upload_result['error']}")
+            results = self._run_pipeline(pipeline, context, render, on_poll=persist_progress)
             
             # Обновляем результат
             render.status = 'completed'
+            self._save_trace(render, context, render.status)
             render.completed_at = datetime.utcnow()
-            render.output_url = upload_result['public_url']
-            render.output_size = len(output_data)
+            render.output_url = results['upload']['output_url']
+            render.output_size = results['upload']['output_size']
             render.progress = 100
             
             db.session.commit()
             
+            publish_event(
+                'render_completed',
+                render.user_id,
+                render.project_id,
+                render_id=render_id,
+                status=render.status,
+                progress=100,
+                output_url=render.output_url,
+                output_size=render.output_size
+            )
+            
             # Очищаем временные файлы
-            temp_files = [original_path, output_path]
-            if subtitle_path:
-                temp_files.append(subtitle_path)
-            self._cleanup_temp_files(temp_files)
+            self._cleanup_task_files(render_id)
             
             print(f"✅ Render completed: {render_id}")
             
@@ -191,35 +469,85 @@ class VideoProcessor:
                 'output_size': render.output_size
             }
             
+        except JobCancelled:
+            print(f"🚫 Render cancelled: {render_id}")
+            
+            db.session.rollback()
+            self._cleanup_task_files(render_id)
+            render = VideoRender.query.get(render_id)
+            if render:
+                render.status = 'cancelled'
+                self._save_trace(render, context, render.status)
+                render.completed_at = datetime.utcnow()
+                db.session.commit()
+                publish_event(
+                    'render_cancelled',
+                    render.user_id,
+                    render.project_id,
+                    render_id=render_id,
+                    status=render.status
+                )
+            
+            return {
+                'success': False,
+                'cancelled': True,
+                'error': 'Cancelled',
+                'render_id': render_id
+            }
+            
         except Exception as e:
             print(f"❌ Render failed {render_id}: {e}")
             
-            # Обновляем статус на ошибку
+            # Обновляем статус на ошибку (файлы завершенных этапов остаются для повтора)
+            db.session.rollback()
             render = VideoRender.query.get(render_id)
             if render:
                 render.status = 'failed'
+                self._save_trace(render, context, render.status)
                 render.error_message = str(e)
                 db.session.commit()
+                publish_event(
+                    'render_failed',
+                    render.user_id,
+                    render.project_id,
+                    render_id=render_id,
+                    status=render.status,
+                    error=str(e)
+                )
             
             return {
                 'success': False,
                 'error': str(e),
                 'render_id': render_id
             }
-    
-    def _download_video(self, url: str, task_id: str) -> str:
-        """Скачивает видео из URL во временный файл"""
-        import requests
         
-        temp_path = os.path.join(self.temp_dir, f"{task_id}_original.mp4")
-        
-        response = requests.get(url, stream=True)
-        response.raise_for_status()
+        finally:
+            sources.close()
+            self._end_job()
+    
+    @contextmanager
+    def _source_media(self, url: str, size_hint: Optional[int] = None) -> Iterator[str]:
+        """Локальный путь к исходнику на время задачи.
         
-        with open(temp_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
+        Файл из папки загрузок API читается на месте, объекты storage берутся из
+        media_cache (загружаются при промахе и защищены от вытеснения до выхода).
+        """
+        if url.startswith(LOCAL_FILES_PREFIX):
+            local_path = os.path.join(self.upload_folder, os.path.basename(url[len(LOCAL_FILES_PREFIX):]))
+            if not os.path.exists(local_path):
+                raise Exception(f"Local source not found: {local_path}")
+            yield local_path
+            return
         
+        with media_cache.acquire(url, lambda path: self._download_video(url, path), size_hint) as path:
+            yield path
+    
+    def _download_video(self, url: str, temp_path: str) -> str:
+        """Скачивает видео из URL в файл temp_path (параллельные Range запросы, проверка MD5)"""
+        result = downloader.download(url, temp_path, check=self._raise_if_cancelled)
+        count_storage_bytes('download', result['size'])
+        self._trace_count('bytes_downloaded', result['size'])
+        print(f"📥 Downloaded {result['size']} bytes ({result['mode']}): {url}")
         return temp_path
     
     def _get_video_metadata(self, video_path: str) -> Dict[str, Any]:
@@ -233,7 +561,7 @@ class VideoProcessor:
             video_path
         ]
         
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        result = self._run_tool(cmd)
         if result.returncode != 0:
             raise Exception(f"FFprobe failed: {result.stderr}")
         
@@ -256,17 +584,20 @@ class VideoProcessor:
             'codec': video_stream['codec_name']
         }
     
-    def _create_proxy_video(self, input_path: str, task_id: str) -> str:
+    def _create_proxy_video(self, input_path: str, task_id: str, duration: Optional[float] = None,
+                            on_progress: Optional[Callable[[float], None]] = None) -> str:
         """Создает proxy видео 720p для редактирования"""
         output_path = os.path.join(self.temp_dir, f"{task_id}_proxy.mp4")
         
         cmd = [
             self.ffmpeg_path,
+            *self._input_thread_args(),
             '-i', input_path,
             '-vf', 'scale=-2:720',
             '-c:v', 'libx264',
             '-preset', 'fast',
             '-crf', '23',
+            *self._encoder_thread_args(),
             '-c:a', 'aac',
             '-b:a', '128k',
             '-movflags', '+faststart',
@@ -274,7 +605,7 @@ class VideoProcessor:
             output_path
         ]
         
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        result = self._run_ffmpeg(cmd, duration, on_progress)
         if result.returncode != 0:
             raise Exception(f"Proxy creation failed: {result.stderr}")
         
@@ -286,6 +617,7 @@ class VideoProcessor:
         
         cmd = [
             self.ffmpeg_path,
+            *self._input_thread_args(),
             '-i', input_path,
             '-ss', '00:00:01',
             '-vframes', '1',
@@ -294,58 +626,121 @@ class VideoProcessor:
             output_path
         ]
         
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        result = self._run_ffmpeg(cmd)
         if result.returncode != 0:
             raise Exception(f"Thumbnail creation failed: {result.stderr}")
         
         return output_path
     
-    def _generate_waveform(self, input_path: str) -> Dict[str, Any]:
-        """Генерирует waveform данные"""
-        # Простая реализация через FFmpeg
-        # В production можно использовать audiowaveform
+    def _extract_audio(self, input_path: str, project_id: str,
+                       measure_loudness: bool = True) -> Tuple[Optional[np.memmap], Optional[Dict[str, float]]]:
+        """Декодирует аудио в mono float32 PCM артефакт проекта и меряет громкость (EBU R128)"""
+        loudness_stats = None
         
-        cmd = [
-            self.ffmpeg_path,
-            '-i', input_path,
-            '-ac', '1',
-            '-ar', '8000',
-            '-f', 'f32le',
+        if not audio_store.exists(project_id):
+            part_path = audio_store.path_for(project_id) + '.part'
+            cmd = [
+                self.ffmpeg_path,
+                *self._input_thread_args(),
+                '-i', input_path,
+                '-map', '0:a:0',
+                '-ac', '1',
+                '-ar', str(AUDIO_SAMPLE_RATE),
+                '-f', 'f32le',
+                '-y',
+                part_path
+            ]
+            
+            # Второй выход того же декодирования: замер loudnorm без повторного прохода
+            if measure_loudness:
+                cmd.extend(self._loudnorm_measure_output())
+            
+            result = self._run_ffmpeg(cmd)
+            if result.returncode != 0 or not os.path.exists(part_path) or os.path.getsize(part_path) == 0:
+                self._cleanup_temp_files([part_path])
+                return None, None
+            
+            audio_store.publish(project_id, part_path)
+            
+            if measure_loudness:
+                loudness_stats = self._parse_loudnorm_stats(result.stderr)
+        
+        elif measure_loudness:
+            # Артефакт уже есть (повторная обработка), меряем только громкость
+            cmd = [self.ffmpeg_path, *self._input_thread_args(), '-i', input_path] + self._loudnorm_measure_output()
+            result = self._run_ffmpeg(cmd)
+            if result.returncode == 0:
+                loudness_stats = self._parse_loudnorm_stats(result.stderr)
+        
+        return audio_store.open(project_id), loudness_stats
+    
+    def _loudnorm_measure_output(self) -> list:
+        """Аргументы ffmpeg для выхода, который только меряет громкость"""
+        return [
+            '-map', '0:a:0',
+            '-af', f'loudnorm=I={DEFAULT_LOUDNESS_TARGET}:TP={LOUDNESS_TRUE_PEAK}:LRA={LOUDNESS_RANGE}:print_format=json',
+            '-f', 'null',
             '-'
         ]
+    
+    def _parse_loudnorm_stats(self, stderr: str) -> Optional[Dict[str, float]]:
+        """Достает измеренные значения loudnorm из stderr ffmpeg"""
+        start = stderr.rfind('{')
+        end = stderr.rfind('}')
+        if start == -1 or end < start:
+            return None
         
-        result = subprocess.run(cmd, capture_output=True)
-        if result.returncode != 0:
-            # Возвращаем заглушку если не удалось
-            return {
-                'version': 2,
-                'channels': 1,
-                'sample_rate': 8000,
-                'samples_per_pixel': 160,
-                'bits': 8,
-                'length': 100,
-                'data': [0.1, 0.3, 0.5, 0.7, 0.4, 0.2] * 17
+        try:
+            data = json.loads(stderr[start:end + 1])
+            stats = {
+                'input_i': float(data['input_i']),
+                'input_tp': float(data['input_tp']),
+                'input_lra': float(data['input_lra']),
+                'input_thresh': float(data['input_thresh'])
             }
+        except (ValueError, KeyError):
+            return None
         
-        # Обрабатываем аудио данные
-        import struct
-        import numpy as np
+        # Для полной тишины ffmpeg возвращает -inf: нормализовать нечего
+        if not all(math.isfinite(value) for value in stats.values()):
+            return None
         
-        audio_data = np.frombuffer(result.stdout, dtype=np.float32)
+        return stats
+    
+    def _loudnorm_filter(self, target: float, stats: Optional[Dict[str, float]]) -> str:
+        """Фильтр нормализации: линейный по кешированному замеру, иначе однопроходный"""
+        audio_filter = f'loudnorm=I={target}:TP={LOUDNESS_TRUE_PEAK}:LRA={LOUDNESS_RANGE}'
         
-        # Создаем waveform с downsampling
-        samples_per_pixel = 160
-        downsampled = []
+        if stats:
+            audio_filter += (
+                f":measured_I={stats['input_i']}"
+                f":measured_TP={stats['input_tp']}"
+                f":measured_LRA={stats['input_lra']}"
+                f":measured_thresh={stats['input_thresh']}"
+                ':linear=true'
+            )
+        
+        return audio_filter
+    
+    def _generate_waveform(self, audio_data: Optional[np.ndarray]) -> Dict[str, Any]:
+        """Генерирует waveform данные"""
+        # Простая реализация через FFmpeg
+        # В production можно использовать audiowaveform
         
-        for i in range(0, len(audio_data), samples_per_pixel):
-            chunk = audio_data[i:i+samples_per_pixel]
-            if len(chunk) > 0:
-                downsampled.append(float(np.max(np.abs(chunk))))
+        # 50 точек в секунду независимо от частоты дискретизации
+        samples_per_pixel = AUDIO_SAMPLE_RATE // 50
+        
+        # Без аудиодорожки waveform пустой
+        downsampled = []
+        if audio_data is not None:
+            # Создаем waveform с downsampling; 4 знака хватает для отрисовки и сокращают JSON в БД
+            peaks = windowed_peaks(audio_data, samples_per_pixel).astype(np.float64)
+            downsampled = np.round(peaks, 4).tolist()
         
         return {
             'version': 2,
             'channels': 1,
-            'sample_rate': 8000,
+            'sample_rate': AUDIO_SAMPLE_RATE,
             'samples_per_pixel': samples_per_pixel,
             'bits': 8,
             'length': len(downsampled),
@@ -391,13 +786,18 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
         return f"{hours:01d}:{minutes:02d}:{secs:05.2f}"
     
     def _render_final_video(self, input_path: str, subtitle_path: Optional[str], 
-                          resolution: str, quality: str, task_id: str) -> str:
+                          resolution: str, quality: str, task_id: str,
+                          loudness_target: Optional[float] = None,
+                          loudness_stats: Optional[Dict[str, float]] = None,
+                          duration: Optional[float] = None,
+                          on_progress: Optional[Callable[[float], None]] = None) -> str:
         """Рендерит финальное видео"""
         output_path = os.path.join(self.temp_dir, f"{task_id}_final.mp4")
         
         # Базовая команда FFmpeg
         cmd = [
             self.ffmpeg_path,
+            *self._input_thread_args(),
             '-i', input_path
         ]
         
@@ -419,10 +819,18 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
             width, height = resolution.split('x')
             cmd.extend(['-s', f'{width}x{height}'])
         
+        # Нормализация громкости (loudnorm выдает 192 kHz, возвращаем 48 kHz)
+        if loudness_target is not None:
+            cmd.extend([
+                '-af', self._loudnorm_filter(loudness_target, loudness_stats),
+                '-ar', '48000'
+            ])
+        
         # Финальные настройки
         cmd.extend([
             '-c:v', 'libx264',
             '-preset', 'medium',
+            *self._encoder_thread_args(),
             '-c:a', 'aac',
             '-b:a', '128k',
             '-movflags', '+faststart',
@@ -430,12 +838,358 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
             output_path
         ])
         
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        result = self._run_ffmpeg(cmd, duration, on_progress)
         if result.returncode != 0:
             raise Exception(f"Final render failed: {result.stderr}")
         
         return output_path
     
+    def _run_ffmpeg(self, cmd: list, duration: Optional[float] = None,
+                    on_progress: Optional[Callable[[float], None]] = None) -> subprocess.CompletedProcess:
+        """Запускает ffmpeg в собственной группе процессов.
+        
+        Пока ffmpeg работает, задача раз в секунду сообщает прогресс (по выводу
+        -progress) и проверяет запрос отмены; при отмене вся группа процессов
+        получает SIGTERM (затем SIGKILL), а JobCancelled уходит вызывающему коду.
+        """
+        report_progress = bool(on_progress and duration)
+        if report_progress:
+            cmd = [cmd[0], '-progress', 'pipe:1', '-nostats'] + cmd[1:]
+        
+        # stderr во временный файл: stdout читает отдельный поток, без риска взаимной блокировки пайпов
+        with tempfile.TemporaryFile(mode='w+') as stderr_file:
+            process = subprocess.Popen(
+                cmd,
+                stdout=subprocess.PIPE if report_progress else subprocess.DEVNULL,
+                stderr=stderr_file,
+                text=True,
+                start_new_session=True
+            )
+            
+            # Процесс забирает (os.wait4) отдельный поток: rusage уходит в span этапа
+            exited = self._reap_in_background(process, current_span())
+            
+            position = {'out_time_us': 0}
+            reader = None
+            if report_progress:
+                reader = threading.Thread(
+                    target=self._read_ffmpeg_progress,
+                    args=(process.stdout, position),
+                    daemon=True
+                )
+                reader.start()
+            
+            try:
+                while not exited.wait(timeout=CANCEL_POLL_INTERVAL):
+                    # Прогресс и отмена обрабатываются в потоке задачи: ему принадлежит сессия БД
+                    self._raise_if_cancelled()
+                    if report_progress:
+                        on_progress(min(position['out_time_us'] / 1e6 / duration, 1.0))
+            except BaseException:
+                self._kill_process_group(process)
+                raise
+            finally:
+                if reader:
+                    reader.join(timeout=1.0)
+            
+            if process.returncode is None:
+                process.wait()
+            
+            stderr_file.seek(0)
+            return subprocess.CompletedProcess(cmd, process.returncode, '', stderr_file.read())
+    
+    def _run_tool(self, cmd: list) -> subprocess.CompletedProcess:
+        """Короткая утилита (ffprobe) с rusage в span этапа; вывод через временные файлы"""
+        with tempfile.TemporaryFile(mode='w+') as stdout_file, tempfile.TemporaryFile(mode='w+') as stderr_file:
+            process = subprocess.Popen(cmd, stdout=stdout_file, stderr=stderr_file, text=True)
+            self._reap(process, current_span())
+            
+            stdout_file.seek(0)
+            stderr_file.seek(0)
+            return subprocess.CompletedProcess(cmd, process.returncode, stdout_file.read(), stderr_file.read())
+    
+    def _reap(self, process: subprocess.Popen, span: Optional[Span]):
+        """Ждет процесс через os.wait4: в отличие от общего RUSAGE_CHILDREN,
+        rusage относится только к нему, даже если параллельно работают другие этапы"""
+        try:
+            _, status, rusage = os.wait4(process.pid, 0)
+        except ChildProcessError:
+            # Процесс уже забрал process.wait() (остановка при отмене)
+            return
+        process.returncode = os.waitstatus_to_exitcode(status)
+        if span:
+            span.add_rusage(rusage)
+    
+    def _reap_in_background(self, process: subprocess.Popen, span: Optional[Span]) -> threading.Event:
+        """_reap в отдельном потоке; событие выставляется, когда процесс завершился"""
+        exited = threading.Event()
+        
+        def reap():
+            try:
+                self._reap(process, span)
+            finally:
+                exited.set()
+        
+        threading.Thread(target=reap, name=f'reap-{process.pid}', daemon=True).start()
+        return exited
+    
+    def _read_ffmpeg_progress(self, stream, position: Dict[str, int]):
+        """Читает key=value строки -progress и запоминает текущую позицию"""
+        for line in stream:
+            key, _, value = line.strip().partition('=')
+            if key == 'out_time_us' and value.isdigit():
+                position['out_time_us'] = int(value)
+    
+    def _kill_process_group(self, process: subprocess.Popen):
+        """Останавливает ffmpeg и все его дочерние процессы"""
+        if process.poll() is not None:
+            return
+        
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+            process.wait(timeout=FFMPEG_KILL_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+        except ProcessLookupError:
+            pass
+    
+    @contextmanager
+    def time_limit(self, seconds: Optional[int]):
+        """Срок задач, запущенных в этом потоке: по его истечении точки отмены
+        бросают JobTimeout, ffmpeg останавливается, а попытка завершается ошибкой"""
+        self._job.time_limit = seconds
+        try:
+            yield
+        finally:
+            self._job.time_limit = None
+    
+    def _begin_job(self, model, object_id: str) -> StageContext:
+        """Создает контекст задачи для текущего потока (проверки отмены, прогресс этапов)"""
+        context = StageContext(model, object_id)
+        time_limit = getattr(self._job, 'time_limit', None)
+        if time_limit:
+            context.deadline = time.monotonic() + time_limit
+        self._attach_job(context)
+        return context
+    
+    def _attach_job(self, context: StageContext):
+        """Привязывает контекст задачи к потоку (thread_init потоков этапов pipeline)"""
+        self._job.context = context
+    
+    def _end_job(self):
+        self._job.context = None
+    
+    def _raise_if_cancelled(self):
+        """Точка отмены: JobCancelled, если API попросил остановить задачу,
+        и JobTimeout, если истек срок задачи.
+        
+        БД опрашивает только поток задачи (не чаще раза в секунду) и выставляет
+        флаг контекста; потоки этапов проверяют только флаг.
+        """
+        context = getattr(self._job, 'context', None)
+        if context is None:
+            return
+        
+        if context.cancelled.is_set():
+            raise JobCancelled()
+        
+        if context.deadline is not None and time.monotonic() > context.deadline:
+            raise JobTimeout("Job exceeded its timeout")
+        
+        if not context.in_owner_thread:
+            return
+        
+        now = time.monotonic()
+        if now - context.last_cancel_check < CANCEL_POLL_INTERVAL:
+            return
+        context.last_cancel_check = now
+        
+        model = context.model
+        status = db.session.query(model.status).filter(model.id == context.object_id).scalar()
+        if status in CANCELLATION_STATUSES:
+            context.cancelled.set()
+            raise JobCancelled()
+    
+    def _stage(self, context: StageContext, name: str, func: Callable[[Dict[str, Any]], Any],
+               report: Callable[[str], None], depends_on=(), **options) -> Stage:
+        """Этап pipeline с отметками прогресса на старте и по завершении и span'ом трассы"""
+        def run(inputs):
+            self._raise_if_cancelled()
+            self._stage_progress(context, name, 0.0, report)
+            with context.trace.span(name) as span:
+                try:
+                    output = func(inputs)
+                except JobCancelled:
+                    span.status = 'cancelled'
+                    raise
+                except JobTimeout:
+                    span.status = 'timeout'
+                    raise
+                span.add('output_bytes', self._output_size(output))
+            observe_stage(PIPELINE_NAMES[context.model], name, span.wall_seconds)
+            self._stage_progress(context, name, 1.0, report)
+            return output
+        
+        return Stage(name, run, depends_on, **options)
+    
+    def _stage_progress(self, context: StageContext, name: str, fraction: float, report: Callable[[str], None]):
+        context.stage_progress[name] = fraction
+        report(name)
+    
+    def _run_pipeline(self, pipeline: StagePipeline, context: StageContext, target,
+                      on_checkpoint: Optional[Callable[[str, Any], None]] = None,
+                      on_poll: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+        """Выполняет этапы задачи, продолжая с checkpoint'ов target.pipeline_state.
+        
+        Checkpoint каждого этапа сохраняется в БД сразу по его завершении (в потоке
+        задачи), поэтому упавшая или перезапущенная задача не повторяет готовые этапы.
+        """
+        checkpoints = (target.pipeline_state or {}).get('stages') or {}
+        context.stage_progress.update({name: 1.0 for name in checkpoints})
+        
+        def save_checkpoint(name, checkpoint):
+            # Новый dict: изменения внутри JSON колонки SQLAlchemy не отслеживает
+            state = dict(target.pipeline_state or {})
+            state['stages'] = {**(state.get('stages') or {}), name: checkpoint}
+            target.pipeline_state = state
+            if on_checkpoint:
+                on_checkpoint(name, checkpoint['output'])
+            db.session.commit()
+        
+        def poll():
+            self._raise_if_cancelled()
+            if on_poll:
+                on_poll()
+        
+        return pipeline.run(
+            checkpoints,
+            on_complete=save_checkpoint,
+            poll=poll,
+            thread_init=lambda: self._attach_job(context)
+        )
+    
+    def _output_size(self, output: Any) -> Optional[int]:
+        """Размер файла результата этапа ({'path': ...}), None - файла нет"""
+        path = output.get('path') if isinstance(output, dict) else None
+        if isinstance(path, str) and os.path.isfile(path):
+            return os.path.getsize(path)
+        return None
+    
+    def _trace_count(self, counter: str, amount: Optional[int]):
+        """Добавляет счетчик (байты) к span'у этапа, который выполняет текущий поток"""
+        span = current_span()
+        if span:
+            span.add(counter, amount)
+    
+    def _save_trace(self, target, context: StageContext, status: str):
+        """Дописывает попытку задачи в target.trace (коммит - у вызывающего кода)"""
+        target.trace = append_attempt(target.trace, context.trace.finish(status))
+    
+    def _apply_outputs(self, target, fields, output: Dict[str, Any]):
+        """Переносит результат этапа в поля модели (пустые значения не затирают прежние)"""
+        for field in fields:
+            value = output.get(field)
+            if value is not None:
+                setattr(target, field, value)
+    
+    def _overall_progress(self, context: StageContext, weights: Dict[str, int]) -> int:
+        return int(sum(weights.get(name, 0) * fraction for name, fraction in list(context.stage_progress.items())))
+    
+    def _publish_ingest_progress(self, context: StageContext, user_id: str, project_id: str, stage: str):
+        """Событие прогресса ingest для SSE клиентов"""
+        publish_event(
+            'ingest_progress',
+            user_id,
+            project_id,
+            status='processing',
+            stage=stage,
+            progress=self._overall_progress(context, INGEST_STAGE_WEIGHTS)
+        )
+    
+    def _publish_render_progress(self, context: StageContext, user_id: str, project_id: str, render_id: str):
+        """Событие прогресса рендера; в БД его пишет поток задачи (см. render_video)"""
+        context.progress = self._overall_progress(context, RENDER_STAGE_WEIGHTS)
+        publish_event(
+            'render_progress',
+            user_id,
+            project_id,
+            render_id=render_id,
+            status='processing',
+            progress=context.progress
+        )
+    
+    def _input_thread_args(self) -> list:
+        """Ограничение потоков декодера и фильтров (ставится перед -i)"""
+        if self.ffmpeg_threads <= 0:
+            return []
+        return ['-threads', str(self.ffmpeg_threads), '-filter_threads', str(self.ffmpeg_threads)]
+    
+    def _encoder_thread_args(self) -> list:
+        """Ограничение потоков x264 (включая lookahead, который иначе берет все ядра)"""
+        if self.ffmpeg_threads <= 0:
+            return []
+        return [
+            '-threads', str(self.ffmpeg_threads),
+            '-x264-params', f'threads={self.ffmpeg_threads}:lookahead-threads={max(1, self.ffmpeg_threads // 2)}'
+        ]
+    
+    def _store_output(self, upload_method: str, file_path: str, local_name: str, *args) -> Dict[str, Any]:
+        """Загружает результат в Supabase Storage или оставляет в локальной папке загрузок"""
+        storage = storage_module.get_storage_service()
+        if storage:
+            with open(file_path, 'rb') as f:
+                result = getattr(storage, upload_method)(f.read(), *args)
+            if result.get('success'):
+                self._trace_count('bytes_uploaded', result.get('size'))
+            return result
+        
+        # Fallback без Storage: отдаем файл через /api/video/files/
+        try:
+            os.makedirs(self.upload_folder, exist_ok=True)
+            shutil.copyfile(file_path, os.path.join(self.upload_folder, local_name))
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+        
+        size = os.path.getsize(file_path)
+        self._trace_count('bytes_stored_locally', size)
+        return {
+            'success': True,
+            'path': local_name,
+            'public_url': f"{LOCAL_FILES_PREFIX}{local_name}",
+            'size': size
+        }
+    
+    def _upload(self, upload_method: str, file_path: str, local_name: str, *args) -> str:
+        """Выгружает результат этапа и возвращает его URL (ошибка выгрузки - ошибка этапа)"""
+        result = self._store_output(upload_method, file_path, local_name, *args)
+        if not result['success']:
+            raise Exception(f"Upload failed: {result['error']}")
+        return result['public_url']
+    
+    def _purge_stale_scratch(self):
+        """Удаляет временные файлы упавших задач, которые так и не повторили"""
+        cutoff = time.time() - SCRATCH_RETENTION_SECONDS
+        try:
+            entries = list(os.scandir(self.temp_dir))
+        except FileNotFoundError:
+            return
+        
+        for entry in entries:
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"⚠️ Failed to purge {entry.path}: {e}")
+    
+    def _cleanup_task_files(self, task_id: str):
+        """Удаляет все временные файлы задачи (после завершения или отмены)"""
+        paths = glob.glob(os.path.join(self.temp_dir, f"{task_id}_*"))
+        paths.append(audio_store.path_for(task_id) + '.part')
+        self._cleanup_temp_files(paths)
+    
     def _cleanup_temp_files(self, file_paths: list):
         """Удаляет временные файлы"""
         for path in file_paths:
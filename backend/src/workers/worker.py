@@ -6,27 +6,32 @@ Redis Queue Worker для AgentFlow Video Editor
 
 import os
 import sys
+import time
 import redis
-from rq import Worker, Queue, Connection
+from rq import Worker, Queue, get_current_job
 from flask import Flask
 
 # Добавляем путь к проекту
-sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from src.models.video_project import db
 from src.services.storage_service import init_storage_service
+from src.config.logging_config import configure_logging, get_logger
+from src.config.database import configure_database, get_startup_mode
+from src.services.metrics import observe_queue_wait
+from src.services.queue_service import init_queue_manager, PRIORITY_QUEUES, PRIORITY_ORDER
 from src.workers.video_processor import processor
+from src.workers.media_cache import media_cache
+
+# Логи сервисов (очередь, storage, кэш, БД) в том же формате, что у API
+configure_logging()
+logger = get_logger('worker')
 
 # Создаем Flask app для контекста БД
 app = Flask(__name__)
 
-# Конфигурация БД
-database_url = os.getenv('DATABASE_URL')
-if database_url:
-    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
-else:
-    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), '..', 'database', 'app.db')}"
-
+# Конфигурация БД: та же строка подключения, пул и проверка, что у API
+database_uri, database_connected = configure_database(app, get_startup_mode())
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 # Инициализация
@@ -38,41 +43,85 @@ supabase_key = os.getenv('SUPABASE_ANON_KEY')
 
 if supabase_url and supabase_key:
     init_storage_service(supabase_url, supabase_key)
-    print("✅ Supabase Storage initialized")
+    logger.info("✅ Supabase Storage initialized")
 
 # Redis подключение
 redis_url = os.getenv('REDIS_URL', 'redis://localhost:6379')
 redis_conn = redis.from_url(redis_url)
 
-# Создаем очереди
-video_queue = Queue('video_processing', connection=redis_conn)
-render_queue = Queue('video_rendering', connection=redis_conn)
+# Создаем очереди в порядке приоритета: interactive > ingest > bulk
+queues = [Queue(PRIORITY_QUEUES[priority], connection=redis_conn) for priority in PRIORITY_ORDER]
+
+# Queue manager нужен worker'у для освобождения fair-share слотов
+queue_manager = init_queue_manager(redis_url)
+
+# Пауза между проверками свободного места, пока задачи не берутся
+HEADROOM_POLL_INTERVAL = float(os.getenv('WORKER_HEADROOM_POLL_INTERVAL', '5'))
+
+def _release_current_job_slot():
+    """Освобождает fair-share слот текущей задачи и продвигает следующую задачу пользователя"""
+    job = get_current_job()
+    if job:
+        queue_manager.release_job_slot(job.id, job.meta.get('user_id'))
+
+def _observe_current_job_wait():
+    """Ожидание задачи в очереди (от создания: включает ожидание fair-share слота)"""
+    job = get_current_job()
+    if job:
+        observe_queue_wait(job.origin, job.created_at, job.started_at)
 
 def process_video_job(project_id: str):
     """Job функция для обработки видео"""
-    with app.app_context():
-        return processor.process_uploaded_video(project_id)
+    _observe_current_job_wait()
+    try:
+        with app.app_context():
+            return processor.process_uploaded_video(project_id)
+    finally:
+        _release_current_job_slot()
 
 def render_video_job(render_id: str):
     """Job функция для рендеринга видео"""
-    with app.app_context():
-        return processor.render_video(render_id)
-
-# Регистрируем job функции
-video_queue.enqueue_call = lambda func, args=(), kwargs={}, **options: video_queue.enqueue(func, *args, **kwargs, **options)
-render_queue.enqueue_call = lambda func, args=(), kwargs={}, **options: render_queue.enqueue(func, *args, **kwargs, **options)
+    _observe_current_job_wait()
+    try:
+        with app.app_context():
+            return processor.render_video(render_id)
+    finally:
+        _release_current_job_slot()
+
+class VideoWorker(Worker):
+    """RQ worker с допуском по свободному месту (как у db_worker) и продвижением
+    отложенных fair-share задач в maintenance-проходе (их слоты могли освободиться
+    по TTL после гибели другого worker'а)"""
+    
+    def dequeue_job_and_maintain_ttl(self, timeout, max_idle_time=None):
+        # Допуск: пока на диске мало места, задачи остаются в очереди (не берутся и не падают)
+        warned = False
+        while not media_cache.has_headroom():
+            if self._stop_requested:
+                return None
+            if not warned:
+                logger.warning("⚠️ Scratch space is low, not taking new jobs")
+                warned = True
+            self.heartbeat()
+            time.sleep(HEADROOM_POLL_INTERVAL)
+        
+        return super().dequeue_job_and_maintain_ttl(timeout, max_idle_time)
+    
+    def run_maintenance_tasks(self):
+        super().run_maintenance_tasks()
+        queue_manager.promote_deferred_jobs()
 
 def start_worker():
     """Запускает RQ worker"""
-    print("🚀 Starting AgentFlow Video Editor Worker")
-    print(f"🔧 Redis URL: {redis_url}")
-    print(f"🗄️ Database: {'PostgreSQL' if database_url else 'SQLite'}")
-    print(f"📦 Storage: {'Supabase' if supabase_url else 'Disabled'}")
+    logger.info("🚀 Starting AgentFlow Video Editor Worker")
+    logger.info("🔧 Redis URL: %s", 'set' if os.getenv('REDIS_URL') else 'not set (localhost)')
+    logger.info("🗄️ Database: %s", 'PostgreSQL' if database_connected else 'SQLite')
+    logger.info("📦 Storage: %s", 'Supabase' if supabase_url else 'Disabled')
     
-    # Создаем worker для обеих очередей
-    worker = Worker([video_queue, render_queue], connection=redis_conn)
+    # Создаем worker для всех очередей (порядок списка = приоритет)
+    worker = VideoWorker(queues, connection=redis_conn)
     
-    print("👷 Worker started, waiting for jobs...")
+    logger.info("👷 Worker started, waiting for jobs...")
     worker.work()
 
 if __name__ == '__main__':
@@ -0,0 +1,45 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Добавляем путь к проекту (тесты импортируют src.*)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# До импорта src.*: БД и временные файлы тестов - во временном каталоге
+TEST_DIR = tempfile.mkdtemp(prefix='agentflow-tests-')
+os.environ['SQLITE_FALLBACK_PATH'] = os.path.join(TEST_DIR, 'test.db')
+os.environ['STARTUP_MODE'] = 'lazy'
+os.environ['TEMP_DIR'] = os.path.join(TEST_DIR, 'scratch')
+os.environ.pop('DATABASE_URL', None)
+os.environ.pop('REDIS_URL', None)
+
+
+@pytest.fixture
+def app():
+    """Flask приложение с чистой SQLite БД (тот же файл, что у worker'ов в тестах)"""
+    from flask import Flask
+    from src.config.database import configure_database
+    from src.models.video_project import db
+    from src.models.background_job import BackgroundJob  # noqa: F401 (регистрирует таблицу в metadata)
+
+    app = Flask(__name__)
+    configure_database(app, 'lazy')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    """Тестовый клиент с API видео (/api/video)"""
+    from src.routes.video import video_bp
+
+    app.register_blueprint(video_bp, url_prefix='/api/video')
+    return app.test_client()
@@ -0,0 +1,86 @@
+"""Поиск тишины и предложения по нарезке (src/workers/audio_analysis.py) на синтетическом сигнале"""
+
+import numpy as np
+import pytest
+
+from src.workers.audio_analysis import detect_silences, suggest_cuts
+
+SAMPLE_RATE = 1000
+
+
+def signal(*parts):
+    """Сигнал из участков (секунды, постоянная амплитуда): 0.5 ~ -6 dBFS, 0.005 ~ -46 dBFS"""
+    return np.concatenate([np.full(int(round(seconds * SAMPLE_RATE)), level, dtype=np.float32)
+                           for seconds, level in parts])
+
+
+# Громко 0-1, тишина 1-2, громко 2-3, короткая пауза 3-3.3, громко 3.3-4.3, тихий фон 4.3-4.9
+SAMPLES = signal((1, 0.5), (1, 0.0), (1, 0.5), (0.3, 0.0), (1, 0.5), (0.6, 0.005))
+
+
+def spans(silences):
+    return [(silence['start'], silence['end']) for silence in silences]
+
+
+def test_detect_silences_respects_threshold():
+    assert spans(detect_silences(SAMPLES, SAMPLE_RATE, threshold_db=-40)) == [(1.0, 2.0), (4.3, 4.9)]
+    # Фон -46 dBFS громче порога -50 dBFS
+    assert spans(detect_silences(SAMPLES, SAMPLE_RATE, threshold_db=-50)) == [(1.0, 2.0)]
+
+
+def test_detect_silences_respects_min_duration():
+    assert spans(detect_silences(SAMPLES, SAMPLE_RATE, min_duration=0.2)) == [(1.0, 2.0), (3.0, 3.3), (4.3, 4.9)]
+    assert spans(detect_silences(SAMPLES, SAMPLE_RATE, min_duration=0.7)) == [(1.0, 2.0)]
+    assert detect_silences(SAMPLES, SAMPLE_RATE, min_duration=0.5)[0]['duration'] == 1.0
+
+
+def test_detect_silences_on_empty_or_loud_signal():
+    assert detect_silences(np.zeros(0, dtype=np.float32), SAMPLE_RATE) == []
+    assert detect_silences(signal((2, 0.5)), SAMPLE_RATE) == []
+
+
+def test_suggest_cuts_pads_inner_silences_and_cuts_edges_whole():
+    silences = [
+        {'start': 0.0, 'end': 0.5},
+        {'start': 1.0, 'end': 2.0},
+        {'start': 4.3, 'end': 5.0},
+    ]
+
+    result = suggest_cuts(silences, duration=5.0, padding=0.1)
+
+    # Внутри ролика вокруг вырезов остается padding, тишина в начале и конце вырезается целиком
+    assert spans(result['cuts']) == [(0.0, 0.4), (1.1, 1.9), (4.4, 5.0)]
+    assert spans(result['keep_segments']) == [(0.4, 1.1), (1.9, 4.4)]
+    assert result['total_cut_duration'] == pytest.approx(1.8)
+
+
+def test_suggest_cuts_drops_cuts_shorter_than_min_duration():
+    silences = [{'start': 1.0, 'end': 2.0}, {'start': 3.0, 'end': 3.3}]
+
+    result = suggest_cuts(silences, duration=5.0, min_duration=0.2, padding=0.1)
+
+    # У паузы 0.3 с после padding остается 0.1 с - меньше min_duration
+    assert spans(result['cuts']) == [(1.1, 1.9)]
+    assert spans(result['keep_segments']) == [(0.0, 1.1), (1.9, 5.0)]
+
+
+def test_suggest_cuts_merges_adjacent_and_overlapping_cuts():
+    silences = [
+        {'start': 3.5, 'end': 4.5},
+        {'start': 1.0, 'end': 2.0},
+        {'start': 2.0, 'end': 3.0},
+        {'start': 2.5, 'end': 3.2},
+    ]
+
+    result = suggest_cuts(silences, duration=5.0, padding=0.0)
+
+    assert spans(result['cuts']) == [(1.0, 3.2), (3.5, 4.5)]
+    assert spans(result['keep_segments']) == [(0.0, 1.0), (3.2, 3.5), (4.5, 5.0)]
+    assert result['total_cut_duration'] == pytest.approx(3.2)
+
+
+def test_suggest_cuts_without_duration_has_no_keep_segments():
+    result = suggest_cuts([{'start': 1.0, 'end': 2.0}], padding=0.1)
+
+    assert spans(result['cuts']) == [(1.1, 1.9)]
+    assert result['keep_segments'] == []
@@ -0,0 +1,156 @@
+"""Персистентная очередь задач (src/services/db_queue.py) на SQLite БД"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.models.video_project import db
+from src.models.background_job import BackgroundJob
+from src.services.db_queue import (
+    DatabaseQueue, claim_job, extend_lease, complete_job, cancel_started_job, fail_job, prune_jobs,
+    RETRY_BACKOFF_SECONDS
+)
+
+QUEUE = 'video_processing'
+FUNC = 'src.workers.db_worker.process_video_job'
+
+
+def enqueue(job_id, user_id=None, queue=QUEUE, **options):
+    DatabaseQueue(queue).enqueue(FUNC, job_id, job_id=job_id, meta={'user_id': user_id}, **options)
+    return job_id
+
+
+def job(job_id):
+    db.session.expire_all()
+    return db.session.get(BackgroundJob, job_id)
+
+
+def expire_lease(job_id):
+    """Heartbeat больше не продлевает lease (worker умер)"""
+    job(job_id).lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+
+
+def test_fair_share_skips_capped_user_beyond_claim_batch(app):
+    # Задачи тяжелого пользователя занимают начало очереди с запасом больше CLAIM_BATCH_SIZE
+    for index in range(12):
+        enqueue(f'heavy-{index}', user_id='heavy')
+    enqueue('light-0', user_id='light')
+
+    claimed = [claim_job('worker-1', [QUEUE], max_active_per_user=2) for _ in range(3)]
+
+    assert [job.id for job in claimed] == ['heavy-0', 'heavy-1', 'light-0']
+    assert claim_job('worker-1', [QUEUE], max_active_per_user=2) is None
+    assert db.session.get(BackgroundJob, 'heavy-2').status == 'queued'
+
+
+def test_claimed_job_is_exclusive_until_its_lease_expires(app):
+    enqueue('job-1')
+
+    claimed = claim_job('worker-1', [QUEUE])
+    assert claimed.id == 'job-1'
+    assert (claimed.status, claimed.lease_owner, claimed.attempts) == ('started', 'worker-1', 1)
+
+    # Пока lease действует, задачу не получает и не продлевает другой worker
+    assert claim_job('worker-2', [QUEUE]) is None
+    assert not extend_lease('job-1', 'worker-2')
+    assert extend_lease('job-1', 'worker-1')
+
+    expire_lease('job-1')
+    reclaimed = claim_job('worker-2', [QUEUE])
+    assert (reclaimed.id, reclaimed.lease_owner, reclaimed.attempts) == ('job-1', 'worker-2', 2)
+
+    # Прежний владелец потерял задачу: ни heartbeat, ни результат не проходят
+    assert not extend_lease('job-1', 'worker-1')
+    assert not complete_job('job-1', 'worker-1', {'ok': True})
+    assert complete_job('job-1', 'worker-2', {'ok': True})
+    assert job('job-1').status == 'finished'
+
+
+def test_expired_lease_on_last_attempt_fails_job(app):
+    enqueue('job-1', max_attempts=1)
+    claim_job('worker-1', [QUEUE])
+    expire_lease('job-1')
+
+    assert claim_job('worker-2', [QUEUE]) is None
+    assert job('job-1').status == 'failed'
+    assert job('job-1').last_error == 'Lease expired (worker lost)'
+
+
+def test_fail_job_retries_with_backoff_then_fails(app):
+    enqueue('job-1', max_attempts=2)
+    claim_job('worker-1', [QUEUE])
+
+    assert fail_job('job-1', 'worker-2', 'boom') == 'lost'
+
+    before = datetime.utcnow()
+    assert fail_job('job-1', 'worker-1', 'boom') == 'retrying'
+    row = job('job-1')
+    assert (row.status, row.lease_owner, row.last_error) == ('queued', None, 'boom')
+    assert row.run_at >= before + timedelta(seconds=RETRY_BACKOFF_SECONDS)
+
+    # До конца backoff задача не выдается
+    assert claim_job('worker-1', [QUEUE]) is None
+
+    row.run_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+    assert claim_job('worker-1', [QUEUE]).attempts == 2
+
+    assert fail_job('job-1', 'worker-1', 'boom again') == 'failed'
+    row = job('job-1')
+    assert (row.status, row.last_error) == ('failed', 'boom again')
+    assert row.ended_at is not None
+
+
+def test_cancel_started_job_is_final(app):
+    enqueue('job-1')
+    claim_job('worker-1', [QUEUE])
+
+    assert not cancel_started_job('job-1', 'worker-2')
+    assert cancel_started_job('job-1', 'worker-1')
+    assert job('job-1').status == 'canceled'
+    assert claim_job('worker-1', [QUEUE]) is None
+
+
+def test_prune_jobs_removes_only_old_finished_jobs(app):
+    old = datetime.utcnow() - timedelta(days=10)
+    for job_id in ('old-finished', 'old-failed', 'old-canceled', 'recent-finished', 'queued'):
+        enqueue(job_id)
+    for job_id, status, ended_at in (
+        ('old-finished', 'finished', old),
+        ('old-failed', 'failed', old),
+        ('old-canceled', 'canceled', old),
+        ('recent-finished', 'finished', datetime.utcnow()),
+    ):
+        row = db.session.get(BackgroundJob, job_id)
+        row.status, row.ended_at = status, ended_at
+    db.session.commit()
+
+    assert prune_jobs(retention_days=7) == 3
+    assert {row.id for row in BackgroundJob.query} == {'recent-finished', 'queued'}
+    assert prune_jobs(retention_days=0) == 0
+
+
+def test_abandoned_heartbeat_records_timeout_and_exits(app, monkeypatch):
+    from src.workers import db_worker
+
+    exits = []
+
+    def fake_exit(code):
+        exits.append(code)
+        raise SystemExit(code)
+
+    monkeypatch.setattr(db_worker.os, '_exit', fake_exit)
+    monkeypatch.setattr(db_worker, 'stop_logging', lambda: None)
+
+    enqueue('job-1', max_attempts=2)
+    claim_job('worker-1', [QUEUE])
+
+    heartbeat = db_worker.LeaseHeartbeat('job-1', 'worker-1', timeout=5)
+    with pytest.raises(SystemExit):
+        heartbeat._abandon()
+
+    assert exits == [1]
+    row = job('job-1')
+    assert (row.status, row.lease_owner) == ('queued', None)
+    assert row.last_error == 'Job exceeded its timeout (5s)'
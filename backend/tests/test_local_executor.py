@@ -0,0 +1,76 @@
+"""Локальный пул задач (src/services/local_executor.py): допуск и токены постановок"""
+
+import threading
+
+import pytest
+from flask import Flask
+
+from src.services.local_executor import LocalExecutor, FINISHED, CANCELED
+
+
+@pytest.fixture
+def blocked_executor():
+    """Пул из одного потока, занятого задачей 'blocker', пока тест не отпустит release"""
+    executor = LocalExecutor(app=Flask(__name__), max_workers=1, max_queue=2)
+    started, release = threading.Event(), threading.Event()
+
+    def blocker():
+        started.set()
+        release.wait(5)
+
+    assert executor.submit('blocker', blocker)
+    assert started.wait(5)
+    yield executor, release
+    release.set()
+
+
+def wait_idle(executor):
+    executor._queue.join()
+
+
+def test_submit_rejects_when_queue_is_full(blocked_executor):
+    executor, release = blocked_executor
+
+    assert executor.submit('job-1', lambda: None)
+    assert executor.submit('job-2', lambda: None)
+    assert not executor.submit('job-3', lambda: None)
+    assert executor.get_status('job-3') is None
+
+    # Повторная постановка ожидающей задачи не занимает новое место
+    assert executor.submit('job-1', lambda: None)
+
+    release.set()
+    wait_idle(executor)
+    assert executor.get_status('job-1')['status'] == FINISHED
+    assert executor.submit('job-3', lambda: None)
+
+
+def test_cancelled_entries_do_not_count_toward_capacity(blocked_executor):
+    executor, release = blocked_executor
+
+    assert executor.submit('job-1', lambda: None)
+    assert executor.submit('job-2', lambda: None)
+    assert executor.cancel('job-1')
+    assert executor.cancel('job-2')
+
+    # Элементы отмененных постановок еще в очереди, но место под новые задачи есть
+    assert executor.submit('job-3', lambda: None)
+    assert executor.submit('job-4', lambda: None)
+    assert not executor.submit('job-5', lambda: None)
+
+
+def test_stale_submission_is_skipped_after_resubmit(blocked_executor):
+    executor, release = blocked_executor
+    calls = []
+
+    assert executor.submit('job-1', calls.append, 'first')
+    assert executor.cancel('job-1')
+    assert executor.get_status('job-1')['status'] == CANCELED
+    assert executor.submit('job-1', calls.append, 'second')
+
+    release.set()
+    wait_idle(executor)
+
+    # Выполнилась только новая постановка, элемент отмененной пропущен по токену
+    assert calls == ['second']
+    assert executor.get_status('job-1')['status'] == FINISHED
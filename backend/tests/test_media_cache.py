@@ -0,0 +1,52 @@
+"""Локальный кэш исходников (src/workers/media_cache.py): вытеснение и .lock файлы"""
+
+import os
+
+import pytest
+
+from src.workers.media_cache import MediaCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return MediaCache(base_dir=str(tmp_path), max_bytes=150, min_free_bytes=0)
+
+
+def fetch_bytes(size):
+    def fetch(path):
+        with open(path, 'wb') as file:
+            file.write(b'x' * size)
+    return fetch
+
+
+def test_eviction_removes_entry_and_its_lock_file(cache, tmp_path):
+    with cache.acquire('https://storage/a.mp4', fetch_bytes(100)) as path_a:
+        assert os.path.exists(f"{path_a}.lock")
+
+    # Вторая запись не помещается в бюджет рядом с первой: первая вытесняется целиком
+    with cache.acquire('https://storage/b.mp4', fetch_bytes(100)) as path_b:
+        pass
+
+    assert not os.path.exists(path_a)
+    assert not os.path.exists(f"{path_a}.lock")
+    assert sorted(os.listdir(tmp_path)) == sorted([os.path.basename(path_b), os.path.basename(path_b) + '.lock'])
+
+
+def test_entry_in_use_is_not_evicted(cache):
+    with cache.acquire('https://storage/a.mp4', fetch_bytes(100)) as path_a:
+        with cache.acquire('https://storage/b.mp4', fetch_bytes(100)):
+            pass
+        assert os.path.exists(path_a)
+
+
+def test_failed_fetch_leaves_no_files(cache, tmp_path):
+    def fetch(path):
+        with open(path, 'wb') as file:
+            file.write(b'partial')
+        raise IOError('connection reset')
+
+    with pytest.raises(IOError):
+        with cache.acquire('https://storage/a.mp4', fetch):
+            pass
+
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,96 @@
+"""Конвейер этапов (src/workers/pipeline.py): продолжение с checkpoint'ов и restart"""
+
+from src.workers.pipeline import Stage, StagePipeline
+
+
+class FakeStages:
+    """download -> proxy, download -> analyze, (proxy, analyze) -> publish"""
+
+    def __init__(self, download_valid=True):
+        self.calls = []
+        self.saved = {}
+        self.pipeline = StagePipeline([
+            Stage('download', self._stage('download'), is_valid=lambda output: download_valid),
+            Stage('proxy', self._stage('proxy'), depends_on=['download']),
+            Stage('analyze', self._stage('analyze'), depends_on=['download']),
+            Stage('publish', self._stage('publish'), depends_on=['proxy', 'analyze']),
+        ])
+
+    def _stage(self, name):
+        def run(inputs):
+            self.calls.append(name)
+            return {'stage': name, 'inputs': sorted(inputs)}
+        return run
+
+    def run(self, checkpoints=None):
+        return self.pipeline.run(checkpoints, on_complete=lambda name, checkpoint: self.saved.update({name: checkpoint}))
+
+
+def checkpoints(*names):
+    return {name: {'output': {'stage': name, 'resumed': True}} for name in names}
+
+
+def test_resume_skips_checkpointed_stages():
+    stages = FakeStages()
+
+    results = stages.run(checkpoints('download', 'proxy'))
+
+    assert sorted(stages.calls) == ['analyze', 'publish']
+    assert sorted(stages.saved) == ['analyze', 'publish']
+    # Пропущенные этапы отдают потребителям сохраненный результат
+    assert results['proxy'] == {'stage': 'proxy', 'resumed': True}
+    assert results['publish'] == {'stage': 'publish', 'inputs': ['analyze', 'proxy']}
+
+
+def test_invalid_dependency_is_not_rerun_when_its_dependents_are_done():
+    stages = FakeStages(download_valid=False)
+
+    stages.run(checkpoints('download', 'proxy', 'analyze'))
+
+    assert stages.calls == ['publish']
+
+
+def test_invalid_dependency_is_rerun_for_a_dependent_that_needs_it():
+    stages = FakeStages(download_valid=False)
+
+    results = stages.run(checkpoints('download', 'proxy'))
+
+    assert sorted(stages.calls) == ['analyze', 'download', 'publish']
+    assert results['download'] == {'stage': 'download', 'inputs': []}
+    # Готовый proxy не пересчитывается вместе с download
+    assert results['proxy'] == {'stage': 'proxy', 'resumed': True}
+
+
+def test_restart_clears_pipeline_state(client, monkeypatch):
+    from src.models.video_project import db, VideoProject
+    from src.routes import video as video_routes
+
+    class FakeQueue:
+        def enqueue_video_processing(self, project_id, user_id=None):
+            return f'process_{project_id}'
+
+    monkeypatch.setattr(video_routes, 'get_queue', lambda: FakeQueue())
+
+    project = VideoProject(user_id='user-1', name='Clip', status='error',
+                           pipeline_state={'stages': checkpoints('download', 'proxy')})
+    db.session.add(project)
+    db.session.commit()
+
+    # Повтор без restart продолжает с checkpoint'ов
+    response = client.post(f'/api/video/projects/{project.id}/process', headers={'X-User-ID': 'user-1'})
+    assert response.status_code == 200
+    db.session.refresh(project)
+    assert sorted(project.pipeline_state['stages']) == ['download', 'proxy']
+
+    project.status = 'error'
+    db.session.commit()
+    response = client.post(f'/api/video/projects/{project.id}/process', json={'restart': True},
+                           headers={'X-User-ID': 'user-1'})
+    assert response.status_code == 200
+    db.session.refresh(project)
+    assert project.pipeline_state is None
+
+    # Без checkpoint'ов конвейер выполняет все этапы заново
+    stages = FakeStages()
+    stages.run(project.pipeline_state)
+    assert sorted(stages.calls) == ['analyze', 'download', 'proxy', 'publish']
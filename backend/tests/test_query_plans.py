@@ -0,0 +1,42 @@
+"""Планы основных запросов на SQLite БД, созданной миграциями (см. src/migrations/plan_check.py)"""
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+from src.migrations import run_migrations, MIGRATIONS_TABLE
+from src.migrations.plan_check import check_query_plans
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'plans.db'}")
+    yield engine
+    engine.dispose()
+
+
+def assert_queries_use_indexes(engine):
+    results = check_query_plans(engine)
+    assert results
+    problems = {result['name']: result['problems'] for result in results if result['problems']}
+    assert problems == {}
+
+
+def test_migrated_database_uses_indexes(engine):
+    run_migrations(engine)
+
+    assert_queries_use_indexes(engine)
+
+
+def test_migrations_add_indexes_to_existing_database(engine):
+    """БД первого деплоя: составные индексы ей добавляют миграции, а не create_all"""
+    run_migrations(engine)
+    with engine.begin() as connection:
+        inspector = inspect(connection)
+        for table in inspector.get_table_names():
+            for index in inspector.get_indexes(table):
+                if index['name'].startswith('ix_'):
+                    connection.execute(text(f"DROP INDEX {index['name']}"))
+        connection.execute(text(f"DELETE FROM {MIGRATIONS_TABLE} WHERE version > '0001'"))
+
+    assert run_migrations(engine)
+    assert_queries_use_indexes(engine)
@@ -0,0 +1,56 @@
+"""GET /api/video/projects/<id>/silences: параметры и пересчет с другим порогом"""
+
+import numpy as np
+import pytest
+
+from src.models.video_project import db, VideoProject
+
+HEADERS = {'X-User-ID': 'user-1'}
+
+
+@pytest.fixture
+def project(app):
+    project = VideoProject(user_id='user-1', name='Clip', status='ready', duration=5.0,
+                           silences=[{'start': 1.0, 'end': 2.0, 'duration': 1.0}])
+    db.session.add(project)
+    db.session.commit()
+    return project
+
+
+def test_invalid_threshold_is_rejected(client, project):
+    response = client.get(f'/api/video/projects/{project.id}/silences?threshold_db=loud', headers=HEADERS)
+
+    assert response.status_code == 400
+    assert 'threshold_db' in response.get_json()['error']
+
+
+def test_threshold_without_audio_artifact_is_reported_as_not_applied(client, project):
+    response = client.get(f'/api/video/projects/{project.id}/silences?threshold_db=-30', headers=HEADERS)
+
+    body = response.get_json()
+    assert response.status_code == 200
+    assert (body['reanalyzed'], body['threshold_applied']) == (False, False)
+    assert body['silences'] == project.silences
+
+
+def test_threshold_reanalyzes_audio_artifact(client, project, monkeypatch):
+    from src.workers.audio_artifact import audio_store
+
+    # 1 с звука, 2 с тишины, 2 с звука
+    samples = np.concatenate([np.full(n, level, dtype=np.float32) for n, level in (
+        (audio_store.sample_rate, 0.5), (2 * audio_store.sample_rate, 0.0), (2 * audio_store.sample_rate, 0.5)
+    )])
+    monkeypatch.setattr(audio_store, 'open', lambda project_id: samples)
+
+    response = client.get(f'/api/video/projects/{project.id}/silences?threshold_db=-30', headers=HEADERS)
+
+    body = response.get_json()
+    assert (body['reanalyzed'], body['threshold_applied']) == (True, True)
+    assert [(silence['start'], silence['end']) for silence in body['silences']] == [(1.0, 3.0)]
+
+
+def test_stored_silences_without_threshold(client, project):
+    body = client.get(f'/api/video/projects/{project.id}/silences', headers=HEADERS).get_json()
+
+    assert (body['reanalyzed'], body['threshold_applied']) == (False, True)
+    assert [(cut['start'], cut['end']) for cut in body['cuts']] == [(1.1, 1.9)]
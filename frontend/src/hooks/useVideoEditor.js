@@ -363,3 +363,53 @@ export const useWebSocket = (projectId) => {
   return { connected, messages, sendMessage }
 }
 
+
+// Базовый URL API для EventSource (он не шлет заголовки, поэтому user_id уходит в query)
+const API_BASE_URL = import.meta.env.VITE_API_URL || ''
+
+// Типы событий SSE стрима /api/video/events
+const VIDEO_EVENT_TYPES = [
+  'snapshot',
+  'ingest_progress', 'ingest_completed', 'ingest_failed', 'ingest_cancelling', 'ingest_cancelled',
+  'render_queued', 'render_progress', 'render_completed', 'render_failed', 'render_cancelling', 'render_cancelled'
+]
+
+// Хук для SSE событий ingest и рендеринга (всех проектов пользователя или одного проекта).
+// connected = false, пока стрим недоступен: компоненты в это время опрашивают API
+export const useVideoEvents = ({ userId, projectId, onEvent, enabled = true }) => {
+  const [connected, setConnected] = useState(false)
+  const onEventRef = useRef(onEvent)
+  onEventRef.current = onEvent
+
+  useEffect(() => {
+    if (!enabled || !userId || typeof EventSource === 'undefined') {
+      setConnected(false)
+      return
+    }
+
+    const params = new URLSearchParams({ user_id: userId })
+    if (projectId) params.set('project_id', projectId)
+    const source = new EventSource(`${API_BASE_URL}/api/video/events?${params}`)
+
+    const handleEvent = (event) => {
+      setConnected(true)
+      try {
+        onEventRef.current?.(event.type, JSON.parse(event.data))
+      } catch (error) {
+        console.error('Invalid video event:', error)
+      }
+    }
+
+    VIDEO_EVENT_TYPES.forEach(type => source.addEventListener(type, handleEvent))
+    source.onopen = () => setConnected(true)
+    // EventSource переподключается сам (retry из стрима); до переподключения работает polling
+    source.onerror = () => setConnected(false)
+
+    return () => {
+      source.close()
+      setConnected(false)
+    }
+  }, [userId, projectId, enabled])
+
+  return { connected }
+}
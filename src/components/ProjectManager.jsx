@@ -21,6 +21,10 @@ import {
   CheckCircle
 } from 'lucide-react'
 import VideoEditorAPI from '../lib/api'
+import { useVideoEvents } from '../hooks/useVideoEditor'
+
+// Интервал polling списка проектов, пока SSE недоступен
+const PROJECTS_POLL_INTERVAL = 10000
 
 const ProjectManager = ({ onProjectSelect, currentProject }) => {
   const [projects, setProjects] = useState([])
@@ -33,7 +37,6 @@ const ProjectManager = ({ onProjectSelect, currentProject }) => {
     videoFile: null
   })
   const [uploading, setUploading] = useState(false)
-  const [uploadProgress, setUploadProgress] = useState(0)
   const navigate = useNavigate()
   
   const api = new VideoEditorAPI()
@@ -43,9 +46,9 @@ const ProjectManager = ({ onProjectSelect, currentProject }) => {
     loadProjects()
   }, [])
 
-  const loadProjects = async () => {
+  const loadProjects = async ({ silent = false } = {}) => {
     try {
-      setLoading(true)
+      if (!silent) setLoading(true)
       setError(null)
       const data = await api.getProjects()
       setProjects(data)
@@ -53,10 +56,45 @@ const ProjectManager = ({ onProjectSelect, currentProject }) => {
       console.error('Error loading projects:', error)
       setError('Failed to load projects. Please check if the backend server is running.')
     } finally {
-      setLoading(false)
+      if (!silent) setLoading(false)
     }
   }
 
+  const updateProject = (projectId, changes) => {
+    setProjects(prev => prev.map(p => (p.id === projectId ? { ...p, ...changes } : p)))
+  }
+
+  // Статусы обработки проектов через SSE (/api/video/events); стрим открывается
+  // от имени владельца проектов из списка
+  const events = useVideoEvents({
+    userId: projects.find(p => p.user_id)?.user_id,
+    onEvent: (type, data) => {
+      if (type === 'snapshot') {
+        data.projects.forEach(p => updateProject(p.project_id, { status: p.status }))
+      } else if (type === 'ingest_progress') {
+        updateProject(data.project_id, { status: data.status, progress: data.progress })
+      } else if (type === 'ingest_completed') {
+        updateProject(data.project_id, {
+          status: data.status,
+          progress: 100,
+          proxy_url: data.proxy_url,
+          thumbnail_url: data.thumbnail_url
+        })
+      } else if (type.startsWith('ingest_')) {
+        updateProject(data.project_id, { status: data.status })
+      }
+    }
+  })
+
+  // Polling списка - только пока SSE недоступен и есть проекты в обработке
+  const hasProcessing = projects.some(p => p.status === 'processing')
+  useEffect(() => {
+    if (events.connected || !hasProcessing) return
+
+    const interval = setInterval(() => loadProjects({ silent: true }), PROJECTS_POLL_INTERVAL)
+    return () => clearInterval(interval)
+  }, [events.connected, hasProcessing])
+
   const handleCreateProject = async (e) => {
     e.preventDefault()
     if (!newProject.videoFile || !newProject.name.trim()) {
@@ -65,31 +103,22 @@ const ProjectManager = ({ onProjectSelect, currentProject }) => {
     }
 
     setUploading(true)
-    setUploadProgress(0)
     setError(null)
 
     try {
-      // Симуляция прогресса загрузки
-      const progressInterval = setInterval(() => {
-        setUploadProgress(prev => Math.min(prev + 10, 90))
-      }, 200)
-
+      // Прогресс обработки после загрузки приходит событиями ingest_progress
       const project = await api.createProject(
         newProject.name.trim(),
         newProject.description.trim(),
         newProject.videoFile
       )
 
-      clearInterval(progressInterval)
-      setUploadProgress(100)
-
       // Добавляем проект в список
       setProjects(prev => [project, ...prev])
       
       // Закрываем диалог и сбрасываем форму
       setIsCreateDialogOpen(false)
       setNewProject({ name: '', description: '', videoFile: null })
-      setUploadProgress(0)
       
       // Переход к редактору
       navigate(`/editor/${project.id}`)
@@ -248,13 +277,9 @@ const ProjectManager = ({ onProjectSelect, currentProject }) => {
                       <div className="space-y-2">
                         <div className="flex justify-between text-sm">
                           <span>Uploading...</span>
-                          <span>{uploadProgress}%</span>
                         </div>
                         <div className="w-full bg-secondary rounded-full h-2">
-                          <div 
-                            className="bg-primary h-2 rounded-full transition-all duration-300"
-                            style={{ width: `${uploadProgress}%` }}
-                          />
+                          <div className="bg-primary h-2 rounded-full w-full animate-pulse" />
                         </div>
                       </div>
                     )}
@@ -384,6 +409,14 @@ const ProjectManager = ({ onProjectSelect, currentProject }) => {
 
                     {/* Progress indicators */}
                     <div className="mt-3 pt-3 border-t border-border space-y-2">
+                      {/* Processing status */}
+                      {project.status === 'processing' && (
+                        <div className="flex items-center justify-between text-xs">
+                          <span className="text-muted-foreground">Processing</span>
+                          <span className="text-yellow-600">{project.progress ?? 0}%</span>
+                        </div>
+                      )}
+
                       {/* Transcript status */}
                       <div className="flex items-center justify-between text-xs">
                         <span className="text-muted-foreground">Transcript</span>
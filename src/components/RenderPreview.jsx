@@ -17,6 +17,7 @@ import {
   Eye
 } from 'lucide-react'
 import VideoEditorAPI from '../lib/api'
+import { useVideoEvents } from '../hooks/useVideoEditor'
 
 const RenderPreview = ({ 
   project, 
@@ -50,12 +51,11 @@ const RenderPreview = ({
         const projectRenders = await api.getProjectRenders(project.id)
         setRenders(projectRenders)
         
-        // Найти активный рендер
+        // Найти активный рендер (прогресс дальше придет через SSE или polling)
         const activeRender = projectRenders.find(r => r.status === 'processing')
         if (activeRender) {
           setCurrentRender(activeRender)
           setIsRendering(true)
-          startPolling(activeRender.id)
         }
       } catch (error) {
         console.error('Error loading renders:', error)
@@ -114,41 +114,76 @@ const RenderPreview = ({
         settings: renderSettings
       })
 
-      // Начать polling статуса
-      startPolling(renderData.id)
-
     } catch (error) {
       setError(error.message)
       setIsRendering(false)
     }
   }
 
-  // Polling статуса рендеринга
+  // Применение статуса рендера (ответ API или событие SSE)
+  const applyRenderStatus = (status) => {
+    if (status.status === 'completed') {
+      setIsRendering(false)
+      setRenderProgress(100)
+      setCurrentRender(prev => ({ ...prev, ...status }))
+      setPreviewUrl(status.output_url)
+    } else if (status.status === 'failed') {
+      setIsRendering(false)
+      setError(status.error)
+      setCurrentRender(prev => ({ ...prev, ...status }))
+    } else if (status.status === 'cancelled') {
+      setIsRendering(false)
+      setCurrentRender(prev => ({ ...prev, ...status }))
+    } else if (status.status === 'processing') {
+      setRenderProgress(status.progress || 0)
+    }
+  }
+
+  const refreshRenderStatus = async (renderId) => {
+    try {
+      applyRenderStatus(await api.getRenderStatus(renderId))
+    } catch (error) {
+      console.error('Error loading render status:', error)
+    }
+  }
+
+  // События рендеринга через SSE (/api/video/events)
+  const events = useVideoEvents({
+    userId: project?.user_id,
+    projectId: project?.id,
+    enabled: isRendering,
+    onEvent: (type, data) => {
+      const renderId = currentRender?.id
+      if (!renderId) return
+
+      if (type === 'snapshot') {
+        // Снимок содержит только активные рендеры: если нашего там нет, он завершился,
+        // пока стрим был недоступен
+        const active = data.renders.find(r => r.render_id === renderId)
+        if (active) {
+          applyRenderStatus(active)
+        } else {
+          refreshRenderStatus(renderId)
+        }
+      } else if (type.startsWith('render_') && data.render_id === renderId) {
+        applyRenderStatus(data)
+      }
+    }
+  })
+
+  // Polling статуса - только пока SSE недоступен
+  useEffect(() => {
+    if (isRendering && currentRender?.id && !events.connected) {
+      startPolling(currentRender.id)
+    } else {
+      stopPolling()
+    }
+  }, [isRendering, currentRender?.id, events.connected])
+
   const startPolling = (renderId) => {
     if (pollInterval.current) clearInterval(pollInterval.current)
     
-    pollInterval.current = setInterval(async () => {
-      try {
-        const status = await api.getRenderStatus(renderId)
-        
-        if (status.status === 'completed') {
-          setIsRendering(false)
-          setRenderProgress(100)
-          setCurrentRender(status)
-          setPreviewUrl(status.output_url)
-          stopPolling()
-        } else if (status.status === 'failed') {
-          setIsRendering(false)
-          setError(status.error)
-          setCurrentRender(status)
-          stopPolling()
-        } else if (status.status === 'processing') {
-          setRenderProgress(status.progress || 0)
-        }
-      } catch (error) {
-        console.error('Error polling render status:', error)
-      }
-    }, 2000) // Проверяем каждые 2 секунды
+    pollInterval.current = setInterval(() => refreshRenderStatus(renderId), 2000) // Проверяем каждые 2 секунды
   }
 
   const stopPolling = () => {